@@ -0,0 +1,95 @@
+import time
+
+from twython import TwythonError
+
+
+class BenchTwython:
+    """A fast in-process stand-in for the Twython client, serving any number of friends.
+
+    Unlike the tests' MockTwython it honours the ``count`` and ``cursor`` parameters, so pages have the size the
+    exporters ask for. Every ``skip_every``-th friend can't be followed (Twitter answers that it doesn't exist).
+    The users/lookup requests may take ``latency_seconds``, to stand for the network round trip.
+    """
+
+    FIRST_FRIEND_ID = 10_000_000
+
+    def __init__(self, num_friends: int, screen_name: str = "bench_user", skip_every: int = 0,
+                 latency_seconds: float = 0) -> None:
+        self.num_friends = num_friends
+        self.screen_name = screen_name
+        self.skip_every = skip_every
+        self.latency_seconds = latency_seconds
+        self.requests = 0
+
+    def friend_id(self, index: int) -> int:
+        return self.FIRST_FRIEND_ID + index
+
+    def friend_name(self, index: int) -> str:
+        return f"friend{index}"
+
+    def verify_credentials(self, **kwargs):
+        return {'screen_name': self.screen_name}
+
+    def show_user(self, **kwargs):
+        return {'friends_count': self.num_friends}
+
+    def get_friends_list(self, **kwargs):
+        indexes, next_cursor = self._page(kwargs)
+        users = [{'screen_name': self.friend_name(i), 'id': self.friend_id(i)} for i in indexes]
+        return {'users': users, 'next_cursor': next_cursor}
+
+    def get_friends_ids(self, **kwargs):
+        indexes, next_cursor = self._page(kwargs)
+        return {'ids': [self.friend_id(i) for i in indexes], 'next_cursor': next_cursor}
+
+    def lookup_user(self, **kwargs):
+        self.requests += 1
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+        indexes = [int(user_id) - self.FIRST_FRIEND_ID for user_id in kwargs['user_id'].split(",")]
+        return [{'screen_name': self.friend_name(i), 'id': self.friend_id(i)} for i in indexes]
+
+    def lookup_friendships(self, **kwargs):
+        self.requests += 1
+        return [{'id': int(user_id), 'connections': ["none"]} for user_id in kwargs['user_id'].split(",")]
+
+    def create_friendship(self, **kwargs):
+        self.requests += 1
+        index = kwargs['user_id'] - self.FIRST_FRIEND_ID
+        if self.skip_every and index % self.skip_every == self.skip_every - 1:
+            raise TwythonError("Twitter API returned a 404 (Not Found), Cannot find specified user.")
+        return None
+
+    def get_lastfunction_header(self, header, default_return_value=None):
+        if header == 'x-rate-limit-reset':
+            return int(time.time())
+        return default_return_value
+
+    def _page(self, params):
+        self.requests += 1
+        start = max(params.get('cursor') or 0, 0)
+        end = min(start + params['count'], self.num_friends)
+        return range(start, end), end if end < self.num_friends else 0
+
+
+class UnlimitedRateLimiter:
+    """A rate limiter that never holds a friendship request back, and doesn't persist anything."""
+
+    def __init__(self) -> None:
+        self.requests_recorded = 0
+
+    def seconds_until_available(self) -> float:
+        return 0
+
+    def record_request(self) -> None:
+        self.requests_recorded += 1
+
+
+class NullJournal:
+    """An import journal that records nothing."""
+
+    def record_imported(self, friendship) -> None:
+        pass
+
+    def record_skipped(self, friendship, reason_for_skipping) -> None:
+        pass
@@ -0,0 +1,296 @@
+import argparse
+import csv
+import json
+import logging
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from benchmarks.fakes import BenchTwython
+from benchmarks.fakes import NullJournal
+from benchmarks.fakes import UnlimitedRateLimiter
+from tw_frnds_ei.binary_export import write_friends
+from tw_frnds_ei.clock import VirtualClock
+from tw_frnds_ei.export_writer import CsvExportWriter
+from tw_frnds_ei.friends_exporter import FriendsExporter
+from tw_frnds_ei.friends_exporter import FriendsIdsExporter
+from tw_frnds_ei.friend_table import FriendTable
+from tw_frnds_ei.friends_importer import FriendsImporter
+from tw_frnds_ei.import_journal import ImportJournal
+
+logger = logging.getLogger(__name__)
+
+SIZES = (100, 1_000, 10_000, 100_000, 1_000_000)
+CSV_FILE_NAME = "bench.csv"
+BINARY_FILE_NAME = "bench.twfr"
+SKIP_EVERY = 10  # One friend out of SKIP_EVERY can't be followed
+LOOKUP_LATENCY_SECONDS = 0.02  # Simulated round trip of the users/lookup requests
+LAUNCHES = 20  # Process launches measured by the startup cases
+
+
+# -----------------------
+# Benchmark cases
+# -----------------------
+# Each case prepares its input of num_rows friends in work_dir and measures a single run.
+# Returns: tuple with the seconds measured and a dict of extra figures
+
+def bench_csv_load(work_dir, num_rows):
+    importer = _bench_importer(work_dir, num_rows)
+    start = time.perf_counter()
+    friends_data = importer._load_friends_csv()
+    seconds = time.perf_counter() - start
+    assert len(friends_data) == num_rows
+    return seconds, {}
+
+
+def bench_binary_load(work_dir, num_rows):
+    importer = _bench_importer(work_dir, num_rows)
+    csv_path = Path(work_dir).joinpath(importer.user_screen_name, CSV_FILE_NAME)
+    binary_path = csv_path.with_name(BINARY_FILE_NAME)
+    with open(binary_path, 'wb') as binary_file:
+        write_friends(binary_file, [importer.cli.friend_id(i) for i in range(num_rows)],
+                      [importer.cli.friend_name(i) for i in range(num_rows)])
+    importer.csv_file_name = BINARY_FILE_NAME
+    start = time.perf_counter()
+    friends_data = importer._load_friends_binary()
+    seconds = time.perf_counter() - start
+    assert len(friends_data) == num_rows
+    return seconds, {'file_bytes': binary_path.stat().st_size, 'csv_file_bytes': csv_path.stat().st_size}
+
+
+def bench_import_bookkeeping(work_dir, num_rows):
+    # The loop over the friendships, without journal nor throttling: half of them settled by a previous run
+    importer = _bench_importer(work_dir, num_rows)
+    friends_data = importer._load_friends_csv()
+    settled = {f['fr_id']: (ImportJournal.STATUS_IMPORTED, None) for f in friends_data[:num_rows // 2]}
+    start = time.perf_counter()
+    ok, imported, remaining, msg = _run_to_end(importer._throttle_friendship_requests(friends_data, NullJournal(),
+                                                                                      settled))
+    seconds = time.perf_counter() - start
+    assert ok, msg
+    return seconds, {'imported': len(imported), 'remaining': len(remaining)}
+
+
+def bench_csv_export(work_dir, num_rows):
+    cli = BenchTwython(num_rows)
+    page_size = FriendsExporter.PAGE_SIZE
+    start = time.perf_counter()
+    writer = CsvExportWriter(Path(work_dir).joinpath("export.csv"))
+    for page_start in range(0, num_rows, page_size):
+        writer.write_page((cli.friend_name(i), cli.friend_id(i))
+                          for i in range(page_start, min(page_start + page_size, num_rows)))
+    writer.commit()
+    return time.perf_counter() - start, {}
+
+
+def bench_export_list(work_dir, num_rows):
+    return _bench_export(FriendsExporter, work_dir, num_rows)
+
+
+def bench_export_ids(work_dir, num_rows):
+    return _bench_export(FriendsIdsExporter, work_dir, num_rows)
+
+
+def bench_export_ids_latency(work_dir, num_rows):
+    # The users/lookup requests take a simulated network round trip: the time goes into waiting for responses
+    return _bench_export(FriendsIdsExporter, work_dir, num_rows, latency_seconds=LOOKUP_LATENCY_SECONDS)
+
+
+def bench_import(work_dir, num_rows):
+    # Full import (journal and throttling included) against the fake client, on a virtual clock.
+    # The simulated duration is the time the import would take for real, throttled to 400 requests a day.
+    clock = VirtualClock()
+    importer = _bench_importer(work_dir, num_rows, clock=clock)
+    importer.rate_limiter = None  # the default, persisted, rate limiter
+    start = time.perf_counter()
+    ok, msg, imported, remaining = importer.process()
+    seconds = time.perf_counter() - start
+    assert ok, msg
+    return seconds, {'imported': len(imported), 'remaining': len(remaining), 'requests': importer.cli.requests,
+                     'simulated_days': clock.monotonic() / (24 * 3600)}
+
+
+def bench_friend_memory(work_dir, num_rows):
+    # Memory held by num_rows friends as a list of dicts (the former representation) and as a FriendTable, both
+    # built from the same pairs with new strings, so that the names are counted in both.
+    # The time measured is the build of the FriendTable.
+    cli = BenchTwython(num_rows)
+    dicts_bytes = _traced_bytes(lambda: [{'screen_name': cli.friend_name(i), 'fr_id': cli.friend_id(i)}
+                                         for i in range(num_rows)])
+    start = time.perf_counter()
+    table_bytes = _traced_bytes(lambda: FriendTable((cli.friend_name(i), cli.friend_id(i)) for i in range(num_rows)))
+    seconds = time.perf_counter() - start
+    return seconds, {'dicts_bytes': dicts_bytes, 'table_bytes': table_bytes,
+                     'bytes_per_friend': table_bytes / num_rows, 'reduction': dicts_bytes / table_bytes}
+
+
+BENCHMARKS = {
+    'csv_load': bench_csv_load,
+    'binary_load': bench_binary_load,
+    'import_bookkeeping': bench_import_bookkeeping,
+    'csv_export': bench_csv_export,
+    'export_list': bench_export_list,
+    'export_ids': bench_export_ids,
+    'export_ids_latency': bench_export_ids_latency,
+    'import': bench_import,
+    'friend_memory': bench_friend_memory,
+}
+
+
+# -----------------------
+# Startup cases
+# -----------------------
+# Each case measures a number of process launches, whatever the number of rows.
+# Returns: tuple with the seconds per launch and a dict of extra figures
+
+def bench_cli_startup(work_dir, launches):
+    # Launches of the command line (`python -m tw_frnds_ei export --help`), as done by batch launchers starting many
+    # jobs. Also measures the launches of a bare interpreter, the floor of the startup time.
+    project_dir = Path(__file__).resolve().parents[1]
+    interpreter_seconds = _time_launches([sys.executable, "-c", "pass"], launches, project_dir)
+    seconds = _time_launches([sys.executable, "-m", "tw_frnds_ei", "export", "--help"], launches, project_dir)
+    return seconds / launches, {'interpreter_seconds_per_launch': interpreter_seconds / launches}
+
+
+STARTUP_BENCHMARKS = {
+    'cli_startup': bench_cli_startup,
+}
+
+
+# -----------------------
+# Runner
+# -----------------------
+
+def run_benchmarks(names, sizes, budget_seconds, repeat=1, launches=LAUNCHES):
+    """Run the benchmarks for increasing sizes, and the startup cases for a number of launches.
+
+    A size is skipped when the time of the previous size, scaled linearly, says it would exceed the time budget.
+
+    :return: list of results
+    :rtype: list of dict
+    """
+    results = []
+    for name in names:
+        if name in STARTUP_BENCHMARKS:
+            seconds, extra = _best_of(STARTUP_BENCHMARKS[name], launches, repeat)
+            logger.info(f"{name} - {launches} launches: {seconds:.4f}s per launch")
+            results.append(dict({'benchmark': name, 'launches': launches, 'skipped': False,
+                                 'seconds_per_launch': seconds}, **extra))
+            continue
+        last_seconds, last_rows = None, None
+        for num_rows in sorted(sizes):
+            if last_seconds is not None and last_seconds * num_rows / last_rows > budget_seconds:
+                logger.info(f"{name} - {num_rows} rows: skipped (over the {budget_seconds}s budget)")
+                results.append({'benchmark': name, 'rows': num_rows, 'skipped': True})
+                continue
+            seconds, extra = _best_of(BENCHMARKS[name], num_rows, repeat)
+            logger.info(f"{name} - {num_rows} rows: {seconds:.4f}s")
+            results.append(dict({'benchmark': name, 'rows': num_rows, 'skipped': False, 'seconds': seconds,
+                                 'rows_per_second': num_rows / seconds if seconds else None}, **extra))
+            last_seconds, last_rows = seconds, num_rows
+    return results
+
+
+def _best_of(benchmark, size, repeat):
+    best = None
+    for _ in range(repeat):
+        work_dir = tempfile.mkdtemp(prefix="tw_frnds_ei_bench_")
+        try:
+            seconds, extra = benchmark(work_dir, size)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        if best is None or seconds < best[0]:
+            best = seconds, extra
+    return best
+
+
+def _run_to_end(steps):
+    # Run a generator of import steps to completion without waiting
+    #
+    # Returns: the value returned by the generator
+    try:
+        while True:
+            next(steps)
+    except StopIteration as finished:
+        return finished.value
+
+
+def _traced_bytes(build):
+    # Returns: the bytes allocated by build() and still held by what it returns
+    tracemalloc.start()
+    try:
+        built = build()
+        held, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del built
+    return held
+
+
+def _bench_importer(work_dir, num_rows, clock=None):
+    cli = BenchTwython(num_rows, skip_every=SKIP_EVERY)
+    csv_path = Path(work_dir).joinpath(cli.screen_name, CSV_FILE_NAME)
+    csv_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(csv_path, 'w', newline='') as csv_file:
+        writer = csv.writer(csv_file, quoting=csv.QUOTE_NONNUMERIC)
+        writer.writerows((cli.friend_name(i), cli.friend_id(i)) for i in range(num_rows))
+    importer = FriendsImporter(cli, work_dir, CSV_FILE_NAME, rate_limiter=UnlimitedRateLimiter(), clock=clock,
+                               max_num_friends=num_rows)
+    return importer
+
+
+def _bench_export(exporter_class, work_dir, num_rows, latency_seconds=0):
+    exporter = exporter_class(BenchTwython(num_rows, latency_seconds=latency_seconds), work_dir,
+                              max_num_friends=num_rows)
+    start = time.perf_counter()
+    ok, msg, file_name = exporter.process()
+    seconds = time.perf_counter() - start
+    assert ok, msg
+    return seconds, {'requests': exporter.cli.requests}
+
+
+def _time_launches(command, launches, cwd):
+    start = time.perf_counter()
+    for _ in range(launches):
+        subprocess.run(command, cwd=cwd, stdout=subprocess.DEVNULL, check=True)
+    return time.perf_counter() - start
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=Path(__file__).parent).stdout.strip() or None
+    except OSError:
+        return None
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Benchmark the export and import paths.")
+    all_benchmarks = list(BENCHMARKS) + list(STARTUP_BENCHMARKS)
+    arg_parser.add_argument("--benchmarks", nargs="+", choices=all_benchmarks, default=all_benchmarks)
+    arg_parser.add_argument("--sizes", nargs="+", type=int, default=list(SIZES), help="Numbers of rows")
+    arg_parser.add_argument("--budget", type=float, default=60,
+                            help="Max seconds a single run may (be expected to) take. Larger sizes are skipped")
+    arg_parser.add_argument("--repeat", type=int, default=1, help="Runs per size, the best one is kept")
+    arg_parser.add_argument("--launches", type=int, default=LAUNCHES,
+                            help="Process launches measured by the startup cases, like cli_startup")
+    arg_parser.add_argument("--output", default="bench_results.json", help="JSON file to write the results to")
+    args = arg_parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    logging.getLogger("tw_frnds_ei").setLevel(logging.ERROR)
+
+    bench_results = run_benchmarks(args.benchmarks, args.sizes, args.budget, args.repeat, args.launches)
+    report = {'revision': _git_revision(),
+              'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+              'python': platform.python_version(),
+              'platform': platform.platform(),
+              'budget_seconds': args.budget,
+              'results': bench_results}
+    with open(args.output, 'w', encoding="UTF-8") as output_file:
+        json.dump(report, output_file, indent=1)
+    logger.info(f"Results written to: {args.output}")
@@ -14,8 +14,12 @@ setuptools.setup(
     author_email="kircmarc@gmail.com",
     description=("An export/import utility for downloading a Twitter user's friends (people whom they follow) "
                  "and creating those friendships in another Twitter user."),
-    long_description=read('README'),
-    packages=setuptools.find_packages(where='tw_frnds_ei'),
+    long_description=read('README.md'),
+    long_description_content_type="text/markdown",
+    packages=setuptools.find_packages(exclude=('benchmarks', 'benchmarks.*')),
+    entry_points={
+        'console_scripts': ['tw_frnds_ei = tw_frnds_ei.cli:main'],
+    },
     classifiers=[
         "Programming Language :: Python :: 3",
         "License :: OSI Approved :: GNU General Public License v3 (GPLv3)",
@@ -0,0 +1,6 @@
+import sys
+
+from tw_frnds_ei.cli import main
+
+# python -m tw_frnds_ei COMMAND ...
+sys.exit(main())
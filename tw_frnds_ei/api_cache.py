@@ -0,0 +1,124 @@
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any
+from typing import Dict
+from typing import Optional
+
+from tw_frnds_ei.clock import SYSTEM_CLOCK
+from tw_frnds_ei.clock import Clock
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_API_CACHE_FILE = "./data/.api_cache.json"  # Used by the programs when API_CACHE_FILE isn't set
+
+
+class ApiCache:
+    """A small cache of API responses, with a time to live per entry and least recently used eviction.
+
+    It's meant for responses that are requested again and again in a batch of exports or imports and rarely change,
+    like the identity behind an OAuth token or the friends count of a profile. When given a file, the entries are
+    persisted there (as JSON) after every change, so that they are shared by consecutive runs.
+
+    :param cache_file: File where the entries are persisted. None for an in-memory cache
+    :type cache_file: str
+
+    :param max_entries: Max number of entries. The least recently used ones are evicted beyond it
+    :type max_entries: int
+
+    :param clock: Clock giving the entries' expiry times. Defaults to the system clock
+    :type clock: tw_frnds_ei.clock.Clock
+    """
+
+    def __init__(self,
+                 cache_file: Optional[str] = None,
+                 max_entries: int = 1000,
+                 clock: Optional[Clock] = None) -> None:
+        """Constructor.
+
+        Loads the entries persisted by previous runs, discarding the expired ones.
+        """
+        self.cache_path_file = Path(cache_file).resolve() if cache_file else None
+        self.max_entries = max_entries
+        self.clock = clock if clock else SYSTEM_CLOCK
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._entries: OrderedDict = OrderedDict(self._load_entries())
+
+    def get(self, key: str) -> Optional[Any]:
+        """Look up an entry.
+
+        :return: The cached value, None if there's no entry for the key or it has expired
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= self.clock.time():
+                self.misses += 1
+                if entry is not None:
+                    del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: str, value: Any, ttl_seconds: float) -> None:
+        """Add or replace an entry and persist the cache.
+
+        :param value: A JSON serializable value
+        :param ttl_seconds: Number of seconds the entry is valid for
+        """
+        with self._lock:
+            self._entries[key] = (self.clock.time() + ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            self._save_entries()
+
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss statistics of the cache.
+
+        :return: dict with the number of hits, misses, evictions and current entries
+        :rtype: dict
+        """
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                    'entries': len(self._entries)}
+
+    # ---------------
+    # private methods
+    # ---------------
+
+    def _load_entries(self):
+        # Returns: list of (key, (expires_at, value)) of the persisted entries not expired yet,
+        # least recently used first
+        if not self.cache_path_file or not self.cache_path_file.exists():
+            return []
+        try:
+            with open(self.cache_path_file, 'r', encoding="UTF-8") as cache_file:
+                persisted = json.load(cache_file)['entries']
+            now = self.clock.time()
+            entries = [(key, (float(expires_at), value)) for key, expires_at, value in persisted if expires_at > now]
+        except (ValueError, KeyError, TypeError):
+            logger.warning(f"Ignoring unreadable API cache file: {self.cache_path_file}")
+            return []
+        logger.debug(f"Loaded {len(entries)} API cache entries from: {self.cache_path_file}")
+        return entries[-self.max_entries:]
+
+    def _save_entries(self):
+        # Write to a temporary file and rename it, so that the cache file is never left half written
+        if not self.cache_path_file:
+            return
+        self.cache_path_file.parent.mkdir(parents=True, exist_ok=True)
+        temp_path_file = self.cache_path_file.with_name(self.cache_path_file.name + ".tmp")
+        with open(temp_path_file, 'w', encoding="UTF-8") as cache_file:
+            json.dump({'entries': [[key, expires_at, value] for key, (expires_at, value) in self._entries.items()]},
+                      cache_file)
+        os.replace(temp_path_file, self.cache_path_file)
+
+# **** EOC
@@ -0,0 +1,191 @@
+import hashlib
+import logging
+import threading
+import time
+from typing import Dict
+from typing import Optional
+
+from twython import Twython
+from twython import TwythonError
+from twython.endpoints import EndpointsMixin
+
+from tw_frnds_ei.api_cache import ApiCache
+from tw_frnds_ei.clock import SYSTEM_CLOCK
+from tw_frnds_ei.clock import Clock
+from tw_frnds_ei.metrics import API_ERRORS
+from tw_frnds_ei.metrics import API_REQUEST_SECONDS
+from tw_frnds_ei.metrics import API_REQUESTS
+from tw_frnds_ei.metrics import RATE_LIMIT_WAITS
+from tw_frnds_ei.waiter import Waiter
+
+logger = logging.getLogger(__name__)
+
+# Names of the Twython methods calling a Twitter API endpoint
+API_ENDPOINTS = frozenset(name for name in dir(EndpointsMixin) if not name.startswith('_'))
+
+# Fields of the user objects kept in the cache: only what the application needs
+CACHED_USER_FIELDS = ('id', 'id_str', 'screen_name', 'friends_count', 'protected')
+
+
+class RateLimitStatus:
+    """The request rate limit status of an endpoint, as reported by Twitter in the last response headers."""
+
+    __slots__ = ('limit', 'remaining', 'reset')
+
+    def __init__(self, limit: Optional[int], remaining: int, reset: int) -> None:
+        self.limit = limit
+        self.remaining = remaining
+        self.reset = reset
+
+    def __repr__(self):
+        return f"RateLimitStatus(limit={self.limit}, remaining={self.remaining}, reset={self.reset})"
+
+
+class ApiClient:
+    """A wrapper around a Twython client that keeps track of Twitter's request rate limits.
+
+    After every call to an API endpoint it reads the ``x-rate-limit-limit``, ``x-rate-limit-remaining`` and
+    ``x-rate-limit-reset`` headers of the response. Before every call it checks the status recorded for the endpoint:
+    when there are no requests left in the current window it waits until the window is reset, instead of sending a
+    request bound to fail with a rate limit error.
+
+    When given a cache, the responses of ``verify_credentials`` (keyed by a hash of the OAuth token) and of
+    ``show_user`` by screen name (keyed by the screen name) are served from it while fresh. Only the fields in
+    CACHED_USER_FIELDS of those responses are kept.
+
+    Every request sent is counted in the application's metrics, with its duration and, if it fails, its error class.
+
+    Any other attribute is delegated to the wrapped client, so an ApiClient can be used wherever a Twython client is.
+    It can be shared by several threads.
+
+    :param cli: Twython client already instantiated with authentication tokens
+    :type cli: twython.Twython
+
+    :param waiter: Waiter used for waiting for the rate limit resets. By default one cancelled on process shutdown
+    :type waiter: tw_frnds_ei.waiter.Waiter
+
+    :param clock: Clock the reset times are compared with. Defaults to the waiter's clock
+    :type clock: tw_frnds_ei.clock.Clock
+
+    :param cache: Cache of the user lookups. None for no caching
+    :type cache: tw_frnds_ei.api_cache.ApiCache
+    """
+
+    RESET_MARGIN_SECONDS = 1  # Extra wait after the reset time, to allow for clock differences with Twitter
+    VERIFY_CREDENTIALS_TTL_SECONDS = 24 * 3600  # The account behind a token doesn't change
+    SHOW_USER_TTL_SECONDS = 15 * 60  # Friends counts do change: only reuse them within a batch
+
+    def __init__(self,
+                 cli: Twython,
+                 waiter: Optional[Waiter] = None,
+                 clock: Optional[Clock] = None,
+                 cache: Optional[ApiCache] = None) -> None:
+        self.cli = cli
+        self.cache = cache
+        self.clock = clock if clock else (waiter.clock if waiter else SYSTEM_CLOCK)
+        self.waiter = waiter if waiter else Waiter("api_client", clock=self.clock)
+        self.rate_limits: Dict[str, RateLimitStatus] = {}
+        self._in_flight: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        # Only called for attributes not found in the ApiClient itself
+        attr = getattr(self.cli, name)
+        if name not in API_ENDPOINTS:
+            return attr
+
+        def _api_call(*args, **kwargs):
+            cache_key, ttl_seconds = self._cache_key(name, kwargs)
+            if not cache_key:
+                return self._call(name, attr, *args, **kwargs)
+            return self._cached_call(cache_key, ttl_seconds, name, attr, *args, **kwargs)
+
+        return _api_call
+
+    # ---------------
+    # private methods
+    # ---------------
+
+    def _call(self, endpoint, api_function, *args, **kwargs):
+        self._wait_for_rate_limit(endpoint)
+        with self._lock:
+            self._in_flight[endpoint] = self._in_flight.get(endpoint, 0) + 1
+        API_REQUESTS.inc(endpoint=endpoint)
+        start = time.perf_counter()
+        try:
+            return api_function(*args, **kwargs)
+        except Exception as e:
+            API_ERRORS.inc(endpoint=endpoint, error=type(e).__name__)
+            raise
+        finally:
+            API_REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint)
+            self._track_rate_limit(endpoint)
+
+    def _cached_call(self, cache_key, ttl_seconds, endpoint, api_function, *args, **kwargs):
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            logger.debug("%s served from the cache", endpoint)
+            return cached
+        response = self._call(endpoint, api_function, *args, **kwargs)
+        self.cache.put(cache_key, {field: response[field] for field in CACHED_USER_FIELDS if field in response},
+                       ttl_seconds)
+        return response
+
+    def _cache_key(self, endpoint, kwargs):
+        # Returns: tuple with the cache key of the call (None if it's not cached) and the time to live of its entry
+        if not self.cache:
+            return None, None
+        if endpoint == 'verify_credentials':
+            token = getattr(self.cli, 'oauth_token', None)
+            if token:
+                token_hash = hashlib.sha256(token.encode("UTF-8")).hexdigest()
+                return f"verify_credentials:{token_hash}", self.VERIFY_CREDENTIALS_TTL_SECONDS
+        elif endpoint == 'show_user' and kwargs.get('screen_name'):
+            return f"show_user:{kwargs['screen_name'].lower()}", self.SHOW_USER_TTL_SECONDS
+        return None, None
+
+    def _wait_for_rate_limit(self, endpoint):
+        # If the last response for the endpoint said there were no requests left, wait until the window is reset.
+        # Otherwise count the request about to be sent against the remaining requests, so that concurrent
+        # callers don't overshoot the limit.
+        with self._lock:
+            status = self.rate_limits.get(endpoint)
+            if not status or status.reset <= self.clock.time():
+                return
+            if status.remaining > 0:
+                status.remaining -= 1
+                return
+            reset = status.reset
+
+        wait_until = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(reset))
+        logger.info(f"No requests left for {endpoint} ({status}). Waiting until {wait_until}...")
+        RATE_LIMIT_WAITS.inc(endpoint=endpoint)
+        self.waiter.sleep_until(reset + self.RESET_MARGIN_SECONDS)
+
+    def _track_rate_limit(self, endpoint):
+        # Record the rate limit status reported in the headers of the last response.
+        # While other requests to the endpoint are in flight, the responses may be tracked in any order (and the
+        # client only keeps the headers of its very last response): within a window the lowest count of remaining
+        # requests is kept.
+        with self._lock:
+            self._in_flight[endpoint] -= 1
+            concurrent = self._in_flight[endpoint] > 0
+        try:
+            remaining = self.cli.get_lastfunction_header('x-rate-limit-remaining')
+            reset = self.cli.get_lastfunction_header('x-rate-limit-reset')
+            limit = self.cli.get_lastfunction_header('x-rate-limit-limit')
+        except TwythonError:
+            # no response was received
+            return
+
+        if remaining is None or reset is None:
+            return
+        status = RateLimitStatus(int(limit) if limit is not None else None, int(remaining), int(reset))
+        with self._lock:
+            previous = self.rate_limits.get(endpoint)
+            if concurrent and previous and previous.reset == status.reset:
+                status.remaining = min(status.remaining, previous.remaining)
+            self.rate_limits[endpoint] = status
+        logger.debug("Rate limit status for %s: %s", endpoint, status)
+
+# **** EOC
@@ -0,0 +1,204 @@
+import bisect
+import logging
+import mmap
+import os
+import struct
+import sys
+from array import array
+from pathlib import Path
+from typing import BinaryIO
+from typing import Iterator
+from typing import List
+from typing import Sequence
+from typing import Tuple
+
+logger = logging.getLogger(__name__)
+
+# Layout of a binary export file (all numbers little-endian):
+#  - header: magic, format version, reserved, number of friends, size in bytes of the string table
+#  - friend ids: one int64 per friend, sorted in ascending order
+#  - name offsets: number of friends + 1 uint32, offsets in the string table where each screen name starts
+#    (the last one is the end of the table)
+#  - string table: the UTF-8 encoded screen names, in the same order as the ids
+BINARY_SUFFIX = ".twfr"
+MAGIC = b"TWFR"
+VERSION = 1
+HEADER = struct.Struct("<4sHHQQ")
+ID_SIZE = 8
+OFFSET_SIZE = 4
+
+
+class BinaryFormatError(ValueError):
+    """Raised when a file isn't a binary export file this version can read."""
+
+
+def write_friends(binary_file: BinaryIO, ids: Sequence[int], screen_names: Sequence[str]) -> None:
+    """Write friends (user ids and screen names in the same order) to an open file, in the binary export format.
+
+    The friends are sorted by user id.
+
+    :param binary_file: File open for writing in binary mode
+    :type binary_file: typing.BinaryIO
+
+    :param ids: The friends' user ids
+    :type ids: sequence of int
+
+    :param screen_names: The friends' screen names
+    :type screen_names: sequence of str
+    """
+    order = sorted(range(len(ids)), key=ids.__getitem__)
+    sorted_ids = array('q', (ids[i] for i in order))
+    offsets = array('I', [0])
+    encoded_names = []
+    for i in order:
+        encoded_name = screen_names[i].encode("UTF-8")
+        encoded_names.append(encoded_name)
+        offsets.append(offsets[-1] + len(encoded_name))
+    names_size = offsets[-1]
+    if sys.byteorder != 'little':
+        sorted_ids.byteswap()
+        offsets.byteswap()
+
+    binary_file.write(HEADER.pack(MAGIC, VERSION, 0, len(sorted_ids), names_size))
+    binary_file.write(sorted_ids.tobytes())
+    binary_file.write(offsets.tobytes())
+    binary_file.write(b"".join(encoded_names))
+
+
+class BinaryFriendsFile:
+    """Read-only, memory-mapped access to a binary export file.
+
+    Nothing is parsed up front: the ids are read straight from the mapped file (on little-endian platforms) and a
+    screen name is only decoded when it's accessed. Friends are accessed by position, in ascending user id order,
+    and looking up a user id takes a binary search.
+
+    :param file_path: Full path of the binary export file
+    :type file_path: pathlib.Path
+    """
+
+    def __init__(self, file_path: Path) -> None:
+        """Constructor.
+
+        Maps the file in memory and checks its header.
+        """
+        self.file_path = file_path
+        self._file = open(file_path, 'rb')
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise BinaryFormatError(f"Empty binary export file: {file_path}")
+        try:
+            self._map_sections()
+        except BinaryFormatError:
+            self.close()
+            raise
+
+    @property
+    def ids(self) -> Sequence[int]:
+        """The user ids of the friends, sorted in ascending order."""
+        return self._ids
+
+    def screen_name(self, index: int) -> str:
+        """Decode the screen name of the friend at a position.
+
+        :param index: Position of the friend
+        :type index: int
+
+        :return: The screen name
+        :rtype: str
+        """
+        return str(self._names[self._name_offsets[index]:self._name_offsets[index + 1]], "UTF-8")
+
+    def screen_names(self) -> List[str]:
+        """Decode all the screen names at once, in the order of the ids.
+
+        :return: The screen names
+        :rtype: list
+        """
+        names = self._names.tobytes()
+        offsets = self._name_offsets.tolist()
+        return [str(names[start:end], "UTF-8") for start, end in zip(offsets, offsets[1:])]
+
+    def index_of(self, fr_id: int) -> int:
+        """Find the position of a user id.
+
+        :param fr_id: The user id to look up
+        :type fr_id: int
+
+        :return: The position of the friend with that user id, -1 if there's none
+        :rtype: int
+        """
+        index = bisect.bisect_left(self._ids, fr_id)
+        return index if index < len(self._ids) and self._ids[index] == fr_id else -1
+
+    def close(self) -> None:
+        """Release the mapped memory and close the file."""
+        for view in ('_ids', '_name_offsets', '_names', '_view'):
+            section = self.__dict__.pop(view, None)
+            if isinstance(section, memoryview):
+                section.release()
+        self._mmap.close()
+        self._file.close()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __getitem__(self, index: int) -> Tuple[str, int]:
+        return self.screen_name(index), self._ids[index]
+
+    def __iter__(self) -> Iterator[Tuple[str, int]]:
+        for index in range(len(self._ids)):
+            yield self[index]
+
+    def __contains__(self, fr_id: int) -> bool:
+        return self.index_of(fr_id) >= 0
+
+    def __enter__(self) -> 'BinaryFriendsFile':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    # ---------------
+    # private methods
+    # ---------------
+
+    def _map_sections(self):
+        # Check the header and set up the views of the ids, the name offsets and the string table
+        if len(self._mmap) < HEADER.size:
+            raise BinaryFormatError(f"Truncated binary export file: {self.file_path}")
+        magic, version, _, count, names_size = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            raise BinaryFormatError(f"Not a binary export file (version {VERSION}): {self.file_path}")
+        ids_end = HEADER.size + count * ID_SIZE
+        offsets_end = ids_end + (count + 1) * OFFSET_SIZE
+        if len(self._mmap) != offsets_end + names_size:
+            raise BinaryFormatError(f"Truncated binary export file: {self.file_path}")
+
+        self._view = memoryview(self._mmap)
+        self._ids = self._section(HEADER.size, ids_end, 'q')
+        self._name_offsets = self._section(ids_end, offsets_end, 'I')
+        self._names = self._view[offsets_end:]
+
+    def _section(self, start, end, typecode):
+        # Returns: a zero-copy view of a section of numbers, or a byte-swapped copy on big-endian platforms
+        if sys.byteorder == 'little':
+            return self._view[start:end].cast(typecode)
+        numbers = array(typecode, self._view[start:end])
+        numbers.byteswap()
+        return numbers
+
+# **** EOC
+
+
+def is_binary_export(file_name: str) -> bool:
+    """Tell binary export files from CSV files, by their extension.
+
+    :param file_name: Name of the export file
+    :type file_name: str
+
+    :return: True for a binary export file
+    :rtype: bool
+    """
+    return os.path.splitext(file_name)[1] == BINARY_SUFFIX
@@ -0,0 +1,205 @@
+"""The tw_frnds_ei command line, with a subcommand per program: export, import, schedule and log-server.
+
+Only the standard library is imported up front. The config, the logging and the Twitter client are loaded by the
+subcommand run, so ``--help``, argument errors and dry runs return without touching them.
+"""
+import argparse
+import os
+import sys
+from pathlib import Path
+from typing import List
+from typing import Optional
+
+# Same values as friends_exporter.EXPORT_ENGINES and EXPORT_WRITERS, not imported from there to keep the startup fast
+EXPORT_ENGINES = ("list", "ids")
+EXPORT_FORMATS = ("csv", "twfr")
+
+DEFAULT_SPOOL_DIR = "./data/spool"
+DEFAULT_LOG_SERVER_PORT = 9020
+
+# Config variables read by the programs, checked before running them
+LOGGING_VARS = ('APP_LOG_DIR', 'APP_LOG_FILENAME', 'LOG_LEVEL')
+EXPORT_VARS = LOGGING_VARS + ('EXP_DATA_DIR',)
+IMPORT_VARS = LOGGING_VARS + ('IMP_DATA_DIR',)
+LOG_SERVER_VARS = ('APP_LOG_DIR', 'APP_LOG_FILENAME')
+
+EXIT_OK = 0
+EXIT_ERROR = 1
+EXIT_BAD_CONFIG = 2
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run the command line.
+
+    :param argv: The arguments, without the program name. Defaults to the process arguments
+    :type argv: list of str
+
+    :return: The exit code
+    :rtype: int
+    """
+    from tw_frnds_ei.config_app import ConfigError
+    args = build_parser().parse_args(argv)
+    try:
+        return args.run(args)
+    except ConfigError as e:
+        # Bad config, like missing env vars
+        print(f"ERROR: {e}", file=sys.stderr)
+        return EXIT_BAD_CONFIG
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Build the argument parser of the command line.
+
+    :return: The parser. The parsed arguments have the function running the subcommand as ``run``
+    :rtype: argparse.ArgumentParser
+    """
+    arg_parser = argparse.ArgumentParser(prog="tw_frnds_ei",
+                                         description="Export the profiles a user follows on Twitter to a file and "
+                                                     "import them into another Twitter account.")
+    subparsers = arg_parser.add_subparsers(title="commands", required=True, metavar="COMMAND")
+
+    export_parser = subparsers.add_parser("export", help="Export the friends of a user",
+                                          description="Export the list of profiles a user follows on Twitter to a "
+                                                      "CSV file.")
+    export_parser.add_argument("OAUTH_USER_TOKEN")
+    export_parser.add_argument("OAUTH_USER_TOKEN_SECRET")
+    export_parser.add_argument("export_for_user")
+    export_parser.add_argument("--engine", choices=EXPORT_ENGINES, default=EXPORT_ENGINES[0],
+                               help="'list' retrieves 200 friends per request, "
+                                    "'ids' retrieves 5000 friend ids per request and then looks up their names")
+    export_parser.add_argument("--incremental", action="store_true",
+                               help="Only export the friends added and removed since the previous export of the user")
+    export_parser.add_argument("--format", choices=EXPORT_FORMATS, default=EXPORT_FORMATS[0],
+                               help="'csv' writes a CSV file, 'twfr' a compact binary file sorted by user id")
+    _add_run_arguments(export_parser)
+    export_parser.set_defaults(run=_run_export)
+
+    import_parser = subparsers.add_parser("import", help="Import the friends of a CSV file",
+                                          description="Import a list of users to follow on Twitter from a CSV file.")
+    import_parser.add_argument("OAUTH_USER_TOKEN")
+    import_parser.add_argument("OAUTH_USER_TOKEN_SECRET")
+    import_parser.add_argument("csv_file_name")
+    import_parser.add_argument("--resume", action="store_true",
+                               help="Resume a previous import of the same CSV file, skipping the rows already "
+                                    "processed")
+    _add_run_arguments(import_parser)
+    import_parser.set_defaults(run=_run_import)
+
+    schedule_parser = subparsers.add_parser("schedule", help="Run the import jobs of a spool directory",
+                                            description="Run many imports of users to follow on Twitter in one "
+                                                        "process, picking up import jobs dropped into a spool "
+                                                        "directory.")
+    schedule_parser.add_argument("--spool-dir", help=f"Defaults to SCHEDULER_SPOOL_DIR or {DEFAULT_SPOOL_DIR}")
+    schedule_parser.add_argument("--workers", type=int, default=4,
+                                 help="Max number of import steps (API requests) running at the same time")
+    schedule_parser.add_argument("--poll-seconds", type=float, default=10,
+                                 help="Seconds between checks of the spool directory for new jobs")
+    schedule_parser.add_argument("--until-idle", action="store_true",
+                                 help="Exit when there are no jobs left instead of waiting for new ones")
+    schedule_parser.add_argument("--metrics-port", type=int,
+                                 help="Serve the metrics over HTTP on this local port, in the Prometheus text format")
+    schedule_parser.add_argument("--metrics-file",
+                                 help="Write the run's metrics to this file, in the Prometheus text format. "
+                                      "Defaults to METRICS_FILE")
+    schedule_parser.set_defaults(run=_run_schedule)
+
+    log_server_parser = subparsers.add_parser("log-server", help="Write the logs of several processes",
+                                              description="Write the logs of several exporter, importer or scheduler "
+                                                          "processes to a single log file, as their only writer.")
+    log_server_parser.add_argument("--port", type=int,
+                                   help="Local port to listen on. The other processes need LOG_SERVER_PORT set to it. "
+                                        f"Defaults to LOG_SERVER_PORT or {DEFAULT_LOG_SERVER_PORT}")
+    log_server_parser.set_defaults(run=_run_log_server)
+
+    return arg_parser
+
+
+# ---------------
+# private methods
+# ---------------
+
+def _add_run_arguments(subparser):
+    subparser.add_argument("--metrics-file",
+                           help="Write the run's metrics to this file, in the Prometheus text format. "
+                                "Defaults to METRICS_FILE")
+    subparser.add_argument("--profile", action="store_true",
+                           help="Profile the run with cProfile and tracemalloc, writing the reports to the log dir")
+    subparser.add_argument("--dry-run", action="store_true",
+                           help="Check the config and the arguments and show what would be done, without calling "
+                                "Twitter")
+
+
+def _run_export(args):
+    env_config = _check_config(EXPORT_VARS)
+    if args.dry_run:
+        export_kind = "incremental" if args.incremental else "full"
+        print(f"Dry run: {export_kind} export of the friends of {args.export_for_user} with the '{args.engine}' "
+              f"engine to a '{args.format}' file in: {Path(env_config['EXP_DATA_DIR']).resolve()}")
+        return EXIT_OK
+
+    from tw_frnds_ei import main_exporter
+    ok, _, _ = main_exporter.main(args.OAUTH_USER_TOKEN, args.OAUTH_USER_TOKEN_SECRET, args.export_for_user,
+                                  args.engine, args.incremental, args.format,
+                                  args.metrics_file or env_config.get('METRICS_FILE'), args.profile)
+    return EXIT_OK if ok else EXIT_ERROR
+
+
+def _run_import(args):
+    env_config = _check_config(IMPORT_VARS)
+    if args.dry_run:
+        # The file is looked for in the subdir of the authenticated user, only known by asking Twitter
+        imp_data_path = Path(env_config['IMP_DATA_DIR']).resolve()
+        candidates = sorted(imp_data_path.glob(f"*/{args.csv_file_name}"))
+        if not candidates:
+            print(f"Dry run: no file named {args.csv_file_name} in the user dirs of: {imp_data_path}", file=sys.stderr)
+            return EXIT_ERROR
+        action = "Resume the import" if args.resume else "Import"
+        print(f"Dry run: {action} of {args.csv_file_name} from the dir of the authenticated user among: "
+              f"{[str(candidate.parent) for candidate in candidates]}")
+        return EXIT_OK
+
+    from tw_frnds_ei import main_importer
+    ok, _, _, _ = main_importer.main(args.OAUTH_USER_TOKEN, args.OAUTH_USER_TOKEN_SECRET, args.csv_file_name,
+                                     args.resume, args.metrics_file or env_config.get('METRICS_FILE'), args.profile)
+    return EXIT_OK if ok else EXIT_ERROR
+
+
+def _run_schedule(args):
+    env_config = _check_config(IMPORT_VARS)
+    from tw_frnds_ei import main_scheduler
+    main_scheduler.main(args.spool_dir or env_config.get('SCHEDULER_SPOOL_DIR', DEFAULT_SPOOL_DIR), args.workers,
+                        args.poll_seconds, args.until_idle, args.metrics_port,
+                        args.metrics_file or env_config.get('METRICS_FILE'))
+    return EXIT_OK
+
+
+def _run_log_server(args):
+    # The log server doesn't talk to Twitter, it needs no app credentials
+    env_config = _check_config(LOG_SERVER_VARS, credentials=False)
+    from tw_frnds_ei import main_log_server
+    main_log_server.main(args.port or env_config.getint('LOG_SERVER_PORT', fallback=DEFAULT_LOG_SERVER_PORT))
+    return EXIT_OK
+
+
+def _check_config(required_vars, credentials=True):
+    # Resolve the config needed by a program, failing early if it's incomplete: the .env file with the variables
+    # the program reads and, for the programs talking to Twitter, the app credentials
+    #
+    # Returns: the .env config
+    from tw_frnds_ei.config_app import ConfigError
+    from tw_frnds_ei.config_app import dot_env_file_path
+    from tw_frnds_ei.config_app import get_env_config
+    from tw_frnds_ei.config_auth import get_app_credentials
+    if not os.path.isfile(dot_env_file_path):
+        raise ConfigError(f"Missing config file: {dot_env_file_path}")
+    env_config = get_env_config()
+    missing_vars = [var for var in required_vars if not env_config.get(var)]
+    if missing_vars:
+        raise ConfigError(f"Missing variables in the config file {dot_env_file_path}: {missing_vars}")
+    if credentials:
+        get_app_credentials()
+    return env_config
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+import logging
+import socket
+import threading
+from typing import Dict
+
+from requests.adapters import HTTPAdapter
+from twython import Twython
+from urllib3.connection import HTTPConnection
+
+logger = logging.getLogger(__name__)
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """A requests adapter meant to be shared by many sessions, keeping count of the requests sent through it.
+
+    The sockets it opens have TCP keep-alive enabled, so that connections idle during long waits are less likely to
+    be silently dropped along the way.
+    """
+
+    SOCKET_OPTIONS = HTTPConnection.default_socket_options + [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+
+    def __init__(self, *args, **kwargs) -> None:
+        self.requests_sent = 0
+        self._count_lock = threading.Lock()
+        super().__init__(*args, **kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs.setdefault('socket_options', self.SOCKET_OPTIONS)
+        super().init_poolmanager(*args, **kwargs)
+
+    def send(self, request, *args, **kwargs):
+        with self._count_lock:
+            self.requests_sent += 1
+        return super().send(request, *args, **kwargs)
+
+    def close(self):
+        # Sessions close their adapters when closed. The pool outlives the sessions sharing it
+        pass
+
+    def close_pool(self) -> None:
+        """Close every connection of the pool."""
+        super().close()
+
+# **** EOC
+
+
+class TwitterClientFactory:
+    """Hands out per user OAuth Twython clients that share a single keep-alive connection pool.
+
+    Every Twython client has its own requests session, so by default it opens (and TLS handshakes) its own connections.
+    The clients created by a factory send their requests through the same size bounded pool instead: connections
+    opened for a user are reused for the next ones.
+
+    :param app_key: The Twitter application's API key
+    :type app_key: str
+
+    :param app_secret: The Twitter application's API secret
+    :type app_secret: str
+
+    :param pool_maxsize: Max number of connections kept open per host. Requests beyond it wait for a free connection
+    :type pool_maxsize: int
+
+    :param pool_connections: Max number of hosts to keep a pool of connections for
+    :type pool_connections: int
+    """
+
+    def __init__(self, app_key: str, app_secret: str, pool_maxsize: int = 10, pool_connections: int = 2) -> None:
+        self.app_key = app_key
+        self.app_secret = app_secret
+        self.adapter = PooledHTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+                                         pool_block=True)
+        self.clients_created = 0
+
+    def __call__(self, oauth_user_token: str, oauth_user_token_secret: str) -> Twython:
+        """Create a Twython client for a user, on top of the shared connection pool.
+
+        :param oauth_user_token: The user's OAuth token
+        :type oauth_user_token: str
+
+        :param oauth_user_token_secret: The user's OAuth token secret
+        :type oauth_user_token_secret: str
+
+        :return: The client
+        :rtype: twython.Twython
+        """
+        cli = Twython(self.app_key, self.app_secret, oauth_user_token, oauth_user_token_secret)
+        cli.client.mount("https://", self.adapter)
+        cli.client.mount("http://", self.adapter)
+        self.clients_created += 1
+        return cli
+
+    def pool_stats(self) -> Dict[str, int]:
+        """Figures of the shared connection pool.
+
+        :return: dict with the number of clients created, requests sent, connections opened,
+        connections currently idle in the pool and hosts with a pool
+        :rtype: dict
+        """
+        pools = self.adapter.poolmanager.pools
+        host_pools = [pool for pool in (pools.get(key) for key in pools.keys()) if pool]
+        # the queue of a pool is filled up with None placeholders for the connections not opened yet
+        idle_connections = [conn for pool in host_pools if pool.pool for conn in list(pool.pool.queue) if conn]
+        return {'clients_created': self.clients_created,
+                'requests_sent': self.adapter.requests_sent,
+                'connections_opened': sum(pool.num_connections for pool in host_pools),
+                'idle_connections': len(idle_connections),
+                'host_pools': len(host_pools)}
+
+    def close(self) -> None:
+        """Close the connections of the shared pool."""
+        logger.info(f"Closing the shared connection pool. Stats: {self.pool_stats()}")
+        self.adapter.close_pool()
+
+# **** EOC
@@ -0,0 +1,105 @@
+import asyncio
+import threading
+import time
+from abc import ABC
+from abc import abstractmethod
+from typing import Optional
+
+
+class Clock(ABC):
+    """The source of time and of timed waits used by the waiters, the rate limiters and the retry logic.
+
+    Components take a clock as an optional parameter and default to SYSTEM_CLOCK, so that a simulation (or a test)
+    can swap in a VirtualClock and run through days of waits in no time. A clock missing any of the methods can't be
+    instantiated.
+    """
+
+    @abstractmethod
+    def time(self) -> float:
+        """Wall clock time, in seconds since the epoch."""
+
+    @abstractmethod
+    def monotonic(self) -> float:
+        """Monotonic time in seconds, for measuring elapsed time."""
+
+    @abstractmethod
+    def wait(self, event: threading.Event, timeout: float) -> bool:
+        """Wait until the event is set or the timeout expires.
+
+        :return: True if the event was set, False if the wait timed out
+        """
+
+    @abstractmethod
+    async def async_wait(self, event: asyncio.Event, timeout: float) -> bool:
+        """Wait until the asyncio event is set or the timeout expires.
+
+        :return: True if the event was set, False if the wait timed out
+        """
+
+# **** EOC
+
+
+class SystemClock(Clock):
+    """The real clock: waits block the thread (or the task) for real."""
+
+    def time(self) -> float:
+        return time.time()
+
+    def monotonic(self) -> float:
+        return time.monotonic()
+
+    def wait(self, event: threading.Event, timeout: float) -> bool:
+        return event.wait(timeout=timeout)
+
+    async def async_wait(self, event: asyncio.Event, timeout: float) -> bool:
+        try:
+            await asyncio.wait_for(event.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        return event.is_set()
+
+# **** EOC
+
+
+class VirtualClock(Clock):
+    """A simulated clock: time only moves forward when someone waits on it, and waits return straight away.
+
+    A wait on an event already set returns without moving time. Otherwise time jumps to the end of the wait.
+
+    :param start: Initial time, in seconds since the epoch. Defaults to the current time
+    :type start: float
+    """
+
+    def __init__(self, start: Optional[float] = None) -> None:
+        self._now = time.time() if start is None else start
+        self._start = self._now
+        self._lock = threading.Lock()
+
+    def time(self) -> float:
+        return self._now
+
+    def monotonic(self) -> float:
+        return self._now - self._start
+
+    def advance(self, seconds: float) -> None:
+        """Move time forward."""
+        with self._lock:
+            self._now += max(seconds, 0)
+
+    def wait(self, event: threading.Event, timeout: float) -> bool:
+        if event.is_set():
+            return True
+        self.advance(timeout)
+        return event.is_set()
+
+    async def async_wait(self, event: asyncio.Event, timeout: float) -> bool:
+        if event.is_set():
+            return True
+        self.advance(timeout)
+        await asyncio.sleep(0)  # let other tasks run, as a real wait would
+        return event.is_set()
+
+# **** EOC
+
+
+SYSTEM_CLOCK = SystemClock()
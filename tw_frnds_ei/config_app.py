@@ -1,10 +1,49 @@
 import configparser
+import functools
 import pathlib
 
 dot_env_file_path = pathlib.Path(__file__).resolve().parents[1].joinpath('.env')
 
-config = configparser.ConfigParser()
-config.read_file(open(dot_env_file_path))
-env_config = config['DEFAULT']
+DEFAULT_MAX_NUM_FRIENDS = 3000
 
-MAX_NUM_FRIENDS = 3000
+
+class ConfigError(ValueError):
+    """Raised when the config of the application is missing or incomplete."""
+
+
+@functools.lru_cache(maxsize=None)
+def get_env_config() -> configparser.SectionProxy:
+    """The application config of the .env file, read on first use only.
+
+    :return: The variables of the .env file
+    :rtype: configparser.SectionProxy
+
+    :raises ConfigError: if the file can't be parsed
+    """
+    config = configparser.ConfigParser()
+    with open(dot_env_file_path) as dot_env_file:
+        try:
+            config.read_file(dot_env_file)
+        except configparser.Error as e:
+            raise ConfigError(f"Bad config file {dot_env_file_path}: {e}") from e
+    return config['DEFAULT']
+
+
+def get_max_num_friends() -> int:
+    """Max number of friends that can be exported or imported, read from the .env file when called.
+
+    It can be raised in the .env file for the 'ids' engine.
+
+    :return: The MAX_NUM_FRIENDS variable of the .env file, or DEFAULT_MAX_NUM_FRIENDS when not set
+    :rtype: int
+    """
+    return get_env_config().getint('MAX_NUM_FRIENDS', fallback=DEFAULT_MAX_NUM_FRIENDS)
+
+
+def __getattr__(name):
+    # env_config and MAX_NUM_FRIENDS are resolved when first used, so that importing this module doesn't read the file
+    if name == 'env_config':
+        return get_env_config()
+    if name == 'MAX_NUM_FRIENDS':
+        return get_max_num_friends()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,15 +1,40 @@
+import functools
 import os
+from typing import Tuple
 
-missing_env_vars = []
+from tw_frnds_ei.config_app import ConfigError
 
-APP_KEY = os.getenv("TW_FRNDS_EI_APP_KEY")
-if not APP_KEY:
-    missing_env_vars.append("TW_FRNDS_EI_APP_KEY")
 
-APP_SECRET = os.getenv("TW_FRNDS_EI_APP_SECRET")
-if not APP_SECRET:
-    missing_env_vars.append("TW_FRNDS_EI_APP_SECRET")
+@functools.lru_cache(maxsize=None)
+def get_app_credentials() -> Tuple[str, str]:
+    """The Twitter app key and secret, from the environment.
 
-if len(missing_env_vars) > 0:
-    message = f"Missing env vars: {missing_env_vars}"
-    raise ValueError(message)
+    :return: The app key and the app secret
+    :rtype: tuple
+
+    :raises ConfigError: if any of them is missing
+    """
+    missing_env_vars = []
+
+    app_key = os.getenv("TW_FRNDS_EI_APP_KEY")
+    if not app_key:
+        missing_env_vars.append("TW_FRNDS_EI_APP_KEY")
+
+    app_secret = os.getenv("TW_FRNDS_EI_APP_SECRET")
+    if not app_secret:
+        missing_env_vars.append("TW_FRNDS_EI_APP_SECRET")
+
+    if not app_key or not app_secret:
+        message = f"Missing env vars: {missing_env_vars}"
+        raise ConfigError(message)
+
+    return app_key, app_secret
+
+
+def __getattr__(name):
+    # APP_KEY and APP_SECRET are checked when first used, not when importing this module
+    if name == 'APP_KEY':
+        return get_app_credentials()[0]
+    if name == 'APP_SECRET':
+        return get_app_credentials()[1]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
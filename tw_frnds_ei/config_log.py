@@ -1,31 +1,70 @@
+import atexit
+import functools
 import logging.config
 import pathlib
-from logging import Formatter
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueListener
+from logging.handlers import SocketHandler
+from typing import Optional
 
-from tw_frnds_ei.config_app import env_config
+from tw_frnds_ei.config_app import get_env_config
+from tw_frnds_ei.log_handlers import create_file_handler
+from tw_frnds_ei.log_handlers import per_process_file_name
+from tw_frnds_ei.log_handlers import start_queue_listener
 
-LOG_FILE = env_config['APP_LOG_DIR'] + env_config['APP_LOG_FILENAME']
-LOG_FORMAT = '%(asctime)s %(levelname)s %(name)s - %(message)s'
-LOG_LEVEL = env_config['LOG_LEVEL']
+root_logger = logging.root
+log_queue_listener: Optional[QueueListener] = None
 
-pathlib.Path(env_config['APP_LOG_DIR']).mkdir(parents=True, exist_ok=True)
 
-root_logger = logging.root
+@functools.lru_cache(maxsize=None)
+def setup_logging() -> str:
+    """Set up the application's logging from the .env config, once per process.
+
+    Config variables:
+     * ``LOG_LEVEL``, ``APP_LOG_DIR``, ``APP_LOG_FILENAME``: level and file of the logs
+     * ``LOG_OUTPUT``: 'text' or 'json' (one JSON object per line)
+     * ``LOG_QUEUE``: log through an in-memory queue drained by a background thread (the default), so that logging
+       never blocks the callers
+     * ``LOG_FILE_PER_PROCESS``: several processes logging to the same dir get one log file per process...
+     * ``LOG_SERVER_PORT``: ... or send their logs to the log server listening on this local port (see main_log_server)
+
+    :return: The log file name (or where the logs are sent to)
+    :rtype: str
+    """
+    global log_queue_listener
+    env_config = get_env_config()
+    log_file = env_config['APP_LOG_DIR'] + env_config['APP_LOG_FILENAME']
+    log_server_port = env_config.getint('LOG_SERVER_PORT', fallback=None)
+
+    pathlib.Path(env_config['APP_LOG_DIR']).mkdir(parents=True, exist_ok=True)
+
+    if env_config.getboolean('LOG_FILE_PER_PROCESS', fallback=False):
+        log_file = per_process_file_name(log_file)
+
+    if not root_logger.hasHandlers():
+        root_logger.setLevel(logging.getLevelName(env_config['LOG_LEVEL']))
+        logging_handler: logging.Handler
+        if log_server_port:
+            logging_handler = SocketHandler("127.0.0.1", log_server_port)
+        else:
+            logging_handler = create_file_handler(log_file, env_config.get('LOG_OUTPUT', 'text'))
+        if env_config.getboolean('LOG_QUEUE', fallback=True):
+            logging_handler, log_queue_listener = start_queue_listener(logging_handler)
+            # Flush the records still queued on exit (before logging's own shutdown, registered earlier)
+            atexit.register(log_queue_listener.stop)
+        root_logger.addHandler(logging_handler)
+
+    logging.getLogger("requests").setLevel(logging.WARNING)
+    logging.getLogger("urllib3").setLevel(logging.WARNING)
+    logging.getLogger("oauthlib").setLevel(logging.WARNING)
+    logging.getLogger("requests_oauthlib").setLevel(logging.WARNING)
+
+    if log_server_port:
+        return f"the log server's file (tcp://127.0.0.1:{log_server_port})"
+    return str(pathlib.Path(log_file).resolve())
+
 
-if not root_logger.hasHandlers():
-    root_logger.setLevel(logging.getLevelName(LOG_LEVEL))
-    logging_file_handler = RotatingFileHandler(filename=LOG_FILE,
-                                               mode="a",
-                                               encoding="UTF-8",
-                                               maxBytes=10485760,  # 10MB
-                                               backupCount=9)
-    logging_file_handler.setFormatter(Formatter(LOG_FORMAT))
-    root_logger.addHandler(logging_file_handler)
-
-LOG_BASE_FILE_NAME = root_logger.handlers[0].baseFilename
-
-logging.getLogger("requests").setLevel(logging.WARNING)
-logging.getLogger("urllib3").setLevel(logging.WARNING)
-logging.getLogger("oauthlib").setLevel(logging.WARNING)
-logging.getLogger("requests_oauthlib").setLevel(logging.WARNING)
+def __getattr__(name):
+    # Logging is set up when the log file name is first asked for, not when importing this module
+    if name == 'LOG_BASE_FILE_NAME':
+        return setup_logging()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
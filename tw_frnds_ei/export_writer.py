@@ -0,0 +1,201 @@
+import csv
+import logging
+import os
+from abc import ABC
+from abc import abstractmethod
+from pathlib import Path
+from typing import Iterable
+from typing import Optional
+from typing import Tuple
+
+from tw_frnds_ei.binary_export import write_friends
+from tw_frnds_ei.friend_table import FriendTable
+
+logger = logging.getLogger(__name__)
+
+
+class ExportWriter(ABC):
+    """Writes the friends of an export to a file, one page at a time, committing or aborting the file at the end.
+
+    The file is written to a temporary ``.part`` file next to the final one until the export is committed.
+
+    :param file_path: Full path of the file to produce
+    :type file_path: pathlib.Path
+    """
+
+    TEMP_SUFFIX = ".part"
+
+    def __init__(self, file_path: Path) -> None:
+        self.file_path = file_path
+        self.temp_file_path = file_path.with_name(file_path.name + self.TEMP_SUFFIX)
+        self.rows_written = 0
+
+    @abstractmethod
+    def write_page(self, friends: Iterable[Tuple[str, int]]) -> None:
+        """Add a page of friends (screen name, user id) to the export."""
+
+    @abstractmethod
+    def commit(self) -> str:
+        """Finish the file and move it to its final name. Returns its full path."""
+
+    @abstractmethod
+    def abort(self) -> Optional[str]:
+        """Stop without committing the file. Returns the full path of the partial file kept on disk, if any."""
+
+# **** EOC
+
+
+class CsvExportWriter(ExportWriter):
+    """Write an export CSV file incrementally, one page of friends at a time.
+
+    Rows are written to a temporary ``.part`` file next to the final file. Each page is flushed as soon as it is
+    written, so a partial export is left on disk if the process fails. Only when the export is committed the temporary
+    file is atomically renamed to its final name.
+
+    :param file_path: Full path of the CSV file to produce
+    :type file_path: pathlib.Path
+    """
+
+    def __init__(self, file_path: Path) -> None:
+        """Constructor.
+
+        Opens the temporary file for writing.
+        """
+        super().__init__(file_path)
+        self._csv_file = open(self.temp_file_path, 'w', newline='')
+        self._writer = csv.writer(self._csv_file, delimiter=',', quotechar='"', quoting=csv.QUOTE_NONNUMERIC)
+
+    def write_page(self, friends: Iterable[Tuple[str, int]]) -> None:
+        """Append a page of friends (screen name, user id) to the file and flush it.
+
+        :param friends: The friends to write
+        :type friends: iterable of (str, int)
+        """
+        for screen_name, fr_id in friends:
+            self._writer.writerow([screen_name, fr_id])
+            self.rows_written += 1
+        self._csv_file.flush()
+
+    def commit(self) -> str:
+        """Close the temporary file and move it to its final name.
+
+        :return: The full absolute path and file name of the generated CSV file
+        :rtype: str
+        """
+        self._csv_file.flush()
+        os.fsync(self._csv_file.fileno())
+        self._csv_file.close()
+        os.replace(self.temp_file_path, self.file_path)
+        logger.debug(f"Committed {self.rows_written} rows to CSV file: {self.file_path}")
+        return os.path.realpath(self.file_path)
+
+    def abort(self) -> Optional[str]:
+        """Close the temporary file without committing it.
+
+        The partial file is kept for inspection unless nothing was written to it.
+
+        :return: The full path of the partial file kept on disk, if any
+        :rtype: str
+        """
+        self._csv_file.close()
+        if self.rows_written == 0:
+            os.remove(self.temp_file_path)
+            return None
+        logger.debug(f"Kept partial export with {self.rows_written} rows: {self.temp_file_path}")
+        return os.path.realpath(self.temp_file_path)
+
+# **** EOC
+
+
+class CsvDeltaWriter(CsvExportWriter):
+    """Write the changes in the friends of a profile since a previous export, in the same incremental way.
+
+    Each row holds the change (ADDED or REMOVED), the screen name and the user id of a friend.
+
+    :param file_path: Full path of the CSV file to produce
+    :type file_path: pathlib.Path
+    """
+
+    ADDED = "+"
+    REMOVED = "-"
+
+    def write_changes(self, change: str, friends: Iterable[Tuple[str, int]]) -> None:
+        """Append the friends (screen name, user id) with a change to the file and flush it.
+
+        :param change: ADDED or REMOVED
+        :type change: str
+
+        :param friends: The friends to write
+        :type friends: iterable of (str, int)
+        """
+        for screen_name, fr_id in friends:
+            self._writer.writerow([change, screen_name, fr_id])
+            self.rows_written += 1
+        self._csv_file.flush()
+
+# **** EOC
+
+
+class BinaryExportWriter(ExportWriter):
+    """Write an export in the binary format, sorted by user id, with the same interface as the CSV writer.
+
+    Unlike the CSV writer, this writer doesn't stream: the friends are sorted when the export is committed, so every
+    page written is held in memory until then, in a FriendTable (an array of ids plus the interned screen names). That
+    is about 110 bytes per friend (see the friend_memory benchmark): some 330 KB for the default ceiling of 3000
+    friends, 110 MB for a million. The memory used is bounded by the MAX_NUM_FRIENDS ceiling of the exporter; use
+    the CSV format for exports too large to hold in memory. Nothing is written to disk until the export is
+    committed (or aborted): the file is written to a temporary ``.part`` file and atomically renamed to its final
+    name.
+
+    :param file_path: Full path of the binary file to produce
+    :type file_path: pathlib.Path
+    """
+
+    def __init__(self, file_path: Path) -> None:
+        super().__init__(file_path)
+        self._friends = FriendTable()
+
+    def write_page(self, friends: Iterable[Tuple[str, int]]) -> None:
+        """Add a page of friends (screen name, user id) to the export.
+
+        :param friends: The friends to write
+        :type friends: iterable of (str, int)
+        """
+        for screen_name, fr_id in friends:
+            self._friends.append(screen_name, fr_id)
+            self.rows_written += 1
+
+    def commit(self) -> str:
+        """Write the file and move it to its final name.
+
+        :return: The full absolute path and file name of the generated binary file
+        :rtype: str
+        """
+        self._write_temp_file()
+        os.replace(self.temp_file_path, self.file_path)
+        logger.debug(f"Committed {self.rows_written} rows to binary file: {self.file_path}")
+        return os.path.realpath(self.file_path)
+
+    def abort(self) -> Optional[str]:
+        """Write the friends added so far to the temporary file without committing it, for inspection.
+
+        :return: The full path of the partial file kept on disk, if any
+        :rtype: str
+        """
+        if self.rows_written == 0:
+            return None
+        self._write_temp_file()
+        logger.debug(f"Kept partial export with {self.rows_written} rows: {self.temp_file_path}")
+        return os.path.realpath(self.temp_file_path)
+
+    # ---------------
+    # private methods
+    # ---------------
+
+    def _write_temp_file(self):
+        with open(self.temp_file_path, 'wb') as binary_file:
+            write_friends(binary_file, self._friends.ids, self._friends.screen_names)
+            binary_file.flush()
+            os.fsync(binary_file.fileno())
+
+# **** EOC
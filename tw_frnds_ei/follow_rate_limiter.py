@@ -0,0 +1,118 @@
+import json
+import logging
+import os
+from collections import deque
+from pathlib import Path
+from typing import Optional
+
+from tw_frnds_ei.clock import SYSTEM_CLOCK
+from tw_frnds_ei.clock import Clock
+from tw_frnds_ei.screen_name_logger import ScreenNameLogger
+
+logger = logging.getLogger(__name__)
+
+
+class FollowRateLimiter:
+    """A sliding window rate limiter for the friendship requests sent on behalf of a Twitter account.
+
+    It keeps the timestamps of the friendship requests actually sent within the last window (24h by default) and
+    releases a new request as soon as the window has room for it. The timestamps are persisted per account, so that
+    back to back imports for the same account share the same budget.
+
+    :param state_dir: Directory holding a subdirectory per account, where the state file is kept
+    :type state_dir: str
+
+    :param user_screen_name: Screen name of the account sending the friendship requests
+    :type user_screen_name: str
+
+    :param max_requests: Max number of requests allowed within the window
+    :type max_requests: int
+
+    :param window_seconds: Length of the sliding window in seconds
+    :type window_seconds: int
+
+    :param min_interval_seconds: Min number of seconds between two consecutive requests
+    :type min_interval_seconds: int
+
+    :param clock: Clock giving the time of the requests. Defaults to the system clock
+    :type clock: tw_frnds_ei.clock.Clock
+    """
+
+    STATE_FILE_NAME = ".follow_requests.json"
+
+    def __init__(self,
+                 state_dir: str,
+                 user_screen_name: str,
+                 max_requests: int = 400,
+                 window_seconds: int = 24 * 3600,
+                 min_interval_seconds: int = 2,
+                 clock: Optional[Clock] = None) -> None:
+        """Constructor.
+
+        Loads the timestamps persisted by previous runs for the account.
+        """
+        state_path = Path(state_dir).joinpath(user_screen_name).resolve()
+        state_path.mkdir(parents=True, exist_ok=True)
+        self.state_path_file = state_path.joinpath(self.STATE_FILE_NAME)
+        self.max_requests = max_requests
+        self.window_seconds = window_seconds
+        self.min_interval_seconds = min_interval_seconds
+        self.clock = clock if clock else SYSTEM_CLOCK
+        self.ulog = ScreenNameLogger(logger=logger, screen_name=user_screen_name)
+        # Only the most recent max_requests timestamps can ever hold back a new request
+        self.request_timestamps = deque(self._load_timestamps(), maxlen=self.max_requests)
+
+    def seconds_until_available(self) -> float:
+        """Calculate how long to wait before the next request can be sent.
+
+        :return: Number of seconds to wait, 0 if a request can be sent right away
+        :rtype: float
+        """
+        now = self.clock.time()
+        self._discard_expired(now)
+        if not self.request_timestamps:
+            return 0
+
+        seconds_to_wait = self.request_timestamps[-1] + self.min_interval_seconds - now
+        if len(self.request_timestamps) >= self.max_requests:
+            window_full_wait = self.request_timestamps[0] + self.window_seconds - now
+            seconds_to_wait = max(seconds_to_wait, window_full_wait)
+        return max(seconds_to_wait, 0)
+
+    def record_request(self) -> None:
+        """Record that a request was just sent and persist the window."""
+        now = self.clock.time()
+        self.request_timestamps.append(now)
+        self._discard_expired(now)
+        self._save_timestamps()
+
+    # ---------------
+    # private methods
+    # ---------------
+
+    def _discard_expired(self, now):
+        while self.request_timestamps and self.request_timestamps[0] <= now - self.window_seconds:
+            self.request_timestamps.popleft()
+
+    def _load_timestamps(self):
+        # Returns: list of the persisted timestamps, oldest first
+        if not self.state_path_file.exists():
+            self.ulog.debug(f"No previous friendship requests recorded in: {self.state_path_file}")
+            return []
+        try:
+            with open(self.state_path_file, 'r', encoding="UTF-8") as state_file:
+                timestamps = sorted(float(ts) for ts in json.load(state_file)['request_timestamps'])
+        except (ValueError, KeyError, TypeError):
+            self.ulog.warn(f"Ignoring unreadable friendship requests state file: {self.state_path_file}")
+            return []
+        self.ulog.debug(f"Loaded {len(timestamps)} previous friendship requests from: {self.state_path_file}")
+        return timestamps
+
+    def _save_timestamps(self):
+        # Write to a temporary file and rename it, so that the state file is never left half written
+        temp_path_file = self.state_path_file.with_name(self.state_path_file.name + ".tmp")
+        with open(temp_path_file, 'w', encoding="UTF-8") as state_file:
+            json.dump({'request_timestamps': list(self.request_timestamps)}, state_file)
+        os.replace(temp_path_file, self.state_path_file)
+
+# **** EOC
@@ -0,0 +1,124 @@
+import sys
+from array import array
+from typing import Iterable
+from typing import Iterator
+from typing import List
+from typing import Sequence
+from typing import Tuple
+
+
+class FriendRecord:
+    """A friend: a Twitter user name and user id.
+
+    A small object with slots instead of a dict, but it can be read like the ``{'screen_name': ..., 'fr_id': ...}``
+    dicts the friends used to be (``friend['fr_id']``, ``dict(friend)``).
+
+    :param screen_name: The Twitter user name
+    :type screen_name: str
+
+    :param fr_id: The Twitter user id
+    :type fr_id: int
+    """
+
+    __slots__ = ('screen_name', 'fr_id')
+
+    FIELDS = ('screen_name', 'fr_id')
+
+    def __init__(self, screen_name: str, fr_id: int) -> None:
+        self.screen_name = screen_name
+        self.fr_id = fr_id
+
+    def keys(self) -> Tuple[str, ...]:
+        return self.FIELDS
+
+    def __getitem__(self, field):
+        if field not in self.FIELDS:
+            raise KeyError(field)
+        return getattr(self, field)
+
+    def __eq__(self, other):
+        if isinstance(other, FriendRecord):
+            return self.screen_name == other.screen_name and self.fr_id == other.fr_id
+        if isinstance(other, dict):
+            return other == dict(self)
+        return NotImplemented
+
+    def __hash__(self):
+        return hash((self.screen_name, self.fr_id))
+
+    def __repr__(self):
+        return f"FriendRecord(screen_name={self.screen_name}, fr_id={self.fr_id})"
+
+# **** EOC
+
+
+class FriendTable(Sequence[FriendRecord]):
+    """A compact list of friends: the user ids in an array of 64-bit integers, the user names in a list of interned
+    strings.
+
+    A row costs 8 bytes for its id plus a list slot for its name, instead of a dict (or a tuple) per friend. The
+    names are interned, so the same friend in several tables of the process (e.g. the imports of several users
+    following the same accounts) shares a single string. The rows read by index or iteration are FriendRecords,
+    created on access.
+
+    :param rows: The initial friends, as (screen name, user id) pairs
+    :type rows: iterable of (str, int)
+    """
+
+    def __init__(self, rows: Iterable[Tuple[str, int]] = ()) -> None:
+        self.ids = array('q')
+        self.screen_names: List[str] = []
+        self.extend(rows)
+
+    @classmethod
+    def from_columns(cls, screen_names: Iterable[str], ids: Iterable[int]) -> 'FriendTable':
+        """Create a table from its columns, of the same length.
+
+        :param screen_names: The user names
+        :type screen_names: iterable of str
+
+        :param ids: The user ids, in the same order
+        :type ids: iterable of int (an array('q') or a buffer of int64 is copied at once)
+
+        :return: The table
+        :rtype: FriendTable
+        """
+        table = cls()
+        if isinstance(ids, (array, memoryview)):
+            table.ids.frombytes(memoryview(ids).cast('B'))
+        else:
+            table.ids.extend(ids)
+        table.screen_names.extend(sys.intern(screen_name) for screen_name in screen_names)
+        if len(table.ids) != len(table.screen_names):
+            raise ValueError(f"{len(table.screen_names)} screen names for {len(table.ids)} ids")
+        return table
+
+    def append(self, screen_name: str, fr_id: int) -> None:
+        """Add a friend at the end of the table."""
+        self.ids.append(fr_id)
+        self.screen_names.append(sys.intern(screen_name))
+
+    def extend(self, rows: Iterable[Tuple[str, int]]) -> None:
+        """Add friends, as (screen name, user id) pairs, at the end of the table."""
+        for screen_name, fr_id in rows:
+            self.append(screen_name, fr_id)
+
+    def rows(self) -> Iterator[Tuple[str, int]]:
+        """The friends as (screen name, user id) pairs, without creating records."""
+        return zip(self.screen_names, self.ids)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return FriendTable.from_columns(self.screen_names[index], self.ids[index])
+        return FriendRecord(self.screen_names[index], self.ids[index])
+
+    def __iter__(self):
+        return (FriendRecord(screen_name, fr_id) for screen_name, fr_id in zip(self.screen_names, self.ids))
+
+    def __repr__(self):
+        return f"FriendTable({len(self)} friends)"
+
+# **** EOC
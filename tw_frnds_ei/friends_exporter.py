@@ -1,24 +1,55 @@
 import csv
 import logging
-import os
+import math
+import re
 import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict
 from typing import Optional
 from typing import Tuple
+from typing import Type
 
 from pathlib import Path
 from twython import Twython
 from twython import TwythonError
-from twython import TwythonRateLimitError
 
-from tw_frnds_ei.config_app import MAX_NUM_FRIENDS as MAX_NUM_FRIENDS
+from tw_frnds_ei.binary_export import BINARY_SUFFIX
+from tw_frnds_ei.binary_export import BinaryFriendsFile
+from tw_frnds_ei.clock import SYSTEM_CLOCK
+from tw_frnds_ei.clock import Clock
+from tw_frnds_ei.config_app import get_max_num_friends
+from tw_frnds_ei.export_writer import BinaryExportWriter
+from tw_frnds_ei.export_writer import CsvDeltaWriter
+from tw_frnds_ei.export_writer import CsvExportWriter
+from tw_frnds_ei.export_writer import ExportWriter
+from tw_frnds_ei.friend_table import FriendTable
+from tw_frnds_ei.metrics import RETRIES
+from tw_frnds_ei.metrics import ROWS
+from tw_frnds_ei.retry_policy import ACTION_ABORT
+from tw_frnds_ei.retry_policy import ACTION_WAIT_FOR_RESET
+from tw_frnds_ei.retry_policy import EXPORT_ERROR_RULES
+from tw_frnds_ei.retry_policy import RetryBudget
+from tw_frnds_ei.retry_policy import RetryPolicy
 from tw_frnds_ei.screen_name_logger import ScreenNameLogger
+from tw_frnds_ei.tracing import Tracer
+from tw_frnds_ei.waiter import WaitCancelledError
 from tw_frnds_ei.waiter import Waiter
 
 logger = logging.getLogger(__name__)
 
 
-def do_export(cli: Twython, data_dir: str, export_for_user: str = None) -> Tuple[bool, Optional[str], Optional[str]]:
-    """Instantiate a new FriendsExporter and trigger the export process.
+ENGINE_LIST = "list"
+ENGINE_IDS = "ids"
+
+FORMAT_CSV = "csv"
+FORMAT_BINARY = "twfr"
+
+
+def do_export(cli: Twython, data_dir: str, export_for_user: Optional[str] = None, engine: str = ENGINE_LIST,
+              clock: Optional[Clock] = None, incremental: bool = False, file_format: str = FORMAT_CSV) \
+        -> Tuple[bool, Optional[str], Optional[str]]:
+    """Instantiate a new exporter for the chosen export engine and trigger the export process.
 
     :param cli: A Tython client already containing authentication data
     :type cli: twython.Twython
@@ -29,13 +60,29 @@ def do_export(cli: Twython, data_dir: str, export_for_user: str = None) -> Tuple
     :param export_for_user: The tw user screen name for whom to export friends (defaults to authenticated user)
     :type: export_for_user: str, optional
 
+    :param engine: The export engine: 'list' (friends/list, 200 friends per page) or 'ids' (friends/ids,
+    5000 friend ids per page, plus users/lookup to get the screen names)
+    :type: engine: str, optional
+
+    :param clock: Clock for the waits of the process. Defaults to the system clock
+    :type: clock: tw_frnds_ei.clock.Clock, optional
+
+    :param incremental: Only export the changes since the previous export of the same profile. The engine is
+    then ignored: friend ids are retrieved and only the new friends are looked up
+    :type: incremental: bool, optional
+
+    :param file_format: The format of the export file: 'csv' or 'twfr' (binary, sorted by user id)
+    :type: file_format: str, optional
+
     :return: The result of the process. It includes boolean OK/NOK, potential
-    error message for the user, potential file name location (if export successful)
+    error message for the user, potential file name location (if export successful and some file was generated)
     :rtype: (bool, str, str)
     """
-    exporter = FriendsExporter(cli, data_dir, export_for_user)
+    exporter_class = FriendsDeltaExporter if incremental else EXPORT_ENGINES[engine]
+    exporter = exporter_class(cli, data_dir, export_for_user, clock=clock, file_format=file_format)
     exporter.ulog.info("Exporter created!")
     result = exporter.process()
+    exporter.ulog.info(exporter.tracer.format_breakdown())
     exporter.ulog.info("Exporter finished!")
     exporter.ulog.info("------------------\n\n")
     return result
@@ -45,19 +92,42 @@ class FriendsExporter:
     """A class encapsulating state and methods for producing a CSV file export containing Twitter friends.
 
     The generated CSV file will contain the user name and user ids of all friends ("followees") of a given Twitter
-    user name or by default the friends of the authenticated user.
+    user name or by default the friends of the authenticated user. Each page of friends is written to the file as
+    soon as it is retrieved from Twitter.
+
+    The time spent in API calls, waits and writing the file is traced, for a timing breakdown of the run.
 
     :param cli: Twython client already instantiated with authentication tokens
     :type cli: twython.Twython
 
     :param data_dir: Directory to drop the CSV file into
     :type data_dir: str
-    """
 
-    MAX_CURSOR_ITERATIONS = 15  # Max number of data pages to retrieve from Twitter
-    RETRY_SLEEP_CHECK_EVERY_SECS = 30  # Number of seconds for the retry waiter to periodically check the clock
+    :param clock: Clock for the waits for rate limit resets. Defaults to the system clock
+    :type clock: tw_frnds_ei.clock.Clock
 
-    def __init__(self, cli: Twython, data_dir: str, export_for_user: str = None) -> None:
+    :param file_format: Format of the file: 'csv' (by default) or 'twfr' (binary, sorted by user id)
+    :type file_format: str
+
+    :param max_num_friends: Max number of friends that can be exported. Defaults to the MAX_NUM_FRIENDS of the
+    .env file, read when the exporter is created
+    :type max_num_friends: int
+    """
+
+    PAGE_SIZE = 200  # Max number of friends Twitter returns per data page
+    RETRY_SHORT_SECONDS_TO_WAIT = 5  # First backoff wait before retrying after a transient error
+    RETRY_LONG_SECONDS_TO_WAIT = 300  # Longest backoff wait (5 minutes)
+    MAX_RETRIES = 3  # Max number of retries of a request, counted again once the retrieval moves on
+    RETRY_BUDGET_RETRIES = 10  # Max number of retries of a whole export
+    RETRY_BUDGET_SECONDS = 3600  # Max time a whole export may spend waiting before retrying
+
+    def __init__(self,
+                 cli: Twython,
+                 data_dir: str,
+                 export_for_user: Optional[str] = None,
+                 clock: Optional[Clock] = None,
+                 file_format: Optional[str] = None,
+                 max_num_friends: Optional[int] = None) -> None:
         """Constructor.
 
         Sets attributes passed in and
@@ -67,6 +137,10 @@ class FriendsExporter:
         """
         self.cli = cli
         self.data_dir = data_dir
+        self.file_format = file_format if file_format else FORMAT_CSV
+        self.max_num_friends = max_num_friends if max_num_friends else get_max_num_friends()
+        # Max number of data pages to retrieve from Twitter
+        self.max_cursor_iterations = math.ceil(self.max_num_friends / self.PAGE_SIZE)
         creds = self.cli.verify_credentials(skip_status=True,
                                             include_entities=False,
                                             include_email=False)
@@ -76,8 +150,17 @@ class FriendsExporter:
         else:
             self.export_for_user = self.user_screen_name
 
-        self.waiter = Waiter(self.user_screen_name)
+        self.clock = clock if clock else SYSTEM_CLOCK
+        self.waiter = Waiter(self.user_screen_name, clock=self.clock)
         self.ulog = ScreenNameLogger(logger=logger, screen_name=self.user_screen_name)
+        self.tracer = Tracer(f"export of {self.export_for_user}")
+        self.retry_policy: Optional[RetryPolicy] = None
+        self.retry_budget: Optional[RetryBudget] = None
+
+        # Paging state. Kept across retries so that the retrieval resumes from the page that failed
+        self.export_writer: Optional[ExportWriter] = None
+        self.next_cursor = None
+        self.pages_retrieved = 0
 
     def process(self) -> Tuple[bool, Optional[str], Optional[str]]:
         """Start the whole export process.
@@ -91,10 +174,10 @@ class FriendsExporter:
         num_friends_to_export = self._retrieve_num_friends()
         self.ulog.info(f"Number of friends to export: {num_friends_to_export}")
 
-        if num_friends_to_export > MAX_NUM_FRIENDS:
+        if num_friends_to_export > self.max_num_friends:
             self.ulog.info(f"{num_friends_to_export} friends to export are too many. Bailing out.")
             user_err_msg = f"{self.export_for_user} has {num_friends_to_export} friends." + \
-                           f" We only support up until {MAX_NUM_FRIENDS}"
+                           f" We only support up until {self.max_num_friends}"
             return False, user_err_msg, None
 
         if num_friends_to_export == 0:
@@ -106,14 +189,25 @@ class FriendsExporter:
             self.ulog.info(
                 f"Retrieving data from Twitter profile: {self.export_for_user} ({num_friends_to_export} friends).")
 
-            ok, friends_data, user_err_msg = self._retrieve_data_from_twitter()
+            export_writer = EXPORT_WRITERS[self.file_format](self._generate_csv_file_path())
+            self.export_writer = export_writer
+            try:
+                ok, num_friends_exported, user_err_msg = self._retrieve_data_from_twitter()
+            except BaseException:
+                export_writer.abort()
+                raise
 
             if ok:
-                self.ulog.info(f"Retrieved {len(friends_data)} friends from Twitter profile: {self.export_for_user}")
-                exported_file = self._export_friends_csv(friends_data)
+                self.ulog.info(f"Retrieved {num_friends_exported} friends from Twitter profile: {self.export_for_user}")
+                with self.tracer.span("write"):
+                    exported_file = export_writer.commit()
+                ROWS.inc(num_friends_exported, outcome="exported")
                 self.ulog.info(f"Exported CSV file successfully: {exported_file}")
                 return True, None, exported_file
             else:
+                partial_file = export_writer.abort()
+                if partial_file:
+                    self.ulog.info(f"Partial export kept for inspection: {partial_file}")
                 self.ulog.warn(f"Couldn't export friends data! Message for user: {user_err_msg}")
                 return False, user_err_msg, None
 
@@ -127,8 +221,9 @@ class FriendsExporter:
         #
         # Returns: the number of friends (people being followed by) of the Twitter profile to export friends for
         self.ulog.debug(f"Retrieving {self.export_for_user} profile to get friends_count")
-        usr = self.cli.show_user(screen_name=self.export_for_user,
-                                 include_entities=False)
+        with self.tracer.span("api_call"):
+            usr = self.cli.show_user(screen_name=self.export_for_user,
+                                     include_entities=False)
         friends_count = usr['friends_count']
         self.ulog.debug(f"Friends count for {self.export_for_user} is {friends_count}")
         return friends_count
@@ -137,50 +232,90 @@ class FriendsExporter:
     def unauthorized_error(err):
         return err.msg.find("401 (Unauthorized)") > -1
 
-    def _retrieve_data_from_twitter(self, retried=0, max_retries=1):
+    def _retrieve_data_from_twitter(self):
         # This method is in charge of controling the data retrieval process
         # from Twitter and managing potential errors raised by the Twitter API.
         #
-        # If there is an error indicating we reached the request rate limits
-        # we can then inspect the HTTP header that Twitter returns populated
-        # with the number of seconds we must wait.
-        # The method handles the retry logic, which we set to a small number of
-        # max retries given the fact that the process already has waited for
-        # Twitter to reset the rate limits.
+        # The errors are classified by the retry policy. Rate limit errors and
+        # transient server errors are retried: the pages retrieved before the error
+        # are kept, the retry resumes from the page that failed. A rate limit error
+        # waits for the rate limit reset (the HTTP header that Twitter returns tells
+        # when), the others a capped exponential backoff. With an ApiClient the rate
+        # limits are normally waited for before sending the requests, so this is only
+        # a fallback.
         #
         # Other errors are treated generically: we bail out of the process
         #
         # Returns: tuple with:
         #  - bool indicating success/failure
-        #  - list of friendships retrieved (if successful)
+        #  - int number of friendships retrieved (if successful)
         #  - str with message to show to user (if unsuccessful)
-        try:
+        self.retry_budget = RetryBudget(self.RETRY_BUDGET_RETRIES, self.RETRY_BUDGET_SECONDS)
+        retried = 0
+        failed_at = None
+        while True:
+            try:
+
+                num_friends_exported = self._produce_friend_ids_names_list()
+
+            except TwythonError as te:
+                if self._retrieval_progress() != failed_at:
+                    # Data was retrieved since the previous error: this is another request failing
+                    failed_at = self._retrieval_progress()
+                    retried = 0
+                retried += 1
+                retry, user_err_msg = self._handle_retry(te, retried)
+                if not retry:
+                    return False, None, user_err_msg
+
+            except WaitCancelledError:
+                self.ulog.warn("The wait for a rate limit reset was cancelled - Bailing out.")
+                return False, None, "The export was interrupted before finishing."
 
-            friends_data = self._produce_friend_ids_names_list()
-
-        except TwythonRateLimitError as e:
-            self.ulog.warn(f"ERROR from Twitter: === {e.error_code} === {e}")
-            retried += 1
-            if retried <= max_retries:
-                self._wait_for_tw_rate_limit_reset(retried, max_retries, self.RETRY_SLEEP_CHECK_EVERY_SECS)
-                return self._retrieve_data_from_twitter(retried=retried)
             else:
-                self.ulog.warn(f"We reached the maximum number of retries for error code: {e.error_code} "
-                               "- Bailing out.")
-                return False, None, "We hit the Twitter API request rate limit. You may try again in 24h or so."
+                self.ulog.info(f"Successfully produced data for {num_friends_exported} friends to export.")
+                return True, num_friends_exported, None
 
-        except TwythonError as te:
-            self.ulog.warn(f"We got a TwythonError: {te} - Bailing out.")
-            if FriendsExporter.unauthorized_error(te):
+    def _handle_retry(self, err, retried):
+        # Decide whether to retry after an error and wait before retrying.
+        #
+        # Returns: tuple with:
+        #  - bool, True to retry
+        #  - str with message to show to user (if not retrying)
+        action = self._get_retry_policy().classify(err).action
+        if action == ACTION_ABORT:
+            self.ulog.warn(f"We got a TwythonError: {err} - Bailing out.")
+            if FriendsExporter.unauthorized_error(err):
                 msg = f"You don't have access to {self.export_for_user} Twitter profile. " \
                       "It seems to be a protected account."
             else:
                 msg = "There was an error interacting with Twitter. You may try again in 24h or so."
-            return False, None, msg
-
-        else:
-            self.ulog.info(f"Successfully produced data for {len(friends_data)} friends to export.")
-            return True, friends_data, None
+            return False, msg
+
+        self.ulog.warn(f"ERROR from Twitter: === {err.error_code} === {err}")
+        seconds_to_wait = self._get_retry_policy().seconds_to_wait(action,
+                                                                   retried,
+                                                                   self.retry_budget,
+                                                                   self._seconds_until_rate_limit_reset(err))
+        if seconds_to_wait is None:
+            self.ulog.warn(f"We reached the maximum number of retries for error code: {err.error_code} "
+                           f"({self.retry_budget}) - Bailing out.")
+            if action == ACTION_WAIT_FOR_RESET:
+                return False, "We hit the Twitter API request rate limit. You may try again in 24h or so."
+            return False, "There was an error interacting with Twitter. You may try again in 24h or so."
+
+        self.ulog.info(f"Kept {self.export_writer.rows_written} friends from {self.pages_retrieved} pages. "
+                       f"Will resume from cursor: {self.next_cursor}")
+        self.ulog.info(f"Waiting for {seconds_to_wait:.0f} seconds...")
+        RETRIES.inc(kind=action)
+        try:
+            with self.tracer.span("wait"):
+                self.waiter.sleep_for(seconds_to_wait)
+        except WaitCancelledError:
+            self.ulog.warn("The wait before retrying was cancelled - Bailing out.")
+            return False, "The export was interrupted before finishing."
+        self.ulog.info(f"Retrying... ({retried}/{self._get_retry_policy().max_retries})")
+        return True, None
 
     def _produce_friend_ids_names_list(self):
         # This method iterates through the pages of data (indexed by a cursor) that Twitter
@@ -188,27 +323,28 @@ class FriendsExporter:
         # sends an empty next cursor (last page) or until we reach the maximum of iterations
         # supported by this application.
         #
-        # Returns: list of dicts containing friendships data.
-        #   Each friendship has a user name (screen name) and a user ID
-        users, next_cursor = self._get_friends_curs()
-        friend_ids_names = []
-        condition = True
-        iterations = 1
-        while condition:
-            for u in users:
-                friend_ids_names.append((u['screen_name'], u['id']))
-            if next_cursor > 0 and iterations <= self.MAX_CURSOR_ITERATIONS:
-                users, next_cursor = self._get_friends_curs(curs=next_cursor)
-                iterations += 1
-            else:
-                condition = False
-
-        if iterations > self.MAX_CURSOR_ITERATIONS:
-            self.ulog.error(f"Reached {iterations} pagination iterations. This shouldn't happen!")
-            raise TwythonError(msg="Too many pages of friends to be retrieved")
-
-        self.ulog.debug(f"Retrieved full list of {len(friend_ids_names)} friends after {iterations} iterations.")
-        return friend_ids_names
+        # Each page is handed to the export writer straight away, only one page is held in memory.
+        # The cursor of the next page is kept as instance state after each page. If a page fails,
+        # calling this method again resumes from that page.
+        #
+        # Returns: int number of friendships written. Each friendship has a user name (screen name) and a user ID
+        while True:
+            users, next_cursor = self._get_friends_curs(curs=self.next_cursor)
+            with self.tracer.span("write"):
+                self.export_writer.write_page((u['screen_name'], u['id']) for u in users)
+            self.pages_retrieved += 1
+            self.next_cursor = next_cursor
+            self.ulog.debug("Page %s retrieved. Last good next cursor: %s", self.pages_retrieved, self.next_cursor)
+
+            if next_cursor <= 0:
+                break
+            if self.pages_retrieved >= self.max_cursor_iterations:
+                self.ulog.error(f"Reached {self.pages_retrieved} pagination iterations. This shouldn't happen!")
+                raise TwythonError(msg="Too many pages of friends to be retrieved")
+
+        self.ulog.debug(f"Retrieved full list of {self.export_writer.rows_written} friends "
+                        f"after {self.pages_retrieved} iterations.")
+        return self.export_writer.rows_written
 
     def _get_friends_curs(self, curs=None):
         # Retrieve a page of friendship data for a given cursor from Twitter.
@@ -217,52 +353,359 @@ class FriendsExporter:
         #  - partial list of friends corresponding to the cursor being held by Twitter (or
         #    when no cursor, the first page of data)
         #  - int number for the next cursor, returned by Twitter
-        self.ulog.debug(f"Retrieving partial friends list - cursor: {curs}")
-        partial_friends_list = self.cli.get_friends_list(
-            screen_name=self.export_for_user,
-            skip_status=True,
-            include_user_entities=False,
-            count=200,
-            cursor=curs)
+        self.ulog.debug("Retrieving partial friends list - cursor: %s", curs)
+        with self.tracer.span("api_call"):
+            partial_friends_list = self.cli.get_friends_list(
+                screen_name=self.export_for_user,
+                skip_status=True,
+                include_user_entities=False,
+                count=self.PAGE_SIZE,
+                cursor=curs)
 
         users = partial_friends_list['users']
         next_cursor = partial_friends_list['next_cursor']
-        self.ulog.debug(f"Retrieved partial friends list - Num friends: {len(users)} "
-                        f"- next cursor: {next_cursor}")
+        self.ulog.debug("Retrieved partial friends list - Num friends: %s - next cursor: %s", len(users), next_cursor)
         return users, next_cursor
 
-    def _wait_for_tw_rate_limit_reset(self, retried, max_retries, check_every):
-        # Sleep until we reach Twitter's API request rate limit reset time and return
-        reset = int(self.cli.get_lastfunction_header('x-rate-limit-reset'))
-        wait_until = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(reset))
-        self.ulog.info(f"Waiting until {wait_until}...")
-        self.waiter.sleep_until(reset, check_every)
-        self.ulog.info(f"Retrying... ({retried}/{max_retries})")
+    def _retrieval_progress(self):
+        # Returns: int growing whenever a request of the retrieval succeeds, to tell the retries of a request apart
+        return self.pages_retrieved
+
+    def _get_retry_policy(self):
+        # The retry policy, by default built from the exporter's retry settings when first needed.
+        # Errors not in the export error table abort the export.
+        #
+        # Returns: the RetryPolicy
+        if not self.retry_policy:
+            self.retry_policy = RetryPolicy(EXPORT_ERROR_RULES,
+                                            default_action=ACTION_ABORT,
+                                            max_retries=self.MAX_RETRIES,
+                                            base_seconds=self.RETRY_SHORT_SECONDS_TO_WAIT,
+                                            max_seconds=self.RETRY_LONG_SECONDS_TO_WAIT)
+        return self.retry_policy
+
+    def _seconds_until_rate_limit_reset(self, err):
+        # Twitter's API request rate limit reset time comes in the x-rate-limit-reset header of the response, that
+        # Twython fills in as the retry_after of a rate limit error. Otherwise it's taken from the rate limit status
+        # an ApiClient keeps per endpoint. The last response header of the client is only a fallback: the users
+        # lookups run in several threads sharing the client, it may be another request's.
+        #
+        # Returns: seconds to wait until the rate limit window resets, None if unknown
+        reset = getattr(err, 'retry_after', None) or self._exhausted_rate_limit_reset() or \
+            self.cli.get_lastfunction_header('x-rate-limit-reset')
+        try:
+            return max(int(reset) - self.clock.time(), 0) + 1 if reset else None
+        except ValueError:
+            return None
+
+    def _exhausted_rate_limit_reset(self):
+        # Returns: the latest reset time of the endpoints with no requests left, as tracked by an ApiClient client.
+        # None if there are none or the client doesn't track them.
+        rate_limits = getattr(self.cli, 'rate_limits', None)
+        if not rate_limits:
+            return None
+        now = self.clock.time()
+        resets = [status.reset for status in list(rate_limits.values()) if status.remaining <= 0 and status.reset > now]
+        return max(resets) if resets else None
 
     def _generate_csv_file_name(self):
         # Generate a unique CSV file name using the Twitter user for whom friends are exported and a timestamp.
         #
         # Returns: an str with the file name to be created
         curr_timestamp_ns = str(time.time_ns())
-        return f"friends_{self.export_for_user}_{curr_timestamp_ns}.csv"
+        return f"friends_{self.export_for_user}_{curr_timestamp_ns}.{self.file_format}"
 
-    def _export_friends_csv(self, friends):
-        # Dump friendship data to a file in CSV format
+    def _user_data_path(self):
+        # Returns: a pathlib.Path of the directory with the exports of the currently authenticated twitter user name,
+        # the 'owner' of the data
+        return Path(self.data_dir).joinpath(self.user_screen_name).resolve()
+
+    def _generate_csv_file_path(self):
+        # Build the full path of the CSV file to export to, creating its directory if needed.
         #
-        # Returns: str of the full absolute path and file name of the generated CSV file
-        data_path = Path(self.data_dir).joinpath(self.user_screen_name).resolve()
-        # data_path includes a subdirectory with the currently authenticated twitter user name, the 'owner' of the data
+        # Returns: a pathlib.Path of the file to be created
+        data_path = self._user_data_path()
         data_path.mkdir(parents=True, exist_ok=True)
         data_path_file = data_path.joinpath(self._generate_csv_file_name())
+        self.ulog.debug("Starting data export to file %s", data_path_file)
+        return data_path_file
+
+# **** EOC
+
+
+class FriendsIdsExporter(FriendsExporter):
+    """An exporter retrieving friend ids in large pages and then looking up their screen names in batches.
+
+    Twitter returns up to 5000 friend ids per friends/ids request, against 200 hydrated users per friends/list
+    request. The screen names are then retrieved with users/lookup requests of up to 100 ids each. This makes
+    exporting accounts with tens of thousands of friends feasible.
+
+    The users/lookup requests of a page are sent concurrently by up to LOOKUP_WORKERS threads, so that their network
+    latencies overlap. The friends are written in the order of the ids all the same. With an ApiClient the requests
+    still wait for the rate limit resets when the endpoint runs out of requests.
+
+    :param cli: Twython client already instantiated with authentication tokens
+    :type cli: twython.Twython
+
+    :param data_dir: Directory to drop the CSV file into
+    :type data_dir: str
+    """
+
+    PAGE_SIZE = 5000  # Max number of friend ids Twitter returns per data page
+    LOOKUP_BATCH_SIZE = 100  # Max number of user ids Twitter accepts per users/lookup request
+    LOOKUP_WORKERS = 4  # Max number of users/lookup requests sent at the same time
 
-        self.ulog.debug(f"Starting data export of {len(friends)} friends "
-                        f"to file {data_path_file}")
-        with open(data_path_file, 'w', newline='') as csv_file:
-            full_path_file_name = os.path.realpath(csv_file.name)
-            writer = csv.writer(csv_file, delimiter=',', quotechar='"', quoting=csv.QUOTE_NONNUMERIC)
-            for tup in friends:
-                writer.writerow([tup[0], tup[1]])
-        self.ulog.debug(f"Exported {len(friends)} friends to CSV file: {data_path_file}")
-        return full_path_file_name
+    # ---------------
+    # private methods
+    # ---------------
+
+    def _get_friends_curs(self, curs=None):
+        # Retrieve a page of friend ids for a given cursor from Twitter and
+        # look up the screen names of those friends.
+        #
+        # Returns: tuple with:
+        #  - partial list of friends corresponding to the cursor being held by Twitter (or
+        #    when no cursor, the first page of data)
+        #  - int number for the next cursor, returned by Twitter
+        self.ulog.debug("Retrieving partial friend ids list - cursor: %s", curs)
+        with self.tracer.span("api_call"):
+            partial_friend_ids = self.cli.get_friends_ids(
+                screen_name=self.export_for_user,
+                stringify_ids=False,
+                count=self.PAGE_SIZE,
+                cursor=curs)
+
+        ids = partial_friend_ids['ids']
+        next_cursor = partial_friend_ids['next_cursor']
+        self.ulog.debug("Retrieved partial friend ids list - Num friends: %s - next cursor: %s", len(ids), next_cursor)
+        return self._lookup_users(ids), next_cursor
+
+    def _lookup_users(self, ids):
+        # Retrieve the users for a list of ids, in batches of LOOKUP_BATCH_SIZE looked up concurrently.
+        # Twitter doesn't return users that are suspended or deleted, those are left out.
+        # If a batch fails, its error is raised once the batches already sent are finished.
+        #
+        # Returns: list of users, in the same order as the ids
+        batches = [ids[start:start + self.LOOKUP_BATCH_SIZE] for start in range(0, len(ids), self.LOOKUP_BATCH_SIZE)]
+        users_by_id = {}
+        if len(batches) > 1 and self.LOOKUP_WORKERS > 1:
+            with ThreadPoolExecutor(max_workers=min(self.LOOKUP_WORKERS, len(batches)),
+                                    thread_name_prefix="lookup_user") as pool:
+                looked_up = list(pool.map(self._lookup_batch, batches))
+        else:
+            looked_up = [self._lookup_batch(batch) for batch in batches]
+        for users in looked_up:
+            for u in users:
+                users_by_id[u['id']] = u
+
+        missing_ids = [fr_id for fr_id in ids if fr_id not in users_by_id]
+        if missing_ids:
+            self.ulog.info(f"Twitter didn't return {len(missing_ids)} users, leaving them out: {missing_ids}")
+        return [users_by_id[fr_id] for fr_id in ids if fr_id in users_by_id]
+
+    def _lookup_batch(self, batch):
+        # Returns: list of the users Twitter returns for a batch of ids, in no particular order
+        self.ulog.debug("Looking up %s users", len(batch))
+        with self.tracer.span("api_call"):
+            return self.cli.lookup_user(user_id=",".join(str(fr_id) for fr_id in batch),
+                                        include_entities=False)
+
+# **** EOC
+
+
+class FriendsDeltaExporter(FriendsIdsExporter):
+    """An exporter writing only the friends added and removed since the previous export of the same profile.
+
+    The friends at the time of the previous export are rebuilt from the last full export file of the profile in the
+    owner's data directory, plus the delta files written after it. The current friend ids are retrieved and compared
+    with them: only the added ids are looked up to get their screen names (the removed ones are known already), and
+    both are written to a ``.delta.csv`` file. No file is written when nothing changed. When there's no previous full
+    export, a full export is done instead.
+
+    :param cli: Twython client already instantiated with authentication tokens
+    :type cli: twython.Twython
+
+    :param data_dir: Directory with the previous exports, to drop the CSV file into
+    :type data_dir: str
+    """
+
+    DELTA_SUFFIX = ".delta.csv"
+
+    def __init__(self,
+                 cli: Twython,
+                 data_dir: str,
+                 export_for_user: Optional[str] = None,
+                 clock: Optional[Clock] = None,
+                 file_format: Optional[str] = None,
+                 max_num_friends: Optional[int] = None) -> None:
+        """Constructor.
+
+        On top of the exporter's state, sets the state of the comparison with the previous export.
+        """
+        super().__init__(cli, data_dir, export_for_user, clock=clock, file_format=file_format,
+                         max_num_friends=max_num_friends)
+        self.previous_friends: Optional[Dict[int, str]] = None
+        # Retrieval state. Kept across retries so that the retrieval resumes from the request that failed
+        self.friend_ids = array('q')
+        self.friend_ids_complete = False
+        self.added_friends = FriendTable()
+        self.added_ids_looked_up = 0
+
+    def process(self) -> Tuple[bool, Optional[str], Optional[str]]:
+        """Start the whole incremental export process.
+
+        :return: The result of the process. It includes boolean OK/NOK, potential
+        message for the user, potential file name location (if there were changes to export)
+        :rtype: (bool, str, str)
+        """
+        self.previous_friends = self._load_previous_friends()
+        if self.previous_friends is None:
+            self.ulog.info(f"No previous export of {self.export_for_user} to compare with. Doing a full export.")
+            return super().process()
+
+        num_friends_to_export = self._retrieve_num_friends()
+        self.ulog.info(f"Number of friends to compare with the previous export: {num_friends_to_export} "
+                       f"(previously {len(self.previous_friends)})")
+        if num_friends_to_export > self.max_num_friends:
+            self.ulog.info(f"{num_friends_to_export} friends to export are too many. Bailing out.")
+            user_err_msg = f"{self.export_for_user} has {num_friends_to_export} friends." + \
+                           f" We only support up until {self.max_num_friends}"
+            return False, user_err_msg, None
+
+        export_writer = CsvDeltaWriter(self._generate_csv_file_path())
+        self.export_writer = export_writer
+        try:
+            ok, num_changes, user_err_msg = self._retrieve_data_from_twitter()
+        except BaseException:
+            export_writer.abort()
+            raise
+
+        if not ok:
+            partial_file = export_writer.abort()
+            if partial_file:
+                self.ulog.info(f"Partial export kept for inspection: {partial_file}")
+            self.ulog.warn(f"Couldn't export friends data! Message for user: {user_err_msg}")
+            return False, user_err_msg, None
+        if num_changes == 0:
+            export_writer.abort()
+            self.ulog.info(f"No changes in the friends of {self.export_for_user} since the previous export")
+            return True, f"{self.export_for_user} friends haven't changed since the previous export. " \
+                         "No file generated.", None
+
+        with self.tracer.span("write"):
+            exported_file = export_writer.commit()
+        ROWS.inc(num_changes, outcome="exported")
+        self.ulog.info(f"Exported {num_changes} changes successfully: {exported_file}")
+        return True, None, exported_file
+
+    # ---------------
+    # private methods
+    # ---------------
+
+    def _produce_friend_ids_names_list(self):
+        # Retrieve all the current friend ids, compare them with the previous export, look up the added ones
+        # and write the changes. Every step is resumed from where it failed when this method is called again.
+        #
+        # Returns: int number of changes written (friends added plus removed)
+        if self.previous_friends is None:
+            return super()._produce_friend_ids_names_list()
+
+        while not self.friend_ids_complete:
+            ids, next_cursor = self._get_friend_ids_curs(curs=self.next_cursor)
+            self.friend_ids.extend(ids)
+            self.pages_retrieved += 1
+            self.next_cursor = next_cursor
+            self.friend_ids_complete = next_cursor <= 0
+            if not self.friend_ids_complete and self.pages_retrieved >= self.max_cursor_iterations:
+                self.ulog.error(f"Reached {self.pages_retrieved} pagination iterations. This shouldn't happen!")
+                raise TwythonError(msg="Too many pages of friends to be retrieved")
+
+        current_ids = set(self.friend_ids)
+        added_ids = [fr_id for fr_id in self.friend_ids if fr_id not in self.previous_friends]
+        removed = [(name, fr_id) for fr_id, name in self.previous_friends.items() if fr_id not in current_ids]
+        self.ulog.info(f"{len(added_ids)} friends added and {len(removed)} removed since the previous export")
+
+        lookup_chunk_size = self.LOOKUP_BATCH_SIZE * self.LOOKUP_WORKERS
+        while self.added_ids_looked_up < len(added_ids):
+            batch = added_ids[self.added_ids_looked_up:self.added_ids_looked_up + lookup_chunk_size]
+            self.added_friends.extend((user['screen_name'], user['id']) for user in self._lookup_users(batch))
+            self.added_ids_looked_up += len(batch)
+
+        export_writer = self.export_writer
+        if not isinstance(export_writer, CsvDeltaWriter):
+            raise RuntimeError(f"Changes can't be written by: {export_writer}")
+        with self.tracer.span("write"):
+            export_writer.write_changes(CsvDeltaWriter.ADDED, self.added_friends.rows())
+            export_writer.write_changes(CsvDeltaWriter.REMOVED, removed)
+        return export_writer.rows_written
+
+    def _retrieval_progress(self):
+        # Returns: int growing whenever a page of ids or a batch of added friends is retrieved
+        return self.pages_retrieved + self.added_ids_looked_up
+
+    def _get_friend_ids_curs(self, curs=None):
+        # Retrieve a page of friend ids for a given cursor from Twitter, without looking them up.
+        #
+        # Returns: tuple with:
+        #  - partial list of friend ids corresponding to the cursor
+        #  - int number for the next cursor, returned by Twitter
+        self.ulog.debug("Retrieving partial friend ids list - cursor: %s", curs)
+        with self.tracer.span("api_call"):
+            partial_friend_ids = self.cli.get_friends_ids(
+                screen_name=self.export_for_user,
+                stringify_ids=False,
+                count=self.PAGE_SIZE,
+                cursor=curs)
+        return partial_friend_ids['ids'], partial_friend_ids['next_cursor']
+
+    def _load_previous_friends(self):
+        # Rebuild the friends of the profile at the time of its previous export: the last full export file,
+        # with the changes of the delta files written after it applied in order.
+        #
+        # Returns: dict of screen names by user id, None if there isn't any full export of the profile
+        file_name_pattern = re.compile(rf"friends_{re.escape(self.export_for_user)}_(\d+)"
+                                       rf"({re.escape(self.DELTA_SUFFIX)}|\.csv|{re.escape(BINARY_SUFFIX)})$")
+        exports = []
+        data_path = self._user_data_path()
+        if data_path.is_dir():
+            for path_file in data_path.iterdir():
+                match = file_name_pattern.match(path_file.name)
+                if match:
+                    exports.append((int(match.group(1)), match.group(2) == self.DELTA_SUFFIX, path_file))
+        full_exports = [export for export in exports if not export[1]]
+        if not full_exports:
+            return None
+
+        snapshot_ns, _, snapshot_file = max(full_exports)
+        deltas = sorted(export for export in exports if export[1] and export[0] > snapshot_ns)
+        self.ulog.debug(f"Comparing with {snapshot_file.name} and {len(deltas)} delta files after it")
+        friends = {}
+        if snapshot_file.suffix == BINARY_SUFFIX:
+            with BinaryFriendsFile(snapshot_file) as binary_file:
+                friends.update((fr_id, fr_name) for fr_name, fr_id in binary_file)
+        else:
+            with open(snapshot_file, 'r', newline='') as csv_file:
+                for row in csv.reader(csv_file, delimiter=',', quotechar='"'):
+                    friends[int(row[1])] = row[0]
+        for _, _, delta_file in deltas:
+            with open(delta_file, 'r', newline='') as csv_file:
+                for change, fr_name, fr_id in csv.reader(csv_file, delimiter=',', quotechar='"'):
+                    if change == CsvDeltaWriter.ADDED:
+                        friends[int(fr_id)] = fr_name
+                    else:
+                        friends.pop(int(fr_id), None)
+        return friends
+
+    def _generate_csv_file_name(self):
+        # Returns: an str with the file name to be created, a delta file name if there's a previous export.
+        # Delta files are always CSV files
+        file_name = super()._generate_csv_file_name()
+        if self.previous_friends is None:
+            return file_name
+        return file_name[:file_name.rindex(".")] + self.DELTA_SUFFIX
 
 # **** EOC
+
+
+EXPORT_ENGINES = {ENGINE_LIST: FriendsExporter, ENGINE_IDS: FriendsIdsExporter}
+EXPORT_WRITERS: Dict[str, Type[ExportWriter]] = {FORMAT_CSV: CsvExportWriter, FORMAT_BINARY: BinaryExportWriter}
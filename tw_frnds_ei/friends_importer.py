@@ -1,9 +1,9 @@
-import copy
 import csv
 import logging
-import random
+import math
 from pathlib import Path
 from typing import Dict
+from typing import Generator
 from typing import List
 from typing import Optional
 from typing import Tuple
@@ -11,15 +11,39 @@ from typing import Tuple
 from twython import Twython
 from twython import TwythonError
 
-from tw_frnds_ei.config_app import MAX_NUM_FRIENDS
+from tw_frnds_ei.binary_export import BinaryFormatError
+from tw_frnds_ei.binary_export import BinaryFriendsFile
+from tw_frnds_ei.binary_export import is_binary_export
+from tw_frnds_ei.clock import SYSTEM_CLOCK
+from tw_frnds_ei.clock import Clock
+from tw_frnds_ei.config_app import get_max_num_friends
+from tw_frnds_ei.follow_rate_limiter import FollowRateLimiter
+from tw_frnds_ei.friend_table import FriendTable
+from tw_frnds_ei.import_journal import ImportJournal
+from tw_frnds_ei.import_progress import ImportProgress
+from tw_frnds_ei.metrics import RETRIES
+from tw_frnds_ei.metrics import ROWS
+from tw_frnds_ei.metrics import THROTTLE_SECONDS
+from tw_frnds_ei.retry_policy import ACTION_ABORT
+from tw_frnds_ei.retry_policy import ACTION_SKIP
+from tw_frnds_ei.retry_policy import IMPORT_ERROR_RULES
+from tw_frnds_ei.retry_policy import RetryBudget
+from tw_frnds_ei.retry_policy import RetryPolicy
 from tw_frnds_ei.screen_name_logger import ScreenNameLogger
+from tw_frnds_ei.tracing import Tracer
+from tw_frnds_ei.waiter import WaitCancelledError
 from tw_frnds_ei.waiter import Waiter
 
 logger = logging.getLogger(__name__)
 
+ImportResult = Tuple[bool, Optional[str], Optional[List[str]], Optional[List[Dict[str, str]]]]
 
-def do_import(cli: Twython, data_dir: str, csv_file_name: str) \
-        -> Tuple[bool, str, Optional[List[str]], Optional[List[Dict[str, str]]]]:
+
+def do_import(cli: Twython,
+              data_dir: str,
+              csv_file_name: str,
+              resume: bool = False,
+              clock: Optional[Clock] = None) -> ImportResult:
     """Instantiate a new FriendsImporter and trigger the import process.
 
     :param cli: A Tython client already containing authentication data
@@ -31,14 +55,21 @@ def do_import(cli: Twython, data_dir: str, csv_file_name: str) \
     :param csv_file_name: The CSV file name to import
     :type: csv_file_name: str
 
+    :param resume: Resume a previous import of the same CSV file, skipping the rows already processed
+    :type: resume: bool, optional
+
+    :param clock: Clock for the waits of the process. Defaults to the system clock
+    :type: clock: tw_frnds_ei.clock.Clock, optional
+
     :return: The result of the process. It includes boolean OK/NOK, potential
-    message for the user with further details, potential list of friends that could
-    not be imported
-    :rtype: (bool, str, list)
+    message for the user with further details, potential list of friends imported, potential list of friends that
+    could not be imported
+    :rtype: (bool, str, list, list)
     """
-    importer = FriendsImporter(cli, data_dir, csv_file_name)
+    importer = FriendsImporter(cli, data_dir, csv_file_name, resume, clock=clock)
     importer.ulog.info("Importer created!")
     result = importer.process()
+    importer.ulog.info(importer.tracer.format_breakdown())
     importer.ulog.info("Importer finished!")
     importer.ulog.info("------------------\n\n")
     return result
@@ -57,16 +88,44 @@ class FriendsImporter:
 
     :param csv_file_name: Name of the CSV file to import
     :type csv_file_name: str
+
+    :param resume: Replay the import journal of a previous run and skip the rows it already processed
+    :type resume: bool
+
+    :param rate_limiter: Sliding window limiter of the friendship requests sent for the authenticated user.
+    By default one persisted in the data directory is used.
+    :type rate_limiter: tw_frnds_ei.follow_rate_limiter.FollowRateLimiter
+
+    :param clock: Clock for the waits, the throttling and the retries. Defaults to the system clock
+    :type clock: tw_frnds_ei.clock.Clock
+
+    :param retry_policy: What to do about the errors of the friendship requests and how long to wait before
+    retrying them. By default a backoff from RETRY_SHORT_SECONDS_TO_WAIT up to RETRY_LONG_SECONDS_TO_WAIT.
+    :type retry_policy: tw_frnds_ei.retry_policy.RetryPolicy
+
+    :param max_num_friends: Max number of friends the file may hold. Defaults to the MAX_NUM_FRIENDS of the .env
+    file, read when the importer is created
+    :type max_num_friends: int
     """
 
-    MAX_CSV_ROWS = MAX_NUM_FRIENDS
-    RETRY_SHORT_SECONDS_TO_WAIT = 300  # 5 minutes
-    RETRY_LONG_SECONDS_TO_WAIT = 900  # 15 minutes
-    RETRY_SLEEP_CHECK_EVERY_SECS = 30  # Number of seconds for the retry waiter to periodically check the clock
+    RETRY_SHORT_SECONDS_TO_WAIT = 30  # First backoff wait before retrying
+    RETRY_LONG_SECONDS_TO_WAIT = 900  # Longest backoff wait (15 minutes)
+    MAX_RETRIES = 4  # Max number of retries of a friendship request
+    RETRY_BUDGET_RETRIES = 40  # Max number of retries of a whole import
+    RETRY_BUDGET_SECONDS = 6 * 3600  # Max time a whole import may spend waiting before retrying
     MAX_FRIEND_REQUESTS_PER_DAY = 400  # Respect Twitter's daily limits on following accounts
-    THROTTLE_SLEEP_CHECK_EVERY_SECS = 30  # Number of seconds the throttler will periodically check the clock
-
-    def __init__(self, cli: Twython, data_dir: str, csv_file_name: str) -> None:
+    MIN_SECONDS_BETWEEN_FRIEND_REQUESTS = 2  # Avoid surpassing 30 follow requests per minute
+    PREFLIGHT_BATCH_SIZE = 100  # Max number of user ids Twitter accepts per friendships/lookup request
+
+    def __init__(self,
+                 cli: Twython,
+                 data_dir: str,
+                 csv_file_name: str,
+                 resume: bool = False,
+                 rate_limiter: Optional[FollowRateLimiter] = None,
+                 clock: Optional[Clock] = None,
+                 retry_policy: Optional[RetryPolicy] = None,
+                 max_num_friends: Optional[int] = None) -> None:
         """Constructor.
 
         Sets attributes passed in and
@@ -76,31 +135,78 @@ class FriendsImporter:
         self.cli = cli
         self.data_dir = data_dir
         self.csv_file_name = csv_file_name
+        self.resume = resume
+        self.max_csv_rows = max_num_friends if max_num_friends else get_max_num_friends()
+        self.clock = clock if clock else SYSTEM_CLOCK
         creds = self.cli.verify_credentials(skip_status=True,
                                             include_entities=False,
                                             include_email=False)
         self.user_screen_name = creds['screen_name']
-        self.waiter = Waiter(self.user_screen_name)
+        self.waiter = Waiter(self.user_screen_name, clock=self.clock)
         self.ulog = ScreenNameLogger(logger=logger, screen_name=self.user_screen_name)
+        self.rate_limiter = rate_limiter
+        self.retry_policy = retry_policy
+        self.retry_budget: Optional[RetryBudget] = None
+        self.tracer = Tracer(f"import of {self.csv_file_name}")
 
-    def process(self) -> Tuple[bool, Optional[str], Optional[List[str]], Optional[List[Dict[str, str]]]]:
+    def process(self) -> ImportResult:
         """Start the whole import process.
 
-        All the necessary information has been set as instance attributes.
+        All the necessary information has been set as instance attributes. The import steps
+        are run one after the other, waiting with the importer's waiter between them.
 
         :return: The result of the process. It includes boolean OK/NOK, potential
         message for the user with further details, potential list of friends
         that were imported and potential list of friends that could not be imported.
         :rtype: (bool, str, str, list)
         """
-        ok, friends_data, err_msg = self._load_friends_data()
+        import_steps = self.import_steps()
+        try:
+            seconds_to_wait = next(import_steps)
+            while True:
+                try:
+                    self.waiter.sleep_for(seconds_to_wait)
+                except WaitCancelledError as cancelled:
+                    seconds_to_wait = import_steps.throw(cancelled)
+                else:
+                    seconds_to_wait = next(import_steps)
+        except StopIteration as finished:
+            return finished.value
+
+    def import_steps(self) -> Generator[float, None, ImportResult]:
+        """Generator running the import process one step at a time.
+
+        Whenever the process needs to wait (throttling or before retrying) the generator yields the
+        number of seconds to wait, leaving the waiting to the caller. This lets a scheduler run many
+        imports without tying up a thread per waiting import. A WaitCancelledError thrown into the
+        generator stops the import.
+
+        :return: The result of the process, as returned by ``process``
+        :rtype: (bool, str, str, list)
+        """
+        with self.tracer.span("load"):
+            ok, friends_data, err_msg = self._load_friends_data()
         if not ok:
             # couldn't even load data from the CSV file
             return False, err_msg, None, None
 
         self.ulog.info(f"Importing {len(friends_data)} friends.")
-        ok, screen_names_imported, friendships_remaining, err_msg_details_for_user = \
-            self._throttle_friendship_requests(friends_data=friends_data)
+        if not self.rate_limiter:
+            self.rate_limiter = self.create_rate_limiter(self.data_dir, self.user_screen_name, self.clock)
+        self.retry_budget = RetryBudget(self.RETRY_BUDGET_RETRIES, self.RETRY_BUDGET_SECONDS)
+        journal = ImportJournal(self.data_dir, self.user_screen_name, self.csv_file_name)
+        try:
+            already_processed = journal.start(self.resume)
+            settled = {fr_id: (record['status'], record.get('reason_for_skipping'))
+                       for fr_id, record in already_processed.items()}
+            with self.tracer.span("preflight"):
+                settled.update(self._preflight_relationships(friends_data, settled, journal))
+            ok, screen_names_imported, friendships_remaining, err_msg_details_for_user = \
+                yield from self._throttle_friendship_requests(friends_data=friends_data,
+                                                              journal=journal,
+                                                              settled=settled)
+        finally:
+            journal.close()
 
         if ok:
             self.ulog.info(f"Importer succeeded! Imported {len(screen_names_imported)} friends.")
@@ -110,6 +216,31 @@ class FriendsImporter:
             msg = self._build_user_message_process_unfinished(err_msg_details_for_user, screen_names_imported)
             return False, msg, screen_names_imported, friendships_remaining
 
+    @classmethod
+    def create_rate_limiter(cls,
+                            data_dir: str,
+                            user_screen_name: str,
+                            clock: Optional[Clock] = None) -> FollowRateLimiter:
+        """Create the limiter of the friendship requests sent for a user, persisted in the data directory.
+
+        :param data_dir: Directory holding the import data of every user
+        :type data_dir: str
+
+        :param user_screen_name: The authenticated user sending the friendship requests
+        :type user_screen_name: str
+
+        :param clock: Clock giving the time of the requests. Defaults to the system clock
+        :type clock: tw_frnds_ei.clock.Clock
+
+        :return: The rate limiter
+        :rtype: tw_frnds_ei.follow_rate_limiter.FollowRateLimiter
+        """
+        return FollowRateLimiter(data_dir,
+                                 user_screen_name,
+                                 max_requests=cls.MAX_FRIEND_REQUESTS_PER_DAY,
+                                 min_interval_seconds=cls.MIN_SECONDS_BETWEEN_FRIEND_REQUESTS,
+                                 clock=clock)
+
     # ---------------
     # private methods
     # ---------------
@@ -125,7 +256,10 @@ class FriendsImporter:
         try:
             self.ulog.info(f"Loading CSV file: {self.csv_file_name}")
 
-            friends_data = self._load_friends_csv()
+            if is_binary_export(self.csv_file_name):
+                friends_data = self._load_friends_binary()
+            else:
+                friends_data = self._load_friends_csv()
 
             self.ulog.info(f"Loaded CSV file: {self.csv_file_name}")
 
@@ -133,6 +267,10 @@ class FriendsImporter:
             self.ulog.warn(f"Bad CSV file! -> {self.csv_file_name}")
             return False, None, "Bad CSV file!"
 
+        except BinaryFormatError as bad_format:
+            self.ulog.warn(f"Bad binary export file! -> {bad_format}")
+            return False, None, "Bad binary export file!"
+
         except EmptyFileError:
             msg = f"Empty CSV file: {self.csv_file_name}"
             self.ulog.warn(msg)
@@ -143,7 +281,7 @@ class FriendsImporter:
             self.ulog.warn(f"File too big. We stopped at the row number {too_big.last_row}. "
                            f"CSV file: {self.csv_file_name}")
             error_msg_for_user = f"The CSV file is too big. We stopped reading it at the " \
-                                 f"row number {too_big.last_row}. The limit is {self.MAX_CSV_ROWS}"
+                                 f"row number {too_big.last_row}. The limit is {self.max_csv_rows}"
             return False, None, error_msg_for_user
 
         return True, friends_data, None
@@ -152,21 +290,21 @@ class FriendsImporter:
         # Open and read all lines of the CSV file in path
         # May raise exception when too many rows have been read
         #
-        # Returns: a list of dicts containing twitter user names and user ids
+        # Returns: a FriendTable with the twitter user names and user ids
         data_path = Path(self.data_dir).joinpath(self.user_screen_name).resolve()
         data_path_file = data_path.joinpath(self.csv_file_name)
 
         self.ulog.debug(f"Loading friends from CSV file: {data_path_file}")
-        friends_data = []
+        friends_data = FriendTable()
         with open(data_path_file, 'r', newline='') as csv_file:
             reader = csv.reader(csv_file, delimiter=',', quotechar='"')
             row_number = 1
             for row in reader:
-                if row_number > self.MAX_CSV_ROWS:
+                if row_number > self.max_csv_rows:
                     raise FileTooBigError(row_number)
                 fr_name = row[0]
                 fr_id = int(row[1])
-                friends_data.append({'screen_name': fr_name, 'fr_id': fr_id})
+                friends_data.append(fr_name, fr_id)
                 row_number += 1
 
         self.ulog.debug(f"Successfully loaded {len(friends_data)} friends to import "
@@ -176,12 +314,93 @@ class FriendsImporter:
 
         return friends_data
 
-    def _throttle_friendship_requests(self, friends_data):
+    def _load_friends_binary(self):
+        # Read a binary export file, memory-mapped. The number of friends is known up front from its header,
+        # so a file too big is refused without reading it
+        #
+        # Returns: a FriendTable with the twitter user names and user ids, sorted by user id
+        data_path_file = Path(self.data_dir).joinpath(self.user_screen_name, self.csv_file_name).resolve()
+
+        self.ulog.debug(f"Loading friends from binary file: {data_path_file}")
+        with BinaryFriendsFile(data_path_file) as binary_file:
+            if len(binary_file) > self.max_csv_rows:
+                raise FileTooBigError(self.max_csv_rows + 1)
+            friends_data = FriendTable.from_columns(binary_file.screen_names(), binary_file.ids)
+
+        self.ulog.debug(f"Successfully loaded {len(friends_data)} friends to import "
+                        f"from binary file {data_path_file}")
+        if not friends_data:
+            raise EmptyFileError()
+
+        return friends_data
+
+    def _preflight_relationships(self, friends_data, settled, journal):
+        # Before sending any friendship request, look up in batches the current relationship
+        # between the authenticated user and the friends to import. Friends already being followed,
+        # with a follow request pending or blocked by the user don't need (or can't have) a
+        # friendship request, which would waste one of the daily follow requests allowed.
+        # The outcome for those friends is recorded in the journal.
+        #
+        # The connections returned by friendships/lookup are: following, following_requested, followed_by,
+        # none, blocking and muting. They don't tell whether the friend blocked the user: that is only known
+        # from the error of the friendship request (see the import error rules). Friends blocked by the user
+        # are skipped rather than unblocked, as unblocking is the user's call.
+        #
+        # This is an optimization: if Twitter fails to answer, the remaining friends are simply
+        # left for the import loop.
+        #
+        # Returns: dict of friend id -> tuple with status (imported/skipped) and potential reason for skipping
+        friends_to_check = [f for f in friends_data if f['fr_id'] not in settled]
+        self.ulog.info(f"Pre-flight check of the relationship with {len(friends_to_check)} friends...")
+        preflight_settled = {}
+        for start in range(0, len(friends_to_check), self.PREFLIGHT_BATCH_SIZE):
+            batch = friends_to_check[start:start + self.PREFLIGHT_BATCH_SIZE]
+            try:
+                with self.tracer.span("api_call"):
+                    relationships = self.cli.lookup_friendships(user_id=",".join(str(f['fr_id']) for f in batch))
+            except TwythonError as e:
+                self.ulog.warn(f"Pre-flight check stopped after {start} friends. ERROR from Twitter: {e}")
+                break
+            except WaitCancelledError:
+                self.ulog.warn(f"Pre-flight check interrupted after {start} friends.")
+                break
+
+            connections_by_id = {r['id']: r['connections'] for r in relationships}
+            for friendship in batch:
+                connections = connections_by_id.get(friendship['fr_id'], [])
+                if "following" in connections:
+                    self.ulog.debug("Already following: %s", friendship)
+                    journal.record_imported(friendship)
+                    ROWS.inc(outcome="imported")
+                    preflight_settled[friendship['fr_id']] = (ImportJournal.STATUS_IMPORTED, None)
+                elif "following_requested" in connections or "blocking" in connections:
+                    reason_for_skipping = self._reason_for_skipping_relationship(friendship['screen_name'],
+                                                                                 connections)
+                    self.ulog.debug("Skipping import of %s due to: '%s'", friendship, reason_for_skipping)
+                    journal.record_skipped(friendship, reason_for_skipping)
+                    ROWS.inc(outcome="skipped")
+                    preflight_settled[friendship['fr_id']] = (ImportJournal.STATUS_SKIPPED, reason_for_skipping)
+
+        self.ulog.info(f"Pre-flight check settled {len(preflight_settled)} friends without friendship requests.")
+        return preflight_settled
+
+    @staticmethod
+    def _reason_for_skipping_relationship(screen_name, connections):
+        if "blocking" in connections:
+            return f"The twitter user: {screen_name} could not be followed - Your account is blocking them. " \
+                   "Unblock them to follow them."
+        return f"The twitter user: {screen_name} could not be followed - The account is protected."
+
+    def _throttle_friendship_requests(self, friends_data, journal, settled):
         # This method is in charge of looping through the friendships to be imported
         # and creating a friendship for each one of them (make the authenticated twitter user
-        # follow another user ("friend")). After a successful friendship creation it delegates
-        # to the waiter to wait for a certain period of time to throttle the requests sent to
-        # Twitter.
+        # follow another user ("friend")). Before each friendship creation it delegates to the
+        # waiter to wait until the rate limiter has room for one more request, to throttle the
+        # requests sent to Twitter.
+        #
+        # Every friendship imported or skipped is recorded in the journal. Friendships already
+        # settled (by a previous run or by the pre-flight check) are not requested.
+        # The status of each row is kept in an ImportProgress, the lists returned are built from it at the end.
         #
         # Returns: tuple with:
         #  - bool indicating success/failure
@@ -190,202 +409,184 @@ class FriendsImporter:
         #  - str potential message for the end user
         num_friends = len(friends_data)
         self.ulog.info(f"Starting the creation of {num_friends} friendships...")
-        friendships_remaining = copy.deepcopy(friends_data)
-        screen_names_imported = []
-        for friendship_to_import in friends_data:
-
-            ok, error_msg_for_user, reason_for_skipping = self._create_friendship(friendship_to_import)
+        progress = ImportProgress(friends_data)
+        for row, friendship_to_import in enumerate(friends_data):
+
+            if friendship_to_import['fr_id'] in settled:
+                status, reason_for_skipping = settled[friendship_to_import['fr_id']]
+                self.ulog.debug("Friendship: %s already settled as: %s", friendship_to_import, status)
+                if status == ImportJournal.STATUS_IMPORTED:
+                    progress.mark_imported(row)
+                else:
+                    progress.mark_skipped(row, reason_for_skipping)
+                continue
+
+            try:
+                yield from self._wait_for_next()
+                ok, error_msg_for_user, reason_for_skipping = yield from self._create_friendship(friendship_to_import)
+            except WaitCancelledError:
+                self.ulog.warn("A wait was cancelled. Stopping the import.")
+                ok, error_msg_for_user, reason_for_skipping = \
+                    False, "The import was interrupted. It can be resumed with the --resume option.", None
 
             if ok:
-                self.ulog.debug(f"Appending imported friendship: {friendship_to_import} to log.")
-                screen_names_imported.append(friendship_to_import['screen_name'])
-                self.ulog.debug(f"Removing imported friendship: {friendship_to_import} from remaining.")
-                friendships_remaining.remove(friendship_to_import)
-                self._wait_for_next(num_friends)
+                self.rate_limiter.record_request()
+                journal.record_imported(friendship_to_import)
+                ROWS.inc(outcome="imported")
+                self.ulog.debug("Recording imported friendship: %s", friendship_to_import)
+                progress.mark_imported(row)
 
             elif reason_for_skipping:
-                idx = friendships_remaining.index(friendship_to_import)
-                friendships_remaining[idx]['reason_for_skipping'] = reason_for_skipping
-                self._wait_for_next(num_friends)
+                self.rate_limiter.record_request()
+                journal.record_skipped(friendship_to_import, reason_for_skipping)
+                ROWS.inc(outcome="skipped")
+                progress.mark_skipped(row, reason_for_skipping)
 
             else:
                 self.ulog.warn("Problem importing friendships!")
-                if screen_names_imported:
-                    self.ulog.warn(f"Still were able to import {len(screen_names_imported)} friends")
-                self.ulog.debug(f"Imported user screen names: {screen_names_imported}")
-                self.ulog.debug(f"Error message for user: {error_msg_for_user}")
-                return False, screen_names_imported, friendships_remaining, error_msg_for_user
-
-        self.ulog.info(f"Created {len(screen_names_imported)} friendships sucessfully!")
-        self.ulog.debug(f"Imported user screen names: {screen_names_imported}")
-        return True, screen_names_imported, friendships_remaining, None
-
-    def _wait_for_next(self, num_friends):
-        # calculate seconds to wait to throttle requests
-        seconds_to_wait, check_every = self._throttle_seconds_to_wait(num_friends)
-        self.ulog.info(f"Throttle: waiting for {seconds_to_wait} seconds...")
-        self.waiter.sleep_for(seconds_to_wait, check_every)
-        self.ulog.info("Throttle: resuming activity")
-
-    def _throttle_seconds_to_wait(self, num_friends):
-        # Calculate the number of seconds to wait depending on the size of the
-        # data to import. Add some randomization.
-        #
-        # Returns: tuple with:
-        #   - seconds to wait
-        #   - seconds to check the clock periodically
-        if num_friends > self.MAX_FRIEND_REQUESTS_PER_DAY:
-            # have a bit of a randomization when waiting while ensuring
-            # we stick to the daily limit.
-            lower_bound = int(24 * 3600 / self.MAX_FRIEND_REQUESTS_PER_DAY)
-            upper_bound = int(25 * 3600 / self.MAX_FRIEND_REQUESTS_PER_DAY)
-            check_every = self.THROTTLE_SLEEP_CHECK_EVERY_SECS
-        else:
-            # Small waiting time to avoid surpassing 30 follow requests per minute
-            lower_bound = 2
-            upper_bound = 3
-            check_every = 1
-
-        return random.randint(lower_bound, upper_bound), check_every
-
-    def _create_friendship(self, friendship_to_import, retried=0, max_retries=3):
+                if progress.num_imported:
+                    self.ulog.warn(f"Still were able to import {progress.num_imported} friends")
+                screen_names_imported = progress.screen_names_imported()
+                self.ulog.debug("Imported user screen names: %s", screen_names_imported)
+                self.ulog.debug("Error message for user: %s", error_msg_for_user)
+                return False, screen_names_imported, progress.friendships_remaining(), error_msg_for_user
+
+        self.ulog.info(f"Created {progress.num_imported} friendships sucessfully!")
+        screen_names_imported = progress.screen_names_imported()
+        self.ulog.debug("Imported user screen names: %s", screen_names_imported)
+        return True, screen_names_imported, progress.friendships_remaining(), None
+
+    def _wait_for_next(self):
+        # Wait (yield the seconds to wait) until the rate limiter allows sending one more friendship request
+        seconds_to_wait = math.ceil(self.rate_limiter.seconds_until_available())
+        if seconds_to_wait > 0:
+            self.ulog.info(f"Throttle: waiting for {seconds_to_wait} seconds...")
+            THROTTLE_SECONDS.inc(seconds_to_wait)
+            with self.tracer.span("throttle_wait"):
+                yield seconds_to_wait
+            self.ulog.info("Throttle: resuming activity")
+
+    def _create_friendship(self, friendship_to_import):
         # Try to create a friendship with a Twitter user, handle potential errors,
         # implement retry logic. This method talks to the Tython client, which
-        # posts create_friendship requests to the Twitter API.
+        # posts create_friendship requests to the Twitter API. It's a generator
+        # yielding the seconds to wait before retrying.
         #
         # Returns: tuple with:
         #   - bool indicating success/failure
         #   - str potential message for the end user
+        #   - str potential reason for skipping the friendship
         screen_name = friendship_to_import['screen_name']
         fr_id = friendship_to_import['fr_id']
-        self.ulog.debug(f"Creating friendship with {screen_name}")
-        try:
+        retried = 0
+        while True:
+            self.ulog.debug("Creating friendship with %s", screen_name)
+            try:
 
-            self.cli.create_friendship(user_id=fr_id)
+                with self.tracer.span("api_call"):
+                    self.cli.create_friendship(user_id=fr_id)
 
-            self.ulog.info(f"Created friendship with: {screen_name} | ID: {fr_id}")
-            return True, None, None
+                self.ulog.info(f"Created friendship with: {screen_name} | ID: {fr_id}")
+                return True, None, None
+
+            except TwythonError as e:
+                self.ulog.warn(f"ERROR from Twitter: === {e.error_code} === {e}")
+                retry, reason_for_skipping, irrecoverable_error = self._decide_if_retry(friendship_to_import, e)
+                if not retry:
+                    if irrecoverable_error:
+                        return False, irrecoverable_error, None
+                    return False, None, reason_for_skipping
 
-        except TwythonError as e:
-            self.ulog.warn(f"ERROR from Twitter: === {e.error_code} === {e}")
-            retry, reason_for_skipping, irrecoverable_error = self._decide_if_retry(friendship_to_import, e)
-            if retry:
                 retried += 1
-                return self._handle_retry(friendship_to_import,
-                                          retried,
-                                          max_retries)
-            elif irrecoverable_error:
-                return False, irrecoverable_error, None
-            else:
-                return False, None, reason_for_skipping
+                if not (yield from self._handle_retry(friendship_to_import, retried, e)):
+                    return False, "Retried too many times", None
 
     def _decide_if_retry(self, friendship_to_import, err):
         screen_name = friendship_to_import['screen_name']
         is_data_error, reason_for_skipping, irrecoverable_error = self._parse_twithon_error(err, screen_name)
 
         if is_data_error:
-            self.ulog.debug(f"Skipping import of {screen_name} due to: '{reason_for_skipping}'")
+            self.ulog.debug("Skipping import of %s due to: '%s'", screen_name, reason_for_skipping)
             return False, reason_for_skipping, None
         elif irrecoverable_error:
             self.ulog.warn(f"We got an error that we can't recover from! Stopping process! Error: {err.msg}")
             return False, None, irrecoverable_error
         else:
-            self.ulog.debug(f"Will retry import of {screen_name}")
+            self.ulog.debug("Will retry import of %s", screen_name)
             return True, None, None
 
-    def _handle_retry(self,
-                      friendship_to_import,
-                      retried,
-                      max_retries):
-        # Helper method to handle the retrying logic.
-        # After parsing the text of a Twitter error message we can have several scenarios:
+    def _handle_retry(self, friendship_to_import, retried, err):
+        # Helper method to handle the retrying logic. It's a generator yielding the
+        # seconds to wait before retrying.
         #
-        #  - The error raised indicates a problem with the data related to the
-        #    friendship being imported -> Don't retry and report the message to be
-        #    shown to the user
+        # The retry policy decides how long to wait: until the rate limit window resets when
+        # Twitter told us when, otherwise a capped exponential backoff with jitter. A friendship
+        # is retried up to the policy's max retries, and all the retries of the import are taken
+        # from its retry budget. Once either is exhausted, the import is aborted.
         #
-        #  - The error is not about the data but (possibly) API rate limits reached
-        #    and we haven't reached the max number of retries yet -> wait and retry
-        #
-        #  - The error is not about the data but (possibly) API rate limits reached
-        #    and we have reached the max number of retries exactly, meaning,
-        #    this is the last retry -> do a very long wait (around 24 hours) to
-        #    clear the twitter daily limit and retry for the last time
+        # Returns: bool, True to retry the friendship, False to bail out
+        action = self._get_retry_policy().classify(err).action
+        seconds_to_wait = self._get_retry_policy().seconds_to_wait(action,
+                                                                   retried,
+                                                                   self.retry_budget,
+                                                                   self._seconds_until_rate_limit_reset(err))
+        if seconds_to_wait is None:
+            self.ulog.warn(f"OK, we retried to create friendship with {friendship_to_import} "
+                           f"{retried - 1} times ({self.retry_budget}). We are bailing out!")
+            return False
+
+        seconds_to_wait = math.ceil(seconds_to_wait)
+        self.ulog.info(f"Waiting for {seconds_to_wait} seconds...")
+        RETRIES.inc(kind=action)
+        with self.tracer.span("retry_wait"):
+            yield seconds_to_wait
+        self.ulog.info(f"Retrying... ({retried}/{self._get_retry_policy().max_retries})")
+        return True
+
+    def _get_retry_policy(self):
+        # The retry policy, by default built from the importer's retry settings when first needed
         #
-        #  - The error is not about the data but (possibly) API rate limits reached
-        #    and we have exhausted all retries, including the long one -> Don't retry,
-        #    abort the import.
+        # Returns: the RetryPolicy
+        if not self.retry_policy:
+            self.retry_policy = RetryPolicy(IMPORT_ERROR_RULES,
+                                            max_retries=self.MAX_RETRIES,
+                                            base_seconds=self.RETRY_SHORT_SECONDS_TO_WAIT,
+                                            max_seconds=self.RETRY_LONG_SECONDS_TO_WAIT)
+        return self.retry_policy
+
+    def _seconds_until_rate_limit_reset(self, err):
+        # Twython fills retry_after of a rate limit error with the x-rate-limit-reset header of the response
         #
-        # Returns: tuple with:
-        #  - bool indicating success/failure
-        #  - str potential message for the end user
-        if retried < max_retries:
-            seconds_to_wait = self.RETRY_SHORT_SECONDS_TO_WAIT * retried
-            self.ulog.info(f"Waiting for {seconds_to_wait} seconds...")
-            self.waiter.sleep_for(seconds_to_wait, self.RETRY_SLEEP_CHECK_EVERY_SECS)
-            self.ulog.info(f"Retrying... ({retried}/{max_retries})")
-            return self._create_friendship(friendship_to_import, retried=retried, max_retries=max_retries)
-
-        elif retried == max_retries:
-            seconds_to_wait = self.RETRY_LONG_SECONDS_TO_WAIT
-            self.ulog.info(
-                f"We reached the max number of retries: {max_retries} when trying to create friendship "
-                f"with {friendship_to_import}. We will have sleep for a longer time: {seconds_to_wait} seconds!")
-            self.ulog.info(f"Waiting for {seconds_to_wait} seconds...")
-            self.waiter.sleep_for(seconds_to_wait, self.RETRY_SLEEP_CHECK_EVERY_SECS)
-            self.ulog.info(f"Retrying... ({retried}/{max_retries})")
-            return self._create_friendship(friendship_to_import, retried=retried, max_retries=max_retries)
-
-        else:
-            self.ulog.warn(f"OK, we retried to create friendship with {friendship_to_import} "
-                           f"for the last time after {self.RETRY_LONG_SECONDS_TO_WAIT} seconds. "
-                           "We are bailing out!")
-            return False, "Retried too many times", None
+        # Returns: seconds to wait until the rate limit window resets, None if unknown
+        reset = getattr(err, 'retry_after', None)
+        try:
+            return max(math.ceil(int(reset) - self.clock.time()), 0) + 1 if reset else None
+        except ValueError:
+            return None
 
     def _parse_twithon_error(self, err, screen_name):
-        # Very simple, naive parsing of an actual error string returned by Twitter.
-        # It only recognizes the situations (that we know of) that requires the user to modify
-        # the CSV file to remove a row that cannot and will not ever be imported.
+        # Classify an actual error returned by Twitter with the retry policy's error table.
+        # It recognizes the situations (that we know of) that requires the user to modify
+        # the CSV file to remove a row that cannot and will not ever be imported, and the
+        # ones we can't recover from.
         #
         # Returns: tuple with:
         #   - bool indicating if there is a required action to be taken by the end user to fix the data
         #   - str potential message for the end user
-        skip_import = False
-        reason_for_skipping = None
-
-        cannot_find_user_err: bool = err.msg.find("Cannot find specified user") >= 0
-        you_are_blocked_by_user_err: bool = err.msg.find("You have been blocked") >= 0
-        already_requested_user: bool = err.msg.find("already requested to follow") >= 0
-        unauthorized: bool = err.msg.find("401 (Unauthorized), Invalid or expired token") >= 0
-
-        if cannot_find_user_err or you_are_blocked_by_user_err or already_requested_user:
-            skip_import = True
-            self.ulog.debug(f"Parsed Twitter error message and it indicates problem with the data. "
-                            f"Err msg: |{err.msg}|")
-        else:
-            self.ulog.debug(f"Parsed Twitter error message and it's not indicative of a problem with the data. "
-                            f"Err msg: |{err.msg}|")
-
-        if cannot_find_user_err:
-            reason_for_skipping = \
-                f"The twitter user: {screen_name} could not be followed - It doesn't exist anymore!"
-        elif you_are_blocked_by_user_err:
-            reason_for_skipping = \
-                f"The twitter user: {screen_name} could not be followed - They blocked your account from " \
-                "following them!"
-        elif already_requested_user:
-            reason_for_skipping = \
-                f"The twitter user: {screen_name} could not be followed - The account is protected."
-
-        if skip_import:
-            return True, reason_for_skipping, None
-
-        if unauthorized:
-            irrecoverable_error = \
-                f"The twitter importer application is not authorized to act on {self.user_screen_name}'s behalf anymore"
-            return False, None, irrecoverable_error
-        else:
-            return False, None, None
+        #   - str potential message about an irrecoverable error
+        rule = self._get_retry_policy().classify(err)
+        reason = rule.format_reason(screen_name=screen_name, user_screen_name=self.user_screen_name)
+
+        if rule.action == ACTION_SKIP:
+            self.ulog.debug("Parsed Twitter error message and it indicates problem with the data. "
+                            "Err msg: |%s|", err.msg)
+            return True, reason, None
+
+        self.ulog.debug("Parsed Twitter error message and it's not indicative of a problem with the data. "
+                        "Err msg: |%s|", err.msg)
+        if rule.action == ACTION_ABORT:
+            return False, None, reason or f"Twitter error: {err.msg}"
+        return False, None, None
 
     def _build_user_message_process_unfinished(self, err_msg_details_for_user, screen_names_imported):
         # Build a message for the user after the import process was unsuccessful. There could
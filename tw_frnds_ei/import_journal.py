@@ -0,0 +1,132 @@
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import IO
+from typing import Dict
+from typing import Optional
+
+from tw_frnds_ei.screen_name_logger import ScreenNameLogger
+
+logger = logging.getLogger(__name__)
+
+
+class ImportJournal:
+    """An append-only journal recording the progress of an import process.
+
+    Every friendship that gets imported or skipped is appended to the journal as a single JSON line, and the file is
+    flushed and fsync'd before the importer moves on. If the process dies in the middle of a (potentially days long)
+    import, the journal can be replayed to know which rows of the CSV file were already processed.
+
+    There is one journal per authenticated user and CSV file. It lives next to the CSV file being imported.
+
+    :param data_dir: Directory the CSV file is read from
+    :type data_dir: str
+
+    :param user_screen_name: Screen name of the authenticated user doing the import
+    :type user_screen_name: str
+
+    :param csv_file_name: Name of the CSV file being imported
+    :type csv_file_name: str
+    """
+
+    STATUS_IMPORTED = "imported"
+    STATUS_SKIPPED = "skipped"
+    JOURNAL_SUFFIX = ".journal"
+
+    def __init__(self, data_dir: str, user_screen_name: str, csv_file_name: str) -> None:
+        """Constructor.
+
+        Sets the location of the journal file. The file is not opened until the journal is started.
+        """
+        data_path = Path(data_dir).joinpath(user_screen_name).resolve()
+        self.journal_path = data_path.joinpath(f"{csv_file_name}{self.JOURNAL_SUFFIX}")
+        self.ulog = ScreenNameLogger(logger=logger, screen_name=user_screen_name)
+        self._journal_file: Optional[IO[str]] = None
+
+    def start(self, resume: bool) -> Dict[int, Dict]:
+        """Open the journal for appending progress records.
+
+        When resuming, the existing journal is replayed and kept. Otherwise any previous journal for the same
+        user and CSV file is discarded and a new one is started.
+
+        :param resume: Whether to resume a previous import of the same CSV file
+        :type resume: bool
+
+        :return: The replayed journal records keyed by friend id (empty when not resuming)
+        :rtype: dict
+        """
+        replayed = self.replay() if resume else {}
+        mode = 'a' if resume else 'w'
+        self.ulog.info(f"Starting import journal ({'resuming' if resume else 'new'}): {self.journal_path}")
+        self._journal_file = open(self.journal_path, mode, encoding="UTF-8")
+        if self._journal_file.tell() > 0 and not self._ends_with_newline():
+            # don't let the first new record be glued to a torn line
+            self._journal_file.write("\n")
+        return replayed
+
+    def replay(self) -> Dict[int, Dict]:
+        """Read all the records written to the journal by previous runs.
+
+        A torn last line (the process died while writing it) is ignored.
+
+        :return: The journal records keyed by friend id. Later records win over earlier ones.
+        :rtype: dict
+        """
+        records: Dict[int, Dict] = {}
+        if not self.journal_path.exists():
+            self.ulog.info(f"No journal to replay: {self.journal_path}")
+            return records
+
+        with open(self.journal_path, 'r', encoding="UTF-8") as journal_file:
+            for line_number, line in enumerate(journal_file, start=1):
+                try:
+                    record = json.loads(line)
+                    records[int(record['fr_id'])] = record
+                except (ValueError, KeyError):
+                    self.ulog.warn(f"Ignoring unreadable journal line {line_number}: |{line.rstrip()}|")
+
+        self.ulog.info(f"Replayed {len(records)} records from journal: {self.journal_path}")
+        return records
+
+    def record_imported(self, friendship: Dict) -> None:
+        """Durably record that a friendship was created."""
+        self._append(friendship, self.STATUS_IMPORTED)
+
+    def record_skipped(self, friendship: Dict, reason_for_skipping: str) -> None:
+        """Durably record that a friendship was skipped and won't ever be imported."""
+        self._append(friendship, self.STATUS_SKIPPED, reason_for_skipping)
+
+    def close(self) -> None:
+        """Close the journal file, if open."""
+        if self._journal_file:
+            self._journal_file.close()
+            self._journal_file = None
+
+    # ---------------
+    # private methods
+    # ---------------
+
+    def _ends_with_newline(self):
+        with open(self.journal_path, 'rb') as journal_file:
+            journal_file.seek(-1, os.SEEK_END)
+            return journal_file.read(1) == b"\n"
+
+    def _append(self, friendship, status, reason_for_skipping: Optional[str] = None):
+        # Write one record and make sure it reaches the disk before returning
+        journal_file = self._journal_file
+        if journal_file is None:
+            raise RuntimeError(f"Journal not started: {self.journal_path}")
+        record = {'ts': int(time.time()),
+                  'screen_name': friendship['screen_name'],
+                  'fr_id': friendship['fr_id'],
+                  'status': status}
+        if reason_for_skipping:
+            record['reason_for_skipping'] = reason_for_skipping
+
+        journal_file.write(json.dumps(record) + "\n")
+        journal_file.flush()
+        os.fsync(journal_file.fileno())
+
+# **** EOC
@@ -0,0 +1,62 @@
+from array import array
+from typing import Dict
+from typing import List
+
+from tw_frnds_ei.friend_table import FriendTable
+
+
+class ImportProgress:
+    """The progress of an import: the status of each row of the friends to import.
+
+    The status of a row is a single byte in an array indexed by row number, and the reasons for skipping rows are
+    kept in a dict holding only the rows skipped. Updating the status of a row takes constant time, whatever the
+    number of rows. The lists of friends imported and remaining are only built when asked for, in row order, straight
+    from the columns of the friends table.
+
+    :param friends_data: The friends to import. Not modified
+    :type friends_data: FriendTable
+    """
+
+    STATUS_PENDING = 0
+    STATUS_IMPORTED = 1
+    STATUS_SKIPPED = 2
+
+    def __init__(self, friends_data: FriendTable) -> None:
+        self.friends_data = friends_data
+        self.statuses = array('b', bytes(len(friends_data)))
+        self.reasons_for_skipping: Dict[int, str] = {}
+        self.num_imported = 0
+
+    def mark_imported(self, row: int) -> None:
+        """Record a row as imported."""
+        if self.statuses[row] != self.STATUS_IMPORTED:
+            self.num_imported += 1
+        self.statuses[row] = self.STATUS_IMPORTED
+        self.reasons_for_skipping.pop(row, None)
+
+    def mark_skipped(self, row: int, reason_for_skipping: str) -> None:
+        """Record a row as skipped (it can't be imported), for a reason."""
+        if self.statuses[row] == self.STATUS_IMPORTED:
+            self.num_imported -= 1
+        self.statuses[row] = self.STATUS_SKIPPED
+        self.reasons_for_skipping[row] = reason_for_skipping
+
+    def screen_names_imported(self) -> List[str]:
+        """The screen names of the friends imported, in row order."""
+        imported = self.STATUS_IMPORTED
+        return [screen_name for screen_name, status in zip(self.friends_data.screen_names, self.statuses)
+                if status == imported]
+
+    def friendships_remaining(self) -> List[Dict]:
+        """Copies of the friends not imported, in row order. The skipped ones include their reason_for_skipping."""
+        remaining = []
+        for row, ((screen_name, fr_id), status) in enumerate(zip(self.friends_data.rows(), self.statuses)):
+            if status == self.STATUS_IMPORTED:
+                continue
+            friendship = {'screen_name': screen_name, 'fr_id': fr_id}
+            if status == self.STATUS_SKIPPED:
+                friendship['reason_for_skipping'] = self.reasons_for_skipping.get(row)
+            remaining.append(friendship)
+        return remaining
+
+# **** EOC
@@ -0,0 +1,249 @@
+import asyncio
+import functools
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable
+from typing import Dict
+from typing import Optional
+
+from twython import Twython
+
+from tw_frnds_ei.api_cache import ApiCache
+from tw_frnds_ei.api_client import ApiClient
+from tw_frnds_ei.clock import SYSTEM_CLOCK
+from tw_frnds_ei.clock import Clock
+from tw_frnds_ei.follow_rate_limiter import FollowRateLimiter
+from tw_frnds_ei.friends_importer import FriendsImporter
+from tw_frnds_ei.friends_importer import ImportResult
+from tw_frnds_ei.waiter import AsyncWaiter
+from tw_frnds_ei.waiter import WaitCancelledError
+from tw_frnds_ei.waiter import Waiter
+
+logger = logging.getLogger(__name__)
+
+
+class ImportScheduler:
+    """A long running scheduler multiplexing many import jobs in a single process.
+
+    Import jobs are JSON files dropped into a spool directory, containing the OAuth user token and secret and the
+    name of the CSV file to import (and optionally ``"resume": true``). Every job runs as a task on a single event
+    loop. The import steps (API calls, journal writes) run on a small pool of worker threads, while the waits between
+    them are timers on the event loop that don't hold any thread. A waiting job costs little more than its importer's
+    state.
+
+    The friendship requests of each account go through a single rate limiter shared by all the jobs of that account,
+    and the steps of those jobs never run at the same time. Every client is wrapped in an ApiClient, so the steps
+    wait for Twitter's rate limit resets before sending requests bound to fail.
+
+    Spool directory layout:
+     * ``[SPOOL_DIR]/*.json``: new jobs
+     * ``[SPOOL_DIR]/running/``: jobs being run. Jobs left there by a stopped scheduler are resumed when it restarts
+     * ``[SPOOL_DIR]/done/`` and ``[SPOOL_DIR]/failed/``: finished jobs, next to a ``.result.json`` file
+
+    The job files hold OAuth credentials: they are made readable by their owner only (mode 0600) as soon as they are
+    picked up, and the credentials are removed from them once the job is finished.
+
+    :param spool_dir: Directory where the job files are dropped
+    :type spool_dir: str
+
+    :param data_dir: The directory where to look for the CSV files to import
+    :type data_dir: str
+
+    :param client_factory: Callable creating a Twitter client from an OAuth user token and secret
+    :type client_factory: callable
+
+    :param max_workers: Max number of import steps running at the same time
+    :type max_workers: int
+
+    :param poll_seconds: Number of seconds between checks of the spool directory for new jobs
+    :type poll_seconds: float
+
+    :param clock: Clock for the waits of the jobs. Defaults to the system clock
+    :type clock: tw_frnds_ei.clock.Clock
+
+    :param api_cache: Cache of the user lookups, shared by the clients of every job. None for no caching
+    :type api_cache: tw_frnds_ei.api_cache.ApiCache
+    """
+
+    JOB_SUFFIX = ".json"
+    RESULT_SUFFIX = ".result.json"
+    RUNNING_DIR = "running"
+    DONE_DIR = "done"
+    FAILED_DIR = "failed"
+    CREDENTIALS_KEYS = ('oauth_user_token', 'oauth_user_token_secret')
+    FILE_MODE = 0o600
+
+    def __init__(self,
+                 spool_dir: str,
+                 data_dir: str,
+                 client_factory: Callable[[str, str], Twython],
+                 max_workers: int = 4,
+                 poll_seconds: float = 10,
+                 clock: Optional[Clock] = None,
+                 api_cache: Optional[ApiCache] = None) -> None:
+        """Constructor.
+
+        Creates the spool directory structure if needed.
+        """
+        self.spool_path = Path(spool_dir).resolve()
+        self.data_dir = data_dir
+        self.client_factory = client_factory
+        self.max_workers = max_workers
+        self.poll_seconds = poll_seconds
+        self.clock = clock if clock else SYSTEM_CLOCK
+        self.api_cache = api_cache
+        for sub_dir in (self.RUNNING_DIR, self.DONE_DIR, self.FAILED_DIR):
+            self.spool_path.joinpath(sub_dir).mkdir(parents=True, exist_ok=True)
+
+        self._jobs: Dict[str, asyncio.Task] = {}
+        self._rate_limiters: Dict[str, FollowRateLimiter] = {}
+        self._account_locks: Dict[str, asyncio.Lock] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._shutdown_event: Optional[asyncio.Event] = None
+        self._workers_shutdown_event = threading.Event()
+
+    async def run(self, until_idle: bool = False) -> None:
+        """Run the scheduler until stopped.
+
+        :param until_idle: Return as soon as there are no jobs left, instead of waiting for new ones
+        :type until_idle: bool
+        """
+        shutdown_event = self._shutdown_event = asyncio.Event()
+        executor = self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                       thread_name_prefix="import_worker")
+        logger.info(f"Import scheduler started. Spool dir: {self.spool_path} - Workers: {self.max_workers}")
+        try:
+            self._start_jobs(self.spool_path.joinpath(self.RUNNING_DIR), resume=True)
+            while not shutdown_event.is_set():
+                self._start_jobs(self.spool_path, resume=False)
+                if until_idle and not self._jobs:
+                    break
+                try:
+                    await asyncio.wait_for(shutdown_event.wait(), timeout=self.poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+
+            logger.info(f"Import scheduler stopping. Waiting for {len(self._jobs)} jobs to finish their current step")
+            await asyncio.gather(*self._jobs.values())
+        finally:
+            executor.shutdown()
+            logger.info("Import scheduler stopped.")
+
+    def stop(self) -> None:
+        """Stop picking new jobs and cancel the waits of the running ones.
+
+        Jobs interrupted this way stay in the running directory and are resumed next time the scheduler starts.
+        """
+        logger.info("Import scheduler asked to stop.")
+        if self._shutdown_event is not None:
+            self._shutdown_event.set()
+        self._workers_shutdown_event.set()
+
+    # ---------------
+    # private methods
+    # ---------------
+
+    def _start_jobs(self, jobs_path, resume):
+        # Move the job files found in jobs_path to the running directory and create a task for each of them
+        running_path = self.spool_path.joinpath(self.RUNNING_DIR)
+        for job_path in sorted(jobs_path.glob(f"*{self.JOB_SUFFIX}")):
+            if job_path.name.endswith(self.RESULT_SUFFIX) or job_path.name in self._jobs:
+                continue
+            running_job_path = running_path.joinpath(job_path.name)
+            if job_path != running_job_path:
+                os.replace(job_path, running_job_path)
+            os.chmod(running_job_path, self.FILE_MODE)
+            logger.info(f"Starting job: {job_path.name} (resume: {resume})")
+            task = asyncio.ensure_future(self._run_job(running_job_path, resume))
+            self._jobs[job_path.name] = task
+            task.add_done_callback(lambda _, job_name=job_path.name: self._jobs.pop(job_name, None))
+
+    async def _run_job(self, job_path, resume):
+        # Run a job and move it to the done or failed directory along with its result.
+        # The finished job file is rewritten without the credentials
+        job = None
+        try:
+            job = json.loads(job_path.read_text(encoding="UTF-8"))
+            ok, msg, frnds_imported, frnds_remaining = await self._import(job, resume or job.get('resume', False))
+        except Exception as e:
+            logger.exception(f"Job {job_path.name} failed")
+            ok, msg, frnds_imported, frnds_remaining = False, f"The job failed: {e}", None, None
+
+        if not ok and self._shutdown_event is not None and self._shutdown_event.is_set():
+            logger.info(f"Job {job_path.name} interrupted. It will be resumed when the scheduler restarts.")
+            return
+
+        finished_path = self.spool_path.joinpath(self.DONE_DIR if ok else self.FAILED_DIR)
+        result = {'ok': ok, 'msg': msg, 'imported': frnds_imported, 'remaining': frnds_remaining}
+        result_file_name = job_path.name[:-len(self.JOB_SUFFIX)] + self.RESULT_SUFFIX
+        self._write_private_file(finished_path.joinpath(result_file_name), json.dumps(result, indent=1))
+        if isinstance(job, dict):
+            finished_job = {key: value for key, value in job.items() if key not in self.CREDENTIALS_KEYS}
+            self._write_private_file(finished_path.joinpath(job_path.name), json.dumps(finished_job))
+            os.remove(job_path)
+        else:
+            # Unreadable job, kept as is (readable by its owner only) for inspection
+            os.replace(job_path, finished_path.joinpath(job_path.name))
+        logger.info(f"Job {job_path.name} finished. OK: {ok}")
+
+    def _write_private_file(self, file_path, text):
+        # Write a file readable by its owner only, replacing any previous one at once
+        temp_file_path = file_path.with_name(file_path.name + ".tmp")
+        with open(os.open(temp_file_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, self.FILE_MODE), 'w',
+                  encoding="UTF-8") as private_file:
+            private_file.write(text)
+        os.chmod(temp_file_path, self.FILE_MODE)
+        os.replace(temp_file_path, file_path)
+
+    async def _import(self, job, resume) -> ImportResult:
+        # Drive the import steps of a job: each step runs on the worker pool, holding the account's lock,
+        # and the waits between steps run on the event loop.
+        loop = asyncio.get_running_loop()
+        # Waits for rate limit resets happen within the steps, on the worker threads
+        api_waiter = Waiter(job['csv_file_name'], cancel_event=self._workers_shutdown_event, clock=self.clock)
+        cli = ApiClient(self.client_factory(job['oauth_user_token'], job['oauth_user_token_secret']),
+                        waiter=api_waiter, cache=self.api_cache)
+        importer = await loop.run_in_executor(self._executor, functools.partial(FriendsImporter, clock=self.clock),
+                                              cli, self.data_dir, job['csv_file_name'], resume)
+        screen_name = importer.user_screen_name
+        if screen_name not in self._rate_limiters:
+            self._rate_limiters[screen_name] = \
+                FriendsImporter.create_rate_limiter(self.data_dir, screen_name, self.clock)
+            self._account_locks[screen_name] = asyncio.Lock()
+        importer.rate_limiter = self._rate_limiters[screen_name]
+        waiter = AsyncWaiter(screen_name, cancel_event=self._shutdown_event, clock=self.clock)
+
+        import_steps = importer.import_steps()
+        cancelled = None
+        while True:
+            async with self._account_locks[screen_name]:
+                finished, value = await loop.run_in_executor(self._executor, _next_import_step,
+                                                             import_steps, cancelled)
+            if finished:
+                importer.ulog.info(importer.tracer.format_breakdown())
+                return value
+            try:
+                await waiter.sleep_for(value)
+                cancelled = None
+            except WaitCancelledError as e:
+                cancelled = e
+
+# **** EOC
+
+
+def _next_import_step(import_steps, cancelled):
+    # Run the import until its next wait, or until it finishes
+    #
+    # Returns: tuple with:
+    #  - bool indicating if the import finished
+    #  - seconds to wait before the next step, or the result of the import when finished
+    try:
+        if cancelled:
+            return False, import_steps.throw(cancelled)
+        return False, next(import_steps)
+    except StopIteration as finished:
+        return True, finished.value
@@ -0,0 +1,132 @@
+import logging
+import os
+import pickle
+import queue
+import socketserver
+import struct
+import threading
+from logging.handlers import QueueHandler
+from logging.handlers import QueueListener
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+from typing import Tuple
+
+from tw_frnds_ei.screen_name_logger import JsonFormatter
+
+logger = logging.getLogger(__name__)
+
+LOG_FORMAT = '%(asctime)s %(levelname)s %(name)s - %(message)s'
+LOG_FILE_MAX_BYTES = 10485760  # 10MB
+LOG_FILE_BACKUP_COUNT = 9
+
+
+def create_file_handler(log_file: str, log_output: str = 'text') -> RotatingFileHandler:
+    """Create the handler writing the logs to a rotating file.
+
+    :param log_file: The log file
+    :type log_file: str
+
+    :param log_output: 'text' or 'json' (one JSON object per line)
+    :type log_output: str
+
+    :return: The handler
+    :rtype: logging.handlers.RotatingFileHandler
+    """
+    file_handler = RotatingFileHandler(filename=log_file,
+                                       mode="a",
+                                       encoding="UTF-8",
+                                       maxBytes=LOG_FILE_MAX_BYTES,
+                                       backupCount=LOG_FILE_BACKUP_COUNT)
+    file_handler.setFormatter(JsonFormatter() if log_output == 'json' else logging.Formatter(LOG_FORMAT))
+    return file_handler
+
+
+def per_process_file_name(log_file: str) -> str:
+    """The name of the log file of the current process: the process id is added before the extension.
+
+    :param log_file: The log file shared by all the processes (e.g. ./logs/application.log)
+    :type log_file: str
+
+    :return: The log file of this process (e.g. ./logs/application.12345.log)
+    :rtype: str
+    """
+    path_file = Path(log_file)
+    return str(path_file.with_name(f"{path_file.stem}.{os.getpid()}{path_file.suffix}"))
+
+
+def start_queue_listener(target_handler: logging.Handler) -> Tuple[QueueHandler, QueueListener]:
+    """Make a target handler non-blocking: records go to an in-memory queue drained by a background thread.
+
+    The queue handler returned is the one to attach to the loggers. It only puts the records on the queue, so the
+    threads logging never wait on the file writes, rotations or socket sends of the target handler. The listener must
+    be stopped when done to flush the records still queued.
+
+    :param target_handler: The handler doing the actual writes
+    :type target_handler: logging.Handler
+
+    :return: The queue handler and the started listener
+    :rtype: tuple
+    """
+    records: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+    listener = QueueListener(records, target_handler, respect_handler_level=True)
+    listener.start()
+    return QueueHandler(records), listener
+
+
+class LogRecordServer(socketserver.ThreadingTCPServer):
+    """A log server: the single writer of the logs of several processes.
+
+    The processes send their records with a ``logging.handlers.SocketHandler`` and the server hands them to one
+    handler (typically a rotating file handler), so that the records don't interleave and the rotations don't race.
+
+    The records are unpickled: the server must only listen on a local address.
+
+    :param handler: The handler writing the records received
+    :type handler: logging.Handler
+
+    :param port: Port to listen on. 0 for any free port
+    :type port: int
+
+    :param host: Address to listen on. Local only by default
+    :type host: str
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, handler: logging.Handler, port: int, host: str = "127.0.0.1") -> None:
+        self.handler = handler
+        super().__init__((host, port), _LogRecordStreamHandler)
+
+    def serve_in_thread(self) -> threading.Thread:
+        """Serve from a daemon thread, until ``shutdown`` is called.
+
+        :return: The thread serving
+        :rtype: threading.Thread
+        """
+        server_thread = threading.Thread(target=self.serve_forever, name="log_record_server", daemon=True)
+        server_thread.start()
+        return server_thread
+
+# **** EOC
+
+
+class _LogRecordStreamHandler(socketserver.StreamRequestHandler):
+    # Reads the records sent by a SocketHandler: a 4 bytes length followed by the pickled record attributes
+
+    def handle(self):
+        while True:
+            length_bytes = self.connection.recv(4)
+            if len(length_bytes) < 4:
+                break
+            length = struct.unpack(">L", length_bytes)[0]
+            data = self.connection.recv(length)
+            while len(data) < length:
+                chunk = self.connection.recv(length - len(data))
+                if not chunk:
+                    return
+                data += chunk
+            record = logging.makeLogRecord(pickle.loads(data))
+            self.server.handler.handle(record)
+
+# **** EOC
@@ -1,41 +1,60 @@
-import argparse
+import contextlib
 import logging
+import sys
 
-from twython import Twython
-
+import tw_frnds_ei.cli as cli
 import tw_frnds_ei.config_log as log_conf
 import tw_frnds_ei.friends_exporter as exp
-from tw_frnds_ei.config_app import env_config
-from tw_frnds_ei.config_auth import APP_KEY
-from tw_frnds_ei.config_auth import APP_SECRET
+import tw_frnds_ei.waiter as waiter
+from tw_frnds_ei.api_cache import DEFAULT_API_CACHE_FILE
+from tw_frnds_ei.api_cache import ApiCache
+from tw_frnds_ei.api_client import ApiClient
+from tw_frnds_ei.client_factory import TwitterClientFactory
+from tw_frnds_ei.config_app import get_env_config
+from tw_frnds_ei.config_auth import get_app_credentials
+from tw_frnds_ei.metrics import REGISTRY
+from tw_frnds_ei.profiling import profile_run
 
 logger = logging.getLogger(__name__)
-logger.info(f"Logging enabled. Log file: {log_conf.LOG_BASE_FILE_NAME}")
-logger.info(f"Application config loaded. Exporter data dir: {env_config['EXP_DATA_DIR']}")
 
 
 # ---------------------
 # Export main's program
 # ---------------------
-def main(oauth_user_token, oauth_user_token_secret, export_for_user=None):
+def main(oauth_user_token, oauth_user_token_secret, export_for_user=None, engine=exp.ENGINE_LIST, incremental=False,
+         file_format=exp.FORMAT_CSV, metrics_file=None, profile=False):
+    env_config = get_env_config()
+    app_key, app_secret = get_app_credentials()
+    log_file_name = log_conf.setup_logging()
+    logger.info(f"Logging enabled. Log file: {log_file_name}")
+    logger.info(f"Application config loaded. Exporter data dir: {env_config['EXP_DATA_DIR']}")
     print("\nExport process started...")
-    print(f"You may check progress in log file: {log_conf.LOG_BASE_FILE_NAME}\n")
-    twitter_api_client = Twython(APP_KEY, APP_SECRET, oauth_user_token, oauth_user_token_secret)
-    ok, msg, file_name = exp.do_export(twitter_api_client, env_config['EXP_DATA_DIR'], export_for_user)
-
-    if ok:
+    print(f"You may check progress in log file: {log_file_name}\n")
+    waiter.install_shutdown_signal_handlers()
+    client_factory = TwitterClientFactory(app_key, app_secret)
+    api_cache = ApiCache(env_config.get('API_CACHE_FILE', DEFAULT_API_CACHE_FILE))
+    twitter_api_client = ApiClient(client_factory(oauth_user_token, oauth_user_token_secret), cache=api_cache)
+    profiling = profile_run(env_config['APP_LOG_DIR'], "export") if profile else contextlib.nullcontext({})
+    with profiling as profile_reports:
+        ok, msg, file_name = exp.do_export(twitter_api_client, env_config['EXP_DATA_DIR'], export_for_user, engine,
+                                           incremental=incremental, file_format=file_format)
+
+    if ok and file_name:
         print("\nThe export finished correctly! Output file:\n", file_name)
+    elif ok:
+        print("\nThe export finished correctly!\n", msg)
     else:
         print("\nERROR when exporting: \n", msg)
 
+    if metrics_file:
+        print(f"\nMetrics written to: {REGISTRY.write_text_file(metrics_file)}")
+
+    if profile_reports:
+        print(f"\nProfile reports written to:\n {profile_reports}")
+
     return ok, msg, file_name
 
 
 if __name__ == "__main__":
-    arg_parser = argparse.ArgumentParser(description="Export the list of profiles"
-                                                     " a user follows on Twitter to a CSV file.")
-    arg_parser.add_argument("OAUTH_USER_TOKEN")
-    arg_parser.add_argument("OAUTH_USER_TOKEN_SECRET")
-    arg_parser.add_argument("export_for_user")
-    args = arg_parser.parse_args()
-    main(args.OAUTH_USER_TOKEN, args.OAUTH_USER_TOKEN_SECRET, args.export_for_user)
+    # Same as: python -m tw_frnds_ei export
+    sys.exit(cli.main(["export"] + sys.argv[1:]))
@@ -1,28 +1,42 @@
-import argparse
+import contextlib
 import logging
+import sys
 
-from twython import Twython
-
+import tw_frnds_ei.cli as cli
 import tw_frnds_ei.config_log as log_conf
 import tw_frnds_ei.friends_importer as imp
-from tw_frnds_ei.config_app import env_config
-from tw_frnds_ei.config_auth import APP_KEY
-from tw_frnds_ei.config_auth import APP_SECRET
+import tw_frnds_ei.waiter as waiter
+from tw_frnds_ei.api_cache import DEFAULT_API_CACHE_FILE
+from tw_frnds_ei.api_cache import ApiCache
+from tw_frnds_ei.api_client import ApiClient
+from tw_frnds_ei.client_factory import TwitterClientFactory
+from tw_frnds_ei.config_app import get_env_config
+from tw_frnds_ei.config_auth import get_app_credentials
+from tw_frnds_ei.metrics import REGISTRY
+from tw_frnds_ei.profiling import profile_run
 
 logger = logging.getLogger(__name__)
-logger.info(f"Logging enabled. Log file: {log_conf.LOG_BASE_FILE_NAME}")
-logger.info(f"Application config loaded. Importer data dir: {env_config['IMP_DATA_DIR']}")
 
 
 # ---------------------
 # Import main's program
 # ---------------------
-def main(oauth_user_token, oauth_user_token_secret, csv_file_name):
+def main(oauth_user_token, oauth_user_token_secret, csv_file_name, resume=False, metrics_file=None, profile=False):
+    env_config = get_env_config()
+    app_key, app_secret = get_app_credentials()
+    log_file_name = log_conf.setup_logging()
+    logger.info(f"Logging enabled. Log file: {log_file_name}")
+    logger.info(f"Application config loaded. Importer data dir: {env_config['IMP_DATA_DIR']}")
     print("\nImport process started...")
-    print(f"You may check progress in log file: {log_conf.LOG_BASE_FILE_NAME}\n")
-    twitter_api_client = Twython(APP_KEY, APP_SECRET, oauth_user_token, oauth_user_token_secret)
-    ok, msg, frnds_imported, frnds_remaining = \
-        imp.do_import(twitter_api_client, env_config['IMP_DATA_DIR'], csv_file_name)
+    print(f"You may check progress in log file: {log_file_name}\n")
+    waiter.install_shutdown_signal_handlers()
+    client_factory = TwitterClientFactory(app_key, app_secret)
+    api_cache = ApiCache(env_config.get('API_CACHE_FILE', DEFAULT_API_CACHE_FILE))
+    twitter_api_client = ApiClient(client_factory(oauth_user_token, oauth_user_token_secret), cache=api_cache)
+    profiling = profile_run(env_config['APP_LOG_DIR'], "import") if profile else contextlib.nullcontext({})
+    with profiling as profile_reports:
+        ok, msg, frnds_imported, frnds_remaining = \
+            imp.do_import(twitter_api_client, env_config['IMP_DATA_DIR'], csv_file_name, resume)
 
     if ok:
         print(f"\nThe import finished correctly!\n", msg if msg else "")
@@ -35,13 +49,15 @@ def main(oauth_user_token, oauth_user_token_secret, csv_file_name):
     if frnds_remaining:
         print(f"\nFriendships not imported:\n {frnds_remaining}")
 
+    if metrics_file:
+        print(f"\nMetrics written to: {REGISTRY.write_text_file(metrics_file)}")
+
+    if profile_reports:
+        print(f"\nProfile reports written to:\n {profile_reports}")
+
     return ok, msg, frnds_imported, frnds_remaining
 
 
 if __name__ == "__main__":
-    arg_parser = argparse.ArgumentParser(description="Import a list of users to follow on Twitter from a CSV file.")
-    arg_parser.add_argument("OAUTH_USER_TOKEN")
-    arg_parser.add_argument("OAUTH_USER_TOKEN_SECRET")
-    arg_parser.add_argument("csv_file_name")
-    args = arg_parser.parse_args()
-    main(args.OAUTH_USER_TOKEN, args.OAUTH_USER_TOKEN_SECRET, args.csv_file_name)
+    # Same as: python -m tw_frnds_ei import
+    sys.exit(cli.main(["import"] + sys.argv[1:]))
@@ -0,0 +1,36 @@
+import pathlib
+import signal
+import sys
+
+import tw_frnds_ei.cli as cli
+from tw_frnds_ei.config_app import get_env_config
+from tw_frnds_ei.log_handlers import LogRecordServer
+from tw_frnds_ei.log_handlers import create_file_handler
+
+
+# -------------------------
+# Log server main's program
+# -------------------------
+def main(port):
+    env_config = get_env_config()
+    log_file = env_config['APP_LOG_DIR'] + env_config['APP_LOG_FILENAME']
+    pathlib.Path(env_config['APP_LOG_DIR']).mkdir(parents=True, exist_ok=True)
+    file_handler = create_file_handler(log_file, env_config.get('LOG_OUTPUT', 'text'))
+    server = LogRecordServer(file_handler, port)
+    # Stop on SIGTERM as on Ctrl-C
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    print(f"\nLog server listening on: tcp://127.0.0.1:{server.server_address[1]}")
+    print(f"Writing the logs to: {file_handler.baseFilename}\n")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        file_handler.close()
+    print("\nLog server stopped.")
+
+
+if __name__ == "__main__":
+    # Same as: python -m tw_frnds_ei log-server
+    sys.exit(cli.main(["log-server"] + sys.argv[1:]))
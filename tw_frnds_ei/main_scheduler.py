@@ -0,0 +1,63 @@
+import asyncio
+import logging
+import signal
+import sys
+
+import tw_frnds_ei.cli as cli
+import tw_frnds_ei.config_log as log_conf
+from tw_frnds_ei.api_cache import DEFAULT_API_CACHE_FILE
+from tw_frnds_ei.api_cache import ApiCache
+from tw_frnds_ei.client_factory import TwitterClientFactory
+from tw_frnds_ei.config_app import get_env_config
+from tw_frnds_ei.config_auth import get_app_credentials
+from tw_frnds_ei.import_scheduler import ImportScheduler
+from tw_frnds_ei.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+
+# ------------------------
+# Scheduler main's program
+# ------------------------
+def main(spool_dir, max_workers, poll_seconds, until_idle=False, metrics_port=None, metrics_file=None):
+    env_config = get_env_config()
+    app_key, app_secret = get_app_credentials()
+    log_file_name = log_conf.setup_logging()
+    logger.info(f"Logging enabled. Log file: {log_file_name}")
+    logger.info(f"Application config loaded. Importer data dir: {env_config['IMP_DATA_DIR']}")
+    print("\nImport scheduler started...")
+    print(f"Drop import jobs into: {spool_dir}")
+    print(f"You may check progress in log file: {log_file_name}\n")
+    metrics_server = REGISTRY.start_http_server(metrics_port) if metrics_port is not None else None
+    if metrics_server:
+        print(f"Metrics served on: http://127.0.0.1:{metrics_server.server_port}/metrics")
+    # The clients of every job share a pool of keep-alive connections, one per worker
+    client_factory = TwitterClientFactory(app_key, app_secret, pool_maxsize=max_workers)
+    api_cache = ApiCache(env_config.get('API_CACHE_FILE', DEFAULT_API_CACHE_FILE))
+    scheduler = ImportScheduler(spool_dir,
+                                env_config['IMP_DATA_DIR'],
+                                client_factory=client_factory,
+                                max_workers=max_workers,
+                                poll_seconds=poll_seconds,
+                                api_cache=api_cache)
+    asyncio.run(_run_until_signal(scheduler, until_idle))
+    print("\nImport scheduler stopped.")
+    print(f"Connection pool stats: {client_factory.pool_stats()}")
+    print(f"API cache stats: {api_cache.stats()}")
+    client_factory.close()
+    if metrics_file:
+        print(f"Metrics written to: {REGISTRY.write_text_file(metrics_file)}")
+    if metrics_server:
+        metrics_server.shutdown()
+
+
+async def _run_until_signal(scheduler, until_idle):
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, scheduler.stop)
+    await scheduler.run(until_idle)
+
+
+if __name__ == "__main__":
+    # Same as: python -m tw_frnds_ei schedule
+    sys.exit(cli.main(["schedule"] + sys.argv[1:]))
@@ -0,0 +1,262 @@
+import bisect
+import logging
+import os
+import threading
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict
+from typing import List
+from typing import Sequence
+from typing import Tuple
+
+logger = logging.getLogger(__name__)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+class Counter:
+    """A monotonically increasing value per combination of label values.
+
+    :param name: Name of the metric
+    :type name: str
+
+    :param help_text: Description of the metric
+    :type help_text: str
+
+    :param label_names: Names of the labels the values are broken down by
+    :type label_names: sequence of str
+    """
+
+    TYPE = "counter"
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        """Increase the value for some label values.
+
+        :param amount: Amount to add, not negative
+        :type amount: float
+        """
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        """The current value for some label values (0 if never increased)."""
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[Tuple[str, Dict[str, str], float]]:
+        """The samples of the metric, as (sample name, labels, value) tuples."""
+        with self._lock:
+            return [(self.name, dict(zip(self.label_names, key)), value) for key, value in sorted(self._values.items())]
+
+    def _key(self, labels):
+        return tuple(str(labels[label_name]) for label_name in self.label_names)
+
+# **** EOC
+
+
+class Histogram(Counter):
+    """The distribution of observed values (like latencies) per combination of label values, in cumulative buckets.
+
+    :param name: Name of the metric
+    :type name: str
+
+    :param help_text: Description of the metric
+    :type help_text: str
+
+    :param label_names: Names of the labels the values are broken down by
+    :type label_names: sequence of str
+
+    :param buckets: Upper bounds of the buckets, in increasing order. A last ``+Inf`` bucket is always added
+    :type buckets: sequence of float
+    """
+
+    TYPE = "histogram"
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS) -> None:
+        super().__init__(name, help_text, label_names)
+        self.buckets = tuple(buckets)
+        self._observations: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        """Record an observed value for some label values.
+
+        :param value: The value observed
+        :type value: float
+        """
+        key = self._key(labels)
+        with self._lock:
+            bucket_counts, count_sum = self._observations.setdefault(key, ([0] * (len(self.buckets) + 1), [0, 0.0]))
+            bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+            count_sum[0] += 1
+            count_sum[1] += value
+
+    def value(self, **labels) -> float:
+        """The number of values observed for some label values."""
+        with self._lock:
+            observations = self._observations.get(self._key(labels))
+            return observations[1][0] if observations else 0
+
+    def samples(self) -> List[Tuple[str, Dict[str, str], float]]:
+        """The samples of the metric: cumulative bucket counts, count and sum for each combination of labels."""
+        samples: List[Tuple[str, Dict[str, str], float]] = []
+        with self._lock:
+            for key, (bucket_counts, (count, total)) in sorted(self._observations.items()):
+                labels = dict(zip(self.label_names, key))
+                cumulative = 0
+                for upper_bound, bucket_count in zip(self.buckets + (float("inf"),), bucket_counts):
+                    cumulative += bucket_count
+                    samples.append((f"{self.name}_bucket", {**labels, 'le': _format_value(upper_bound)}, cumulative))
+                samples.append((f"{self.name}_count", labels, count))
+                samples.append((f"{self.name}_sum", labels, total))
+        return samples
+
+# **** EOC
+
+
+class MetricsRegistry:
+    """A set of metrics, rendered in the Prometheus text exposition format.
+
+    The metrics can be exposed as a text file (for the node exporter's textfile collector, for instance) written
+    with ``write_text_file`` or served by a local HTTP endpoint started with ``start_http_server``.
+    """
+
+    def __init__(self) -> None:
+        self._metrics: Dict[str, Counter] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help_text: str, label_names: Sequence[str] = ()) -> Counter:
+        """Get the counter with a name, created if needed."""
+        return self._register(Counter, name, help_text, label_names)
+
+    def histogram(self, name: str, help_text: str, label_names: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS) -> Histogram:
+        """Get the histogram with a name, created if needed."""
+        return self._register(Histogram, name, help_text, label_names, buckets=buckets)
+
+    def render(self) -> str:
+        """Render all the metrics in the Prometheus text exposition format.
+
+        :return: The metrics text
+        :rtype: str
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.TYPE}")
+            for sample_name, labels, value in metric.samples():
+                lines.append(f"{sample_name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def write_text_file(self, file_name: str) -> str:
+        """Write the metrics to a text file, replacing it atomically.
+
+        :param file_name: The file to write
+        :type file_name: str
+
+        :return: The full path of the file written
+        :rtype: str
+        """
+        path_file = Path(file_name).resolve()
+        path_file.parent.mkdir(parents=True, exist_ok=True)
+        temp_path_file = path_file.with_name(path_file.name + ".tmp")
+        with open(temp_path_file, 'w', encoding="UTF-8") as metrics_file:
+            metrics_file.write(self.render())
+        os.replace(temp_path_file, path_file)
+        logger.debug(f"Metrics written to: {path_file}")
+        return str(path_file)
+
+    def start_http_server(self, port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+        """Serve the metrics over HTTP (on any path), from a daemon thread.
+
+        :param port: Port to listen on. 0 for any free port
+        :type port: int
+
+        :param host: Address to listen on. Local only by default
+        :type host: str
+
+        :return: The server, to be shut down when done. Its ``server_port`` is the port listened on
+        :rtype: http.server.ThreadingHTTPServer
+        """
+        registry = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = registry.render().encode("UTF-8")
+                self.send_response(200)
+                self.send_header("Content-Type", PROMETHEUS_CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, msg_format, *args):
+                logger.debug(f"Metrics request: {msg_format % args}")
+
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="metrics_http_server", daemon=True).start()
+        logger.info(f"Serving metrics on http://{host}:{server.server_port}/metrics")
+        return server
+
+    # ---------------
+    # private methods
+    # ---------------
+
+    def _register(self, metric_class, name, help_text, label_names, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = metric_class(name, help_text, label_names, **kwargs)
+            elif not isinstance(metric, metric_class) or metric.label_names != tuple(label_names):
+                raise ValueError(f"Metric {name} already registered with another type or labels")
+            return metric
+
+# **** EOC
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for value in labels.values())
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(labels, escaped)) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+# The application's metrics
+REGISTRY = MetricsRegistry()
+
+API_REQUESTS = REGISTRY.counter("tw_frnds_ei_api_requests_total",
+                                "Requests sent to the Twitter API", ("endpoint",))
+API_ERRORS = REGISTRY.counter("tw_frnds_ei_api_errors_total",
+                              "Requests to the Twitter API that failed, by error class", ("endpoint", "error"))
+API_REQUEST_SECONDS = REGISTRY.histogram("tw_frnds_ei_api_request_duration_seconds",
+                                         "Duration of the requests to the Twitter API", ("endpoint",))
+RATE_LIMIT_WAITS = REGISTRY.counter("tw_frnds_ei_rate_limit_waits_total",
+                                    "Waits for a rate limit reset before sending a request", ("endpoint",))
+WAITS = REGISTRY.counter("tw_frnds_ei_waits_total", "Waits done by the waiters")
+WAIT_SECONDS = REGISTRY.counter("tw_frnds_ei_wait_seconds_total", "Time spent by the waiters waiting")
+THROTTLE_SECONDS = REGISTRY.counter("tw_frnds_ei_throttle_seconds_total",
+                                    "Time the friendship requests were held back by the follow rate limiter")
+RETRIES = REGISTRY.counter("tw_frnds_ei_retries_total",
+                           "Retries of a failed request, by kind of wait (retry or wait_for_reset)", ("kind",))
+ROWS = REGISTRY.counter("tw_frnds_ei_rows_total",
+                        "Friends processed: exported, imported or skipped", ("outcome",))
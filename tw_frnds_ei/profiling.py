@@ -0,0 +1,79 @@
+import cProfile
+import io
+import logging
+import pstats
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict
+from typing import Iterator
+
+logger = logging.getLogger(__name__)
+
+TOP_FUNCTIONS = 40  # Functions listed in the CPU profile report
+TOP_ALLOCATIONS = 25  # Source lines listed in the memory report
+TRACEMALLOC_FRAMES = 10  # Frames kept per allocation traceback
+
+
+@contextmanager
+def profile_run(report_dir: str, run_name: str) -> Iterator[Dict[str, str]]:
+    """Profile the CPU time and the memory allocations of the block of code within the context.
+
+    On exit the reports are written to the report directory, as files named after the run and a timestamp:
+     * ``.prof``: the cProfile stats, to be loaded with pstats or a viewer like snakeviz
+     * ``.prof.txt``: the functions taking the most cumulative time
+     * ``.tracemalloc.txt``: the source lines with the most memory allocated and still in use, and the peak
+
+    :param report_dir: Directory to write the reports to
+    :type report_dir: str
+
+    :param run_name: Name of the run profiled (e.g. export), for the report file names
+    :type run_name: str
+
+    :return: A dict filled in on exit with the paths of the reports, by kind (cpu, cpu_stats, memory)
+    :rtype: dict
+    """
+    report_path = Path(report_dir).resolve()
+    report_path.mkdir(parents=True, exist_ok=True)
+    base_name = f"profile_{run_name}_{time.time_ns()}"
+    reports: Dict[str, str] = {}
+
+    profiler = cProfile.Profile()
+    tracemalloc_was_tracing = tracemalloc.is_tracing()
+    if not tracemalloc_was_tracing:
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+    profiler.enable()
+    try:
+        yield reports
+    finally:
+        profiler.disable()
+        snapshot = tracemalloc.take_snapshot()
+        _, peak_bytes = tracemalloc.get_traced_memory()
+        if not tracemalloc_was_tracing:
+            tracemalloc.stop()
+
+        reports['cpu'] = str(report_path.joinpath(base_name + ".prof"))
+        profiler.dump_stats(reports['cpu'])
+        reports['cpu_stats'] = str(report_path.joinpath(base_name + ".prof.txt"))
+        _write_cpu_report(profiler, reports['cpu_stats'])
+        reports['memory'] = str(report_path.joinpath(base_name + ".tracemalloc.txt"))
+        _write_memory_report(snapshot, peak_bytes, reports['memory'])
+        logger.info(f"Profile reports of {run_name} written: {reports}")
+
+
+def _write_cpu_report(profiler, file_name):
+    stats_text = io.StringIO()
+    pstats.Stats(profiler, stream=stats_text).sort_stats(pstats.SortKey.CUMULATIVE).print_stats(TOP_FUNCTIONS)
+    Path(file_name).write_text(stats_text.getvalue(), encoding="UTF-8")
+
+
+def _write_memory_report(snapshot, peak_bytes, file_name):
+    snapshot = snapshot.filter_traces((tracemalloc.Filter(False, tracemalloc.__file__),
+                                       tracemalloc.Filter(False, "<frozen importlib._bootstrap*>")))
+    top_stats = snapshot.statistics('lineno')
+    lines = [f"Peak traced memory: {peak_bytes / 1024:.1f} KiB",
+             f"Memory still allocated at the end: {sum(stat.size for stat in top_stats) / 1024:.1f} KiB",
+             f"Top {TOP_ALLOCATIONS} source lines by memory allocated:"]
+    lines.extend(str(stat) for stat in top_stats[:TOP_ALLOCATIONS])
+    Path(file_name).write_text("\n".join(lines) + "\n", encoding="UTF-8")
@@ -0,0 +1,250 @@
+import logging
+import random
+import threading
+from typing import Optional
+from typing import Sequence
+
+from twython import TwythonError
+from twython import TwythonRateLimitError
+
+logger = logging.getLogger(__name__)
+
+# What to do about a failed request
+ACTION_SKIP = "skip"  # The request can never succeed (a problem with the data): move on to the next one
+ACTION_RETRY = "retry"  # A transient error: retry after a backoff
+ACTION_ABORT = "abort"  # Retrying won't help: stop the whole job
+ACTION_WAIT_FOR_RESET = "wait_for_reset"  # A rate limit: retry once the rate limit window is reset
+
+SERVER_ERROR_STATUSES = (500, 502, 503, 504)
+
+
+class ErrorRule:
+    """A row of an error table: which errors it matches and what to do about them.
+
+    An error matches when all the criteria given match: its class, its HTTP status (the ``error_code`` of the
+    Twython errors) and a text in its message (Twitter's error message, e.g. "Cannot find specified user" for
+    Twitter's error code 108).
+
+    :param action: What to do about the errors matched. One of the ``ACTION_*`` values
+    :type action: str
+
+    :param message: Text found in the message of the errors matched
+    :type message: str
+
+    :param http_statuses: HTTP statuses of the errors matched
+    :type http_statuses: sequence of int
+
+    :param error_class: Class of the errors matched
+    :type error_class: type
+
+    :param reason: Explanation for the user. May refer to {screen_name} (the user the request was about) and to
+    {user_screen_name} (the authenticated user)
+    :type reason: str
+    """
+
+    __slots__ = ('action', 'message', 'http_statuses', 'error_class', 'reason')
+
+    def __init__(self,
+                 action: str,
+                 message: Optional[str] = None,
+                 http_statuses: Sequence[int] = (),
+                 error_class: Optional[type] = None,
+                 reason: Optional[str] = None) -> None:
+        self.action = action
+        self.message = message
+        self.http_statuses = tuple(http_statuses)
+        self.error_class = error_class
+        self.reason = reason
+
+    def matches(self, err: TwythonError) -> bool:
+        """Whether an error is matched by this rule."""
+        if self.error_class is not None and not isinstance(err, self.error_class):
+            return False
+        if self.http_statuses and getattr(err, 'error_code', None) not in self.http_statuses:
+            return False
+        if self.message is not None and str(getattr(err, 'msg', err)).find(self.message) < 0:
+            return False
+        return True
+
+    def format_reason(self, **names) -> Optional[str]:
+        """The explanation for the user, with the names it refers to filled in."""
+        return self.reason.format(**names) if self.reason else None
+
+    def __repr__(self):
+        return f"ErrorRule(action={self.action}, message={self.message}, http_statuses={self.http_statuses}, " \
+               f"error_class={self.error_class.__name__ if self.error_class else None})"
+
+# **** EOC
+
+
+# The errors of the friendship creation requests
+IMPORT_ERROR_RULES = (
+    ErrorRule(ACTION_SKIP, message="Cannot find specified user",  # Twitter error code 108
+              reason="The twitter user: {screen_name} could not be followed - It doesn't exist anymore!"),
+    ErrorRule(ACTION_SKIP, message="You have been blocked",  # Twitter error code 162
+              reason="The twitter user: {screen_name} could not be followed - They blocked your account from "
+                     "following them!"),
+    ErrorRule(ACTION_SKIP, message="already requested to follow",  # Twitter error code 160
+              reason="The twitter user: {screen_name} could not be followed - The account is protected."),
+    ErrorRule(ACTION_ABORT, message="401 (Unauthorized), Invalid or expired token",  # Twitter error code 89
+              reason="The twitter importer application is not authorized to act on {user_screen_name}'s behalf "
+                     "anymore"),
+    ErrorRule(ACTION_WAIT_FOR_RESET, error_class=TwythonRateLimitError),
+    ErrorRule(ACTION_RETRY, http_statuses=SERVER_ERROR_STATUSES),
+)
+
+# The errors of the friends retrieval requests. Anything else aborts the export
+EXPORT_ERROR_RULES = (
+    ErrorRule(ACTION_WAIT_FOR_RESET, error_class=TwythonRateLimitError),
+    ErrorRule(ACTION_RETRY, http_statuses=SERVER_ERROR_STATUSES),
+)
+
+
+class RetryBudget:
+    """The retries a job (an export or an import) may still do, shared by all its requests.
+
+    :param max_retries: Max number of retries of the job
+    :type max_retries: int
+
+    :param max_seconds: Max number of seconds the job may spend waiting before retrying
+    :type max_seconds: float
+    """
+
+    def __init__(self, max_retries: int, max_seconds: float) -> None:
+        self.max_retries = max_retries
+        self.max_seconds = max_seconds
+        self.retries = 0
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    def spend(self, seconds: float) -> bool:
+        """Take one retry, after a wait of some seconds, from the budget.
+
+        :param seconds: Seconds to wait before the retry
+        :type seconds: float
+
+        :return: False if the budget doesn't allow it (nothing is taken then)
+        :rtype: bool
+        """
+        with self._lock:
+            if self.retries >= self.max_retries or self.seconds + seconds > self.max_seconds:
+                return False
+            self.retries += 1
+            self.seconds += seconds
+            return True
+
+    def __repr__(self):
+        return f"RetryBudget(retries={self.retries}/{self.max_retries}, " \
+               f"seconds={self.seconds:.0f}/{self.max_seconds:.0f})"
+
+# **** EOC
+
+
+class RetryPolicy:
+    """Decides what to do about failed requests and how long to wait before retrying them.
+
+    Errors are classified by the first rule of the error table matching them. Retries wait for a capped exponential
+    backoff: ``base_seconds``, then twice as long at each retry, up to ``max_seconds``. Each wait is stretched by a
+    random jitter of up to ``jitter`` times its length, so that the clients failing together don't retry together.
+    Rate limit errors telling when the rate limit window is reset wait until then instead.
+
+    :param rules: The error table
+    :type rules: sequence of ErrorRule
+
+    :param default_action: The action for the errors no rule matches
+    :type default_action: str
+
+    :param max_retries: Max number of retries of a single request
+    :type max_retries: int
+
+    :param base_seconds: Wait before the first retry
+    :type base_seconds: float
+
+    :param max_seconds: Cap of the backoff waits
+    :type max_seconds: float
+
+    :param jitter: Max fraction of a wait added at random
+    :type jitter: float
+
+    :param rng: Source of the jitter. Defaults to a new random.Random
+    :type rng: random.Random
+    """
+
+    def __init__(self,
+                 rules: Sequence[ErrorRule],
+                 default_action: str = ACTION_RETRY,
+                 max_retries: int = 4,
+                 base_seconds: float = 30,
+                 max_seconds: float = 900,
+                 jitter: float = 0.5,
+                 rng: Optional[random.Random] = None) -> None:
+        self.rules = tuple(rules)
+        self.default_rule = ErrorRule(default_action)
+        self.max_retries = max_retries
+        self.base_seconds = base_seconds
+        self.max_seconds = max_seconds
+        self.jitter = jitter
+        self.rng = rng if rng else random.Random()
+
+    def classify(self, err: TwythonError) -> ErrorRule:
+        """The rule of the error table matching an error (the default one if none does).
+
+        :param err: The error
+        :type err: twython.TwythonError
+
+        :return: The rule, with the action to take
+        :rtype: ErrorRule
+        """
+        for rule in self.rules:
+            if rule.matches(err):
+                return rule
+        return self.default_rule
+
+    def backoff(self, retried: int) -> float:
+        """The seconds to wait before a retry, jitter included.
+
+        :param retried: Number of the retry (1 for the first one)
+        :type retried: int
+
+        :return: The seconds to wait
+        :rtype: float
+        """
+        delay = min(self.max_seconds, self.base_seconds * 2 ** max(retried - 1, 0))
+        return min(self.max_seconds, delay * (1 + self.jitter * self.rng.random()))
+
+    def seconds_to_wait(self,
+                        action: str,
+                        retried: int,
+                        budget: RetryBudget,
+                        seconds_until_reset: Optional[float] = None) -> Optional[float]:
+        """The seconds to wait before retrying a request, if it may be retried.
+
+        :param action: The action for the error of the request (ACTION_RETRY or ACTION_WAIT_FOR_RESET)
+        :type action: str
+
+        :param retried: Number of the retry (1 for the first one)
+        :type retried: int
+
+        :param budget: The retry budget of the job, spent by the retry
+        :type budget: RetryBudget
+
+        :param seconds_until_reset: Seconds until the rate limit window is reset, if known
+        :type seconds_until_reset: float
+
+        :return: The seconds to wait, None if the request must not be retried (too many retries of the request or
+        budget of the job exhausted)
+        :rtype: float
+        """
+        if action not in (ACTION_RETRY, ACTION_WAIT_FOR_RESET) or retried > self.max_retries:
+            return None
+        if action == ACTION_WAIT_FOR_RESET and seconds_until_reset is not None:
+            seconds = max(seconds_until_reset, 0)
+        else:
+            seconds = self.backoff(retried)
+        if not budget.spend(seconds):
+            logger.info(f"Retry budget exhausted: {budget}")
+            return None
+        return seconds
+
+# **** EOC
+
@@ -1,17 +1,57 @@
-class ScreenNameLogger:
-    def __init__(self, logger, screen_name):
-        self.logger = logger
+import json
+import logging
+
+
+class ScreenNameLogger(logging.LoggerAdapter):
+    """A logger adapter prefixing the messages with the Twitter user name they're about.
+
+    Like any logger, it defers the formatting: nothing is done for a message of a disabled level, and the
+    message arguments (``ulog.debug("Page %s retrieved", page)``) are only merged into the message when a record
+    is emitted. Messages logged often should use arguments rather than f-strings, and expensive arguments should be
+    guarded with ``isEnabledFor``.
+
+    The user name is also added to the records, as the ``screen_name`` attribute, for structured output.
+
+    :param logger: The logger to log to
+    :type logger: logging.Logger
+
+    :param screen_name: The Twitter user name
+    :type screen_name: str
+    """
+
+    def __init__(self, logger: logging.Logger, screen_name: str) -> None:
+        super().__init__(logger, {'screen_name': screen_name})
         self.screen_name = screen_name
         self.msg_prefix = f"[{self.screen_name}] - "
 
-    def debug(self, msg):
-        self.logger.debug(f"{self.msg_prefix}{msg}")
+    def process(self, msg, kwargs):
+        # Only called for the levels enabled
+        kwargs['extra'] = {**self.extra, **kwargs['extra']} if 'extra' in kwargs else self.extra
+        return f"{self.msg_prefix}{msg}", kwargs
+
+    def warn(self, msg, *args, **kwargs):
+        self.warning(msg, *args, **kwargs)
+
+# **** EOC
+
+
+class JsonFormatter(logging.Formatter):
+    """Format log records as JSON objects, one per line, for log collectors.
 
-    def info(self, msg):
-        self.logger.info(f"{self.msg_prefix}{msg}")
+    Every object has the time, level, logger name and message of the record, plus the Twitter user name
+    (``screen_name``) of the records logged through a ScreenNameLogger and the exception, if any.
+    """
 
-    def warn(self, msg):
-        self.logger.warning(f"{self.msg_prefix}{msg}")
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {'time': self.formatTime(record),
+                 'level': record.levelname,
+                 'logger': record.name,
+                 'message': record.getMessage()}
+        screen_name = getattr(record, 'screen_name', None)
+        if screen_name is not None:
+            entry['screen_name'] = screen_name
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
 
-    def error(self, msg):
-        self.logger.error(f"{self.msg_prefix}{msg}")
+# **** EOC
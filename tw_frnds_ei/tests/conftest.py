@@ -1,5 +1,9 @@
+import shutil
+
 import pytest
 
+from tw_frnds_ei.clock import VirtualClock
+from tw_frnds_ei.tests.config_app_test import IMP_DATA_DIR
 from tw_frnds_ei.tests.mock_twython import MockTwython
 
 
@@ -7,6 +11,21 @@ from tw_frnds_ei.tests.mock_twython import MockTwython
 # Test fixtures
 # -----------------------
 
+@pytest.fixture()
+def imp_data_dir(tmp_path):
+    # A copy of the import test data, so that the state the importer persists (journals,
+    # friendship requests sent) doesn't leak from one test to another
+    data_dir = tmp_path.joinpath("import")
+    shutil.copytree(IMP_DATA_DIR, data_dir)
+    return str(data_dir)
+
+
+@pytest.fixture()
+def virtual_clock():
+    # Waits on this clock return straight away, moving the clock forward
+    return VirtualClock()
+
+
 @pytest.fixture()
 def tw_client_ok():
     def _tw_client_ok(user_name, num_friends=None, data_pages=None):
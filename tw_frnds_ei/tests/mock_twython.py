@@ -15,6 +15,8 @@ class MockTwython:
     SCENARIO_SKIP = "SCENARIO_SKIP"
     SCENARIO_ABORT = "SCENARIO_ABORT"
 
+    FIRST_PAGE_CURSOR = 1000
+
     def __init__(self, user, scenario):
         self.user = user
         self.scenario = scenario
@@ -22,7 +24,14 @@ class MockTwython:
         self.data_pages = None
         self.page_err = None
         self.next_retry_ok = False
+        self.pages_err_raised = set()
         self.user_id_err = None
+        self.friendship_requests = []
+        self.cursors_requested = []
+        self.users_looked_up = []
+        self.connections = {}
+        self.friendships_looked_up = []
+        self.rate_limit_headers = {}
 
     def verify_credentials(self, **kwargs):
         return {"screen_name": self.user}
@@ -31,6 +40,7 @@ class MockTwython:
         return {"friends_count": self.num_friends}
 
     def get_friends_list(self, **kwargs):
+        self.cursors_requested.append(kwargs.get('cursor'))
         users = []
         for p in range(10):
             users.append({'screen_name': f"name{self.data_pages}{p}", 'id': 12345 + self.data_pages + p})
@@ -46,15 +56,36 @@ class MockTwython:
         else:
             raise ValueError(f"MockTython has been set with invalid scenario: {self.scenario}")
 
-    @staticmethod
-    def get_lastfunction_header(*args):
-        logger.info(f"header: {args}")
+    def get_friends_ids(self, **kwargs):
+        page = self.get_friends_list(**kwargs)
+        return {'ids': [u['id'] for u in page['users']], 'next_cursor': page['next_cursor']}
+
+    def lookup_user(self, **kwargs):
+        ids = [int(fr_id) for fr_id in kwargs['user_id'].split(",")]
+        self.users_looked_up.append(ids)
+        return [{'screen_name': f"name{fr_id}", 'id': fr_id} for fr_id in reversed(ids)]
+
+    def lookup_friendships(self, **kwargs):
+        ids = [int(fr_id) for fr_id in kwargs['user_id'].split(",")]
+        self.friendships_looked_up.append(ids)
+        # Same payload as Twitter's friendships/lookup
+        return [{'name': f"Name {fr_id}", 'screen_name': f"name{fr_id}", 'id': fr_id, 'id_str': str(fr_id),
+                 'connections': self.connections.get(fr_id, ["none"])}
+                for fr_id in ids]
+
+    def get_lastfunction_header(self, header, default_return_value=None):
+        logger.info(f"header: {header}")
         logger.info(f"time: {int(time.time())}")
-        return int(time.time()) + 2
+        if header in self.rate_limit_headers:
+            return self.rate_limit_headers[header]
+        if header == 'x-rate-limit-reset':
+            return int(time.time()) + 2
+        return default_return_value
 
     def create_friendship(self, **kwargs):
         user_id_to_follow = kwargs['user_id']
         logger.info(f"create_friendship with user_id: {user_id_to_follow}")
+        self.friendship_requests.append(user_id_to_follow)
 
         if self.scenario == self.SCENARIO_OK:
             return None
@@ -93,9 +124,15 @@ class MockTwython:
         return result
 
     def _get_friends_list_page_retry_ok(self, users):
-        error_to_raise = TwythonRateLimitError(error_code=403, msg="Can retry")
+        # Fails once on the page page_err (or on each of the pages of a tuple page_err) without consuming it, as
+        # Twitter does: the same cursor returns the page when requested again. Each page has its own cursor
+        page = self.data_pages - 1
+        pages_err = self.page_err if isinstance(self.page_err, tuple) else (self.page_err,)
+        if page in pages_err and page not in self.pages_err_raised:
+            self.pages_err_raised.add(page)
+            raise TwythonRateLimitError(error_code=403, msg="Can retry")
         self.data_pages -= 1
-        next_cursor = self._process_cursor(error_to_raise)
+        next_cursor = self.FIRST_PAGE_CURSOR + self.data_pages if self.data_pages > 0 else -1
         result = {'users': users, 'next_cursor': next_cursor}
         return result
 
@@ -0,0 +1,350 @@
+import argparse
+import json
+import logging
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from typing import Dict
+from typing import Optional
+from typing import Set
+from typing import Tuple
+from urllib.parse import parse_qs
+from urllib.parse import urlparse
+
+from twython import Twython
+
+from tw_frnds_ei.clock import SYSTEM_CLOCK
+from tw_frnds_ei.clock import Clock
+
+logger = logging.getLogger(__name__)
+
+TwitterError = Tuple[int, int, str]  # HTTP status, Twitter error code, message
+
+RATE_LIMIT_EXCEEDED: TwitterError = (429, 88, "Rate limit exceeded")
+SERVICE_UNAVAILABLE: TwitterError = (503, 130, "Over capacity")
+USER_NOT_FOUND: TwitterError = (404, 108, "Cannot find specified user.")
+BLOCKED_BY_USER: TwitterError = (403, 162, "You have been blocked from following this account at the request "
+                                           "of the user.")
+ALREADY_REQUESTED: TwitterError = (403, 160, "You've already requested to follow this user.")
+
+
+class EndpointConfig:
+    """The behaviour of an endpoint of the stand-in Twitter API.
+
+    :param limit: Max number of requests within a rate limit window. None for no rate limit (and no headers)
+    :type limit: int
+
+    :param window_seconds: Length of the rate limit window in seconds
+    :type window_seconds: int
+
+    :param latency_median: Median of the (log-normal) response latency in seconds
+    :type latency_median: float
+
+    :param latency_sigma: Shape of the (log-normal) response latency. 0 for a constant latency
+    :type latency_sigma: float
+
+    :param error_rate: Probability of answering a request with the injected error
+    :type error_rate: float
+
+    :param error: The injected error
+    :type error: tuple (HTTP status, Twitter error code, message)
+    """
+
+    def __init__(self,
+                 limit: Optional[int] = None,
+                 window_seconds: int = 15 * 60,
+                 latency_median: float = 0.0,
+                 latency_sigma: float = 0.0,
+                 error_rate: float = 0.0,
+                 error: TwitterError = SERVICE_UNAVAILABLE) -> None:
+        self.limit = limit
+        self.window_seconds = window_seconds
+        self.latency_median = latency_median
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self.error = error
+
+    def latency(self) -> float:
+        """Draw the latency of a response, in seconds."""
+        if self.latency_median <= 0:
+            return 0.0
+        return random.lognormvariate(math.log(self.latency_median), self.latency_sigma)
+
+# **** EOC
+
+
+class StandInTwitter:
+    """A local stand-in for the Twitter API endpoints called by the exporter and the importer.
+
+    It serves, over HTTP, a made up account following ``num_friends`` users, with Twitter's paging, rate limit
+    windows and headers (``x-rate-limit-*``, 429 errors) and error payloads. Per endpoint rate limits, latencies and
+    injected errors are configurable, so a real Twython client can be pointed at it to measure the exporter and the
+    importer under realistic conditions, without network access. Authentication is not checked.
+
+    Endpoints: ``account/verify_credentials``, ``users/show``, ``friends/list``, ``friends/ids``,
+    ``users/lookup``, ``friendships/lookup`` and ``friendships/create``.
+
+    :param num_friends: Number of users followed by the account
+    :type num_friends: int
+
+    :param screen_name: Screen name of the authenticated account
+    :type screen_name: str
+
+    :param endpoints: Config overriding the defaults (Twitter's user auth limits) of some endpoints
+    :type endpoints: dict of endpoint name -> EndpointConfig
+
+    :param friendship_errors: Errors returned by friendships/create for some user ids
+    :type friendship_errors: dict of user id -> tuple (HTTP status, Twitter error code, message)
+
+    :param host: Interface to listen on
+    :type host: str
+
+    :param port: Port to listen on. 0 for any free port
+    :type port: int
+
+    :param clock: Clock of the rate limit windows. Defaults to the system clock
+    :type clock: tw_frnds_ei.clock.Clock
+    """
+
+    FIRST_FRIEND_ID = 10_000_000
+
+    DEFAULT_ENDPOINTS = {
+        'account/verify_credentials': EndpointConfig(limit=75),
+        'users/show': EndpointConfig(limit=900),
+        'friends/list': EndpointConfig(limit=15),
+        'friends/ids': EndpointConfig(limit=15),
+        'users/lookup': EndpointConfig(limit=900),
+        'friendships/lookup': EndpointConfig(limit=15),
+        'friendships/create': EndpointConfig(),
+    }
+
+    def __init__(self,
+                 num_friends: int = 3000,
+                 screen_name: str = "stand_in_user",
+                 endpoints: Optional[Dict[str, EndpointConfig]] = None,
+                 friendship_errors: Optional[Dict[int, TwitterError]] = None,
+                 host: str = "127.0.0.1",
+                 port: int = 0,
+                 clock: Optional[Clock] = None) -> None:
+        self.num_friends = num_friends
+        self.screen_name = screen_name
+        self.endpoints = dict(self.DEFAULT_ENDPOINTS, **(endpoints or {}))
+        self.friendship_errors = friendship_errors or {}
+        self.clock = clock if clock else SYSTEM_CLOCK
+        self.following: Set[int] = set()
+        self.requests_served: Dict[str, int] = {name: 0 for name in self.endpoints}
+        self.errors_served: Dict[str, int] = {name: 0 for name in self.endpoints}
+        self._windows: Dict[str, Tuple[float, int]] = {}
+        self._lock = threading.Lock()
+        self._host = host
+        self._server = ThreadingHTTPServer((host, port), _make_handler(self))
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def api_url(self) -> str:
+        """The API url template to set in a Twython client, in place of Twitter's."""
+        return f"http://{self._host}:{self._server.server_port}/%s"
+
+    def configure_client(self, cli: Twython) -> Twython:
+        """Point a Twython client at the stand-in server.
+
+        :return: The same client
+        """
+        cli.api_url = self.api_url
+        cli.client.trust_env = False  # no proxies for the local server
+        return cli
+
+    def friend_id(self, index: int) -> int:
+        """The user id of the friend at a position of the friends list (0 based)."""
+        return self.FIRST_FRIEND_ID + index
+
+    def start(self) -> "StandInTwitter":
+        """Start serving on a background thread."""
+        thread = self._thread = threading.Thread(target=self._server.serve_forever, name="stand_in_twitter",
+                                                 daemon=True)
+        thread.start()
+        logger.info(f"Stand-in Twitter API serving on: {self.api_url % ''}")
+        return self
+
+    def stop(self) -> None:
+        """Stop serving and release the port."""
+        self._server.shutdown()
+        self._server.server_close()
+        logger.info(f"Stand-in Twitter API stopped. Requests served: {self.requests_served}")
+
+    def serve_forever(self) -> None:
+        """Serve on the calling thread until interrupted."""
+        logger.info(f"Stand-in Twitter API serving on: {self.api_url % ''}")
+        self._server.serve_forever()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def handle(self, endpoint: str, params: Dict[str, str]) -> Tuple[int, Dict[str, str], object]:
+        """Answer a request to an endpoint.
+
+        :return: tuple with the HTTP status, the response headers and the JSON payload
+        """
+        config = self.endpoints.get(endpoint)
+        if config is None:
+            return 404, {}, _error_payload(34, "Sorry, that page does not exist.")
+
+        time.sleep(config.latency())
+        headers, rate_limited = self._count_request(endpoint, config)
+        if rate_limited:
+            return self._error(endpoint, headers, RATE_LIMIT_EXCEEDED)
+        if config.error_rate and random.random() < config.error_rate:
+            return self._error(endpoint, headers, config.error)
+
+        handler = getattr(self, "_" + endpoint.replace("/", "_"))
+        result = handler(params)
+        if isinstance(result, tuple):
+            return self._error(endpoint, headers, result)
+        return 200, headers, result
+
+    # ---------------
+    # private methods
+    # ---------------
+
+    def _count_request(self, endpoint, config):
+        # Count the request in the endpoint's current rate limit window
+        #
+        # Returns: tuple with:
+        #  - dict of the rate limit headers
+        #  - bool indicating if the request exceeds the limit
+        with self._lock:
+            self.requests_served[endpoint] += 1
+            if config.limit is None:
+                return {}, False
+            now = self.clock.time()
+            window_start, count = self._windows.get(endpoint, (now, 0))
+            if now >= window_start + config.window_seconds:
+                window_start, count = now, 0
+            count += 1
+            self._windows[endpoint] = (window_start, count)
+
+        headers = {'x-rate-limit-limit': str(config.limit),
+                   'x-rate-limit-remaining': str(max(config.limit - count, 0)),
+                   'x-rate-limit-reset': str(math.ceil(window_start + config.window_seconds))}
+        return headers, count > config.limit
+
+    def _error(self, endpoint, headers, error):
+        status, code, message = error
+        with self._lock:
+            self.errors_served[endpoint] += 1
+        return status, headers, _error_payload(code, message)
+
+    def _user(self, user_id):
+        return {'id': user_id, 'id_str': str(user_id), 'screen_name': f"friend{user_id - self.FIRST_FRIEND_ID}"}
+
+    def _is_friend(self, user_id):
+        return self.FIRST_FRIEND_ID <= user_id < self.FIRST_FRIEND_ID + self.num_friends
+
+    def _page(self, params, max_count):
+        # Returns: tuple with the friend ids of the page at the requested cursor and the next cursor
+        start = max(int(params.get('cursor', -1)), 0)
+        count = min(int(params.get('count', 20)), max_count)
+        end = min(start + count, self.num_friends)
+        next_cursor = end if end < self.num_friends else 0
+        return [self.friend_id(i) for i in range(start, end)], next_cursor
+
+    def _account_verify_credentials(self, params):
+        return dict(self._user(1), screen_name=self.screen_name, friends_count=self.num_friends)
+
+    def _users_show(self, params):
+        return {'id': 1, 'screen_name': params.get('screen_name', self.screen_name), 'friends_count': self.num_friends}
+
+    def _friends_list(self, params):
+        ids, next_cursor = self._page(params, 200)
+        return {'users': [self._user(user_id) for user_id in ids], 'next_cursor': next_cursor}
+
+    def _friends_ids(self, params):
+        ids, next_cursor = self._page(params, 5000)
+        return {'ids': ids, 'next_cursor': next_cursor}
+
+    def _users_lookup(self, params):
+        ids = [int(user_id) for user_id in params['user_id'].split(",")[:100]]
+        return [self._user(user_id) for user_id in ids if self._is_friend(user_id)]
+
+    def _friendships_lookup(self, params):
+        ids = [int(user_id) for user_id in params['user_id'].split(",")[:100]]
+        with self._lock:
+            following = {user_id for user_id in ids if user_id in self.following}
+        return [dict(self._user(user_id), connections=["following"] if user_id in following else ["none"])
+                for user_id in ids]
+
+    def _friendships_create(self, params):
+        user_id = int(params['user_id'])
+        if user_id in self.friendship_errors:
+            return self.friendship_errors[user_id]
+        with self._lock:
+            self.following.add(user_id)
+        return self._user(user_id)
+
+# **** EOC
+
+
+def _error_payload(code, message):
+    return {'errors': [{'code': code, 'message': message}]}
+
+
+def _make_handler(stand_in):
+    # Build the request handler class serving the requests with a StandInTwitter
+    class _Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            self._respond(url.path, parse_qs(url.query))
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            length = int(self.headers.get('Content-Length', 0))
+            body = self.rfile.read(length).decode("UTF-8") if length else ""
+            params = parse_qs(url.query)
+            params.update(parse_qs(body))
+            self._respond(url.path, params)
+
+        def _respond(self, path, params):
+            # /1.1/friends/list.json -> friends/list
+            endpoint = path.strip("/").split("/", 1)[-1].rsplit(".json", 1)[0]
+            status, headers, payload = stand_in.handle(endpoint, {k: v[-1] for k, v in params.items()})
+            body = json.dumps(payload).encode("UTF-8")
+            self.send_response(status)
+            self.send_header('Content-Type', "application/json; charset=utf-8")
+            self.send_header('Content-Length', str(len(body)))
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            logger.debug(f"{self.address_string()} - {format % args}")
+
+    return _Handler
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Serve a local stand-in of the Twitter API endpoints used by "
+                                                     "the exporter and the importer.")
+    arg_parser.add_argument("--port", type=int, default=8080)
+    arg_parser.add_argument("--friends", type=int, default=3000, help="Number of friends of the account")
+    arg_parser.add_argument("--latency", type=float, default=0.0, help="Median response latency in seconds")
+    arg_parser.add_argument("--latency-sigma", type=float, default=0.5, help="Shape of the log-normal latency")
+    arg_parser.add_argument("--error-rate", type=float, default=0.0,
+                            help="Probability of answering any request with a 503 error")
+    args = arg_parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    endpoint_configs = {name: EndpointConfig(limit=config.limit,
+                                             latency_median=args.latency,
+                                             latency_sigma=args.latency_sigma,
+                                             error_rate=args.error_rate)
+                        for name, config in StandInTwitter.DEFAULT_ENDPOINTS.items()}
+    StandInTwitter(num_friends=args.friends, endpoints=endpoint_configs, port=args.port).serve_forever()
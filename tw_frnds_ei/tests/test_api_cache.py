@@ -0,0 +1,85 @@
+import logging
+
+from tw_frnds_ei.api_cache import ApiCache
+from tw_frnds_ei.api_client import ApiClient
+from tw_frnds_ei.clock import VirtualClock
+from tw_frnds_ei.tests.mock_twython import MockTwython
+from tw_frnds_ei.waiter import Waiter
+
+logger = logging.getLogger(__name__)
+
+
+class CountingMockTwython(MockTwython):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.oauth_token = "test_token"
+        self.calls = []
+
+    def verify_credentials(self, **kwargs):
+        self.calls.append('verify_credentials')
+        return {**super().verify_credentials(**kwargs), 'id': 1, 'email': "test_user@example.com"}
+
+    def show_user(self, **kwargs):
+        self.calls.append('show_user')
+        return super().show_user(**kwargs)
+
+
+# -----------------------
+# Tests
+# -----------------------
+
+def test_api_cache_ttl_and_eviction():
+    logger.info("---------- test_api_cache_ttl_and_eviction ----------")
+    clock = VirtualClock()
+    cache = ApiCache(max_entries=2, clock=clock)
+
+    cache.put("a", 1, ttl_seconds=60)
+    cache.put("b", 2, ttl_seconds=600)
+    assert cache.get("a") == 1
+    cache.put("c", 3, ttl_seconds=600)
+    # "b" is the least recently used one
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+    clock.advance(60)
+    assert cache.get("a") is None
+    assert cache.stats() == {'hits': 2, 'misses': 2, 'evictions': 1, 'entries': 1}
+    logger.info("========== test_api_cache_ttl_and_eviction ============")
+
+
+def test_api_cache_persisted(tmp_path):
+    logger.info("---------- test_api_cache_persisted ----------")
+    clock = VirtualClock()
+    cache_file = str(tmp_path / "api_cache.json")
+    cache = ApiCache(cache_file, clock=clock)
+    cache.put("short", "gone", ttl_seconds=10)
+    cache.put("long", {'friends_count': 3}, ttl_seconds=100)
+
+    clock.advance(50)
+    reloaded = ApiCache(cache_file, clock=clock)
+    assert reloaded.get("long") == {'friends_count': 3}
+    assert reloaded.stats()['entries'] == 1
+    logger.info("========== test_api_cache_persisted ============")
+
+
+def test_api_client_cached_lookups():
+    logger.info("---------- test_api_client_cached_lookups ----------")
+    clock = VirtualClock()
+    mock_twython = CountingMockTwython("test_user", MockTwython.SCENARIO_OK)
+    cli = ApiClient(mock_twython, waiter=Waiter("test_user", clock=clock), cache=ApiCache(clock=clock))
+
+    assert cli.verify_credentials()['screen_name'] == "test_user"
+    cached = cli.verify_credentials()
+    # only the non sensitive fields are kept
+    assert cached == {'screen_name': "test_user", 'id': 1}
+    cli.show_user(screen_name="Test_User")
+    cli.show_user(screen_name="test_user")
+    assert mock_twython.calls == ['verify_credentials', 'show_user']
+
+    clock.advance(ApiClient.SHOW_USER_TTL_SECONDS)
+    cli.show_user(screen_name="test_user")
+    cli.verify_credentials()
+    assert mock_twython.calls == ['verify_credentials', 'show_user', 'show_user']
+    assert cli.cache.stats()['hits'] == 3
+    logger.info("========== test_api_client_cached_lookups ============")
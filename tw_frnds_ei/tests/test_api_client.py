@@ -0,0 +1,100 @@
+import logging
+import threading
+import time
+
+import pytest
+
+from tw_frnds_ei.api_client import ApiClient
+from tw_frnds_ei.clock import VirtualClock
+from tw_frnds_ei.tests.mock_twython import MockTwython
+from tw_frnds_ei.waiter import WaitCancelledError
+from tw_frnds_ei.waiter import Waiter
+
+logger = logging.getLogger(__name__)
+
+
+# -----------------------
+# Tests
+# -----------------------
+
+def test_api_client_tracks_rate_limit_headers():
+    logger.info("---------- test_api_client_tracks_rate_limit_headers ----------")
+    mock_twython = MockTwython("test_user", MockTwython.SCENARIO_OK)
+    reset = int(time.time()) + 900
+    mock_twython.rate_limit_headers = {'x-rate-limit-limit': "15",
+                                       'x-rate-limit-remaining': "14",
+                                       'x-rate-limit-reset': str(reset)}
+    clock = VirtualClock()
+    cli = ApiClient(mock_twython, waiter=Waiter("test_user", clock=clock))
+
+    assert cli.verify_credentials()['screen_name'] == "test_user"
+    cli.lookup_friendships(user_id="1,2")
+
+    status = cli.rate_limits['lookup_friendships']
+    assert (status.limit, status.remaining, status.reset) == (15, 14, reset)
+    assert cli.friendships_looked_up == [[1, 2]]
+    assert clock.monotonic() == 0
+    logger.info("========== test_api_client_tracks_rate_limit_headers ============")
+
+
+def test_api_client_waits_for_reset_when_no_requests_left():
+    logger.info("---------- test_api_client_waits_for_reset_when_no_requests_left ----------")
+    mock_twython = MockTwython("test_user", MockTwython.SCENARIO_OK)
+    reset = int(time.time()) + 900
+    mock_twython.rate_limit_headers = {'x-rate-limit-remaining': "1", 'x-rate-limit-reset': str(reset)}
+    clock = VirtualClock()
+    cli = ApiClient(mock_twython, waiter=Waiter("test_user", clock=clock))
+
+    cli.lookup_friendships(user_id="1")
+    # the last request of the window, counted against the remaining ones before being sent
+    cli.lookup_friendships(user_id="2")
+    assert cli.rate_limits['lookup_friendships'].remaining == 1
+    assert clock.monotonic() == 0
+
+    mock_twython.rate_limit_headers['x-rate-limit-remaining'] = "0"
+    cli.lookup_friendships(user_id="3")
+    cli.lookup_friendships(user_id="4")
+
+    assert clock.time() == reset + ApiClient.RESET_MARGIN_SECONDS
+    assert mock_twython.friendships_looked_up == [[1], [2], [3], [4]]
+    # other endpoints have their own limits
+    mock_twython.rate_limit_headers['x-rate-limit-reset'] = str(reset + 900)
+    cli.lookup_user(user_id="5")
+    assert clock.time() == reset + ApiClient.RESET_MARGIN_SECONDS
+    logger.info("========== test_api_client_waits_for_reset_when_no_requests_left ============")
+
+
+def test_api_client_cancelled_wait():
+    logger.info("---------- test_api_client_cancelled_wait ----------")
+    mock_twython = MockTwython("test_user", MockTwython.SCENARIO_OK)
+    mock_twython.rate_limit_headers = {'x-rate-limit-remaining': "0",
+                                       'x-rate-limit-reset': str(int(time.time()) + 900)}
+    cancel_event = threading.Event()
+    cli = ApiClient(mock_twython, waiter=Waiter("test_user", cancel_event=cancel_event))
+    cli.lookup_user(user_id="1")
+
+    cancel_event.set()
+    with pytest.raises(WaitCancelledError):
+        cli.lookup_user(user_id="2")
+
+    assert mock_twython.users_looked_up == [[1]]
+    logger.info("========== test_api_client_cancelled_wait ============")
+
+
+def test_api_client_concurrent_requests_keep_lowest_remaining():
+    logger.info("---------- test_api_client_concurrent_requests_keep_lowest_remaining ----------")
+    mock_twython = MockTwython("test_user", MockTwython.SCENARIO_OK)
+    reset = int(time.time()) + 900
+    mock_twython.rate_limit_headers = {'x-rate-limit-remaining': "10", 'x-rate-limit-reset': str(reset)}
+    cli = ApiClient(mock_twython, waiter=Waiter("test_user", clock=VirtualClock()))
+    cli.lookup_user(user_id="1")
+
+    # a response tracked while another request is in flight, with the headers of an older response
+    cli._in_flight['lookup_user'] = 1
+    cli.lookup_user(user_id="2")
+    assert cli.rate_limits['lookup_user'].remaining == 9
+    # the last request in flight trusts the headers of the last response
+    cli._in_flight['lookup_user'] = 0
+    cli.lookup_user(user_id="3")
+    assert cli.rate_limits['lookup_user'].remaining == 10
+    logger.info("========== test_api_client_concurrent_requests_keep_lowest_remaining ============")
@@ -0,0 +1,91 @@
+import logging
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+import tw_frnds_ei.cli as cli
+import tw_frnds_ei.config_app as config_app
+import tw_frnds_ei.friends_exporter as exp
+from tw_frnds_ei.config_app import ConfigError
+from tw_frnds_ei.config_auth import get_app_credentials
+
+logger = logging.getLogger(__name__)
+
+HEAVY_MODULES = ('twython', 'requests', 'tw_frnds_ei.config_log', 'tw_frnds_ei.friends_exporter',
+                 'tw_frnds_ei.friends_importer')
+
+
+# -----------------------
+# Tests
+# -----------------------
+
+def test_cli_startup_imports_nothing_heavy():
+    logger.info("---------- test_cli_startup_imports_nothing_heavy ----------")
+    code = ("import sys; import tw_frnds_ei.cli as cli; cli.build_parser().parse_args(['export', 'a', 'b', 'c']); "
+            f"print([m for m in {HEAVY_MODULES!r} if m in sys.modules])")
+    completed = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                               cwd=Path(cli.__file__).resolve().parents[1])
+    assert completed.stdout.strip() == "[]"
+
+    # The choices of the command line are the exporter's
+    assert set(cli.EXPORT_ENGINES) == set(exp.EXPORT_ENGINES)
+    assert set(cli.EXPORT_FORMATS) == set(exp.EXPORT_WRITERS)
+    assert cli.EXPORT_ENGINES[0] == exp.ENGINE_LIST and cli.EXPORT_FORMATS[0] == exp.FORMAT_CSV
+    logger.info("========== test_cli_startup_imports_nothing_heavy ============")
+
+
+def test_cli_dry_run_and_validation(monkeypatch, capsys):
+    logger.info("---------- test_cli_dry_run_and_validation ----------")
+    get_app_credentials.cache_clear()
+    monkeypatch.delenv("TW_FRNDS_EI_APP_KEY", raising=False)
+    monkeypatch.setenv("TW_FRNDS_EI_APP_SECRET", "secret")
+    assert cli.main(["export", "token", "token_secret", "jack", "--dry-run"]) == cli.EXIT_BAD_CONFIG
+    assert "TW_FRNDS_EI_APP_KEY" in capsys.readouterr().err
+    with pytest.raises(ConfigError):
+        get_app_credentials()
+
+    get_app_credentials.cache_clear()
+    monkeypatch.setenv("TW_FRNDS_EI_APP_KEY", "key")
+    try:
+        assert cli.main(["export", "token", "token_secret", "jack", "--engine", "ids", "--dry-run"]) == cli.EXIT_OK
+        assert "'ids' engine" in capsys.readouterr().out
+    finally:
+        get_app_credentials.cache_clear()
+    logger.info("========== test_cli_dry_run_and_validation ============")
+
+
+def test_programs_import_without_config():
+    logger.info("---------- test_programs_import_without_config ----------")
+    # Importing the programs reads neither the .env file nor the app credentials: they are read when run
+    code = ("import tw_frnds_ei.main_exporter, tw_frnds_ei.main_importer, tw_frnds_ei.main_scheduler, "
+            "tw_frnds_ei.main_log_server, tw_frnds_ei.config_app as config_app; "
+            "print(config_app.get_env_config.cache_info().currsize)")
+    env = {var: value for var, value in os.environ.items() if not var.startswith("TW_FRNDS_EI_APP_")}
+    completed = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True, env=env,
+                               cwd=Path(cli.__file__).resolve().parents[1])
+    assert completed.stdout.strip() == "0"
+    logger.info("========== test_programs_import_without_config ============")
+
+
+def test_cli_log_server_bad_config(monkeypatch, capsys, tmp_path):
+    logger.info("---------- test_cli_log_server_bad_config ----------")
+    dot_env_file = tmp_path.joinpath(".env")
+    monkeypatch.setattr(config_app, 'dot_env_file_path', dot_env_file)
+    config_app.get_env_config.cache_clear()
+    try:
+        assert cli.main(["log-server"]) == cli.EXIT_BAD_CONFIG
+        assert "Missing config file" in capsys.readouterr().err
+
+        dot_env_file.write_text("APP_LOG_DIR=./logs/\n")
+        assert cli.main(["log-server"]) == cli.EXIT_BAD_CONFIG
+        assert "Bad config file" in capsys.readouterr().err
+
+        dot_env_file.write_text("[DEFAULT]\nAPP_LOG_DIR=./logs/\n")
+        assert cli.main(["log-server"]) == cli.EXIT_BAD_CONFIG
+        assert "['APP_LOG_FILENAME']" in capsys.readouterr().err
+    finally:
+        config_app.get_env_config.cache_clear()
+    logger.info("========== test_cli_log_server_bad_config ============")
@@ -0,0 +1,47 @@
+import logging
+
+from tw_frnds_ei.client_factory import TwitterClientFactory
+from tw_frnds_ei.tests.stand_in_twitter import StandInTwitter
+
+logger = logging.getLogger(__name__)
+
+
+# -----------------------
+# Tests
+# -----------------------
+
+def test_client_factory_clients_share_connections():
+    logger.info("---------- test_client_factory_clients_share_connections ----------")
+    factory = TwitterClientFactory("app_key", "app_secret", pool_maxsize=2)
+    with StandInTwitter(num_friends=10) as stand_in:
+        clients = [stand_in.configure_client(factory(f"token_{user}", "secret")) for user in range(3)]
+        for cli in clients:
+            cli.verify_credentials()
+            cli.show_user(screen_name="someone")
+
+        stats = factory.pool_stats()
+        factory.close()
+
+    assert stats['clients_created'] == 3
+    assert stats['requests_sent'] == 6
+    assert stats['connections_opened'] == 1
+    assert stats['idle_connections'] == 1
+    logger.info("========== test_client_factory_clients_share_connections ============")
+
+
+def test_client_factory_pool_survives_closed_session():
+    logger.info("---------- test_client_factory_pool_survives_closed_session ----------")
+    factory = TwitterClientFactory("app_key", "app_secret")
+    with StandInTwitter(num_friends=10) as stand_in:
+        first_cli = stand_in.configure_client(factory("token_1", "secret"))
+        first_cli.verify_credentials()
+        first_cli.client.close()
+
+        second_cli = stand_in.configure_client(factory("token_2", "secret"))
+        second_cli.verify_credentials()
+
+        stats = factory.pool_stats()
+        factory.close()
+
+    assert stats['connections_opened'] == 1
+    logger.info("========== test_client_factory_pool_survives_closed_session ============")
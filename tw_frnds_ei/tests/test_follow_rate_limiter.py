@@ -0,0 +1,64 @@
+import logging
+import time
+
+from tw_frnds_ei.follow_rate_limiter import FollowRateLimiter
+
+logger = logging.getLogger(__name__)
+
+
+# -----------------------
+# Tests
+# -----------------------
+
+def test_rate_limiter_releases_requests_while_window_has_room(tmp_path):
+    logger.info("---------- test_rate_limiter_releases_requests_while_window_has_room ----------")
+    limiter = FollowRateLimiter(str(tmp_path), "limited_user", max_requests=3, window_seconds=100,
+                                min_interval_seconds=0)
+
+    for _ in range(2):
+        assert limiter.seconds_until_available() == 0
+        limiter.record_request()
+
+    assert limiter.seconds_until_available() == 0
+    limiter.record_request()
+    assert 99 < limiter.seconds_until_available() <= 100
+    logger.info("========== test_rate_limiter_releases_requests_while_window_has_room ============")
+
+
+def test_rate_limiter_enforces_min_interval(tmp_path):
+    logger.info("---------- test_rate_limiter_enforces_min_interval ----------")
+    limiter = FollowRateLimiter(str(tmp_path), "limited_user", max_requests=3, window_seconds=100,
+                                min_interval_seconds=5)
+
+    limiter.record_request()
+
+    assert 4 < limiter.seconds_until_available() <= 5
+    logger.info("========== test_rate_limiter_enforces_min_interval ============")
+
+
+def test_rate_limiter_window_persisted_across_instances(tmp_path):
+    logger.info("---------- test_rate_limiter_window_persisted_across_instances ----------")
+    limiter = FollowRateLimiter(str(tmp_path), "limited_user", max_requests=2, window_seconds=100,
+                                min_interval_seconds=0)
+    limiter.record_request()
+    limiter.record_request()
+
+    next_run_limiter = FollowRateLimiter(str(tmp_path), "limited_user", max_requests=2, window_seconds=100,
+                                         min_interval_seconds=0)
+    other_user_limiter = FollowRateLimiter(str(tmp_path), "other_user", max_requests=2, window_seconds=100,
+                                           min_interval_seconds=0)
+
+    assert 99 < next_run_limiter.seconds_until_available() <= 100
+    assert other_user_limiter.seconds_until_available() == 0
+    logger.info("========== test_rate_limiter_window_persisted_across_instances ============")
+
+
+def test_rate_limiter_forgets_requests_out_of_window(tmp_path):
+    logger.info("---------- test_rate_limiter_forgets_requests_out_of_window ----------")
+    limiter = FollowRateLimiter(str(tmp_path), "limited_user", max_requests=2, window_seconds=100,
+                                min_interval_seconds=0)
+    limiter.request_timestamps.extend([time.time() - 150, time.time() - 50])
+
+    assert limiter.seconds_until_available() == 0
+    assert len(limiter.request_timestamps) == 1
+    logger.info("========== test_rate_limiter_forgets_requests_out_of_window ============")
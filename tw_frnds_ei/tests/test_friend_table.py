@@ -0,0 +1,53 @@
+import logging
+import sys
+
+import pytest
+
+from tw_frnds_ei.binary_export import BinaryFriendsFile
+from tw_frnds_ei.binary_export import write_friends
+from tw_frnds_ei.friend_table import FriendRecord
+from tw_frnds_ei.friend_table import FriendTable
+
+logger = logging.getLogger(__name__)
+
+
+# -----------------------
+# Tests
+# -----------------------
+
+def test_friend_table():
+    logger.info("---------- test_friend_table ----------")
+    table = FriendTable([("jack", 12), ("ev", 20)])
+    table.append("".join(["bi", "z"]), 13)
+
+    assert len(table) == 3
+    assert table.ids.typecode == 'q'
+    assert list(table.rows()) == [("jack", 12), ("ev", 20), ("biz", 13)]
+    assert table[2] is not table[2]
+    assert table.screen_names[2] is sys.intern("biz"), "The screen names are interned"
+
+    friend = table[0]
+    assert friend == FriendRecord("jack", 12)
+    assert friend['fr_id'] == 12 and friend['screen_name'] == "jack"
+    assert dict(friend) == {'screen_name': "jack", 'fr_id': 12}
+    assert friend == {'screen_name': "jack", 'fr_id': 12}
+    with pytest.raises(KeyError):
+        friend['reason_for_skipping']
+
+    assert list(table[1:]) == [FriendRecord("ev", 20), FriendRecord("biz", 13)]
+    logger.info("========== test_friend_table ============")
+
+
+def test_friend_table_from_binary_file(tmp_path):
+    logger.info("---------- test_friend_table_from_binary_file ----------")
+    file_path = tmp_path.joinpath("friends.twfr")
+    with open(file_path, 'wb') as binary_file:
+        write_friends(binary_file, [30, 10, 2 ** 40], ["c", "a", "big"])
+
+    with BinaryFriendsFile(file_path) as binary_file:
+        table = FriendTable.from_columns(binary_file.screen_names(), binary_file.ids)
+    assert list(table.rows()) == [("a", 10), ("c", 30), ("big", 2 ** 40)]
+
+    with pytest.raises(ValueError):
+        FriendTable.from_columns(["a"], [1, 2])
+    logger.info("========== test_friend_table_from_binary_file ============")
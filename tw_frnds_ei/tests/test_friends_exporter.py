@@ -1,7 +1,21 @@
+import csv
 import logging
+import threading
+import time
 
+from twython import TwythonRateLimitError
+
+from tw_frnds_ei.api_client import ApiClient
+from tw_frnds_ei.api_client import RateLimitStatus
+from tw_frnds_ei.binary_export import BinaryFriendsFile
+from tw_frnds_ei.clock import VirtualClock
+from tw_frnds_ei.export_writer import CsvExportWriter
+from tw_frnds_ei.friends_exporter import FORMAT_BINARY
+from tw_frnds_ei.friends_exporter import FriendsDeltaExporter
 from tw_frnds_ei.friends_exporter import FriendsExporter
+from tw_frnds_ei.friends_exporter import FriendsIdsExporter
 from tw_frnds_ei.tests.config_app_test import EXP_DATA_DIR
+from tw_frnds_ei.tests.mock_twython import MockTwython
 
 logger = logging.getLogger(__name__)
 
@@ -60,36 +74,57 @@ def test_exports_friends_several_pages(tw_client_ok):
     logger.info("========== test_exports_friends_several_pages ============")
 
 
-def test_exporter_retries_ok(tw_client_ok_retries):
+def test_exporter_retries_ok(tw_client_ok_retries, virtual_clock):
     logger.info("---------- test_exporter_retries_ok ----------")
     user_name = "retrying_user"
     num_friends = 40
     data_pages = 4
     page_err = 2
     tw_client = tw_client_ok_retries(user_name, num_friends=num_friends, data_pages=data_pages, page_err=page_err)
-    exporter = FriendsExporter(tw_client, EXP_DATA_DIR)
-    exporter.RETRY_SLEEP_CHECK_EVERY_SECS = 3
+    exporter = FriendsExporter(tw_client, EXP_DATA_DIR, clock=virtual_clock)
 
     ok, msg, file_name = exporter.process()
 
     assert ok
     assert msg is None
     assert file_name.find(user_name) > 0
+    failing_cursor = tw_client.FIRST_PAGE_CURSOR + page_err + 1
+    assert tw_client.cursors_requested == [None, failing_cursor, failing_cursor, failing_cursor - 1,
+                                           failing_cursor - 2], "Only the failing page should be requested again"
     with open(file_name, 'r') as csv_file:
         lines = csv_file.readlines()
-        assert len(lines) > 0
+        assert len(lines) == num_friends, "No friend should be lost to the retry"
+        assert len(set(lines)) == num_friends
     logger.info("========== test_exporter_retries_ok ============")
 
 
-def test_exporter_irrecoverable_twitter_err(tw_client_nok):
+def test_exporter_retries_counted_per_page(tw_client_ok_retries, virtual_clock):
+    logger.info("---------- test_exporter_retries_counted_per_page ----------")
+    user_name = "retrying_user"
+    num_friends = 60
+    data_pages = 6
+    page_err = (4, 3, 2, 1)
+    tw_client = tw_client_ok_retries(user_name, num_friends=num_friends, data_pages=data_pages, page_err=page_err)
+    exporter = FriendsExporter(tw_client, EXP_DATA_DIR, clock=virtual_clock)
+
+    ok, msg, file_name = exporter.process()
+
+    assert len(page_err) > exporter.MAX_RETRIES
+    assert ok, "Each page succeeded on its first retry"
+    assert len(tw_client.cursors_requested) == data_pages + len(page_err)
+    with open(file_name, 'r') as csv_file:
+        assert len(csv_file.readlines()) == num_friends
+    logger.info("========== test_exporter_retries_counted_per_page ============")
+
+
+def test_exporter_irrecoverable_twitter_err(tw_client_nok, virtual_clock):
     logger.info("---------- test_exporter_irrecoverable_twitter_err ----------")
     user_name = "erroring_user"
     num_friends = 40
     data_pages = 4
     page_err = 2
     tw_client = tw_client_nok(user_name, num_friends=num_friends, data_pages=data_pages, page_err=page_err)
-    exporter = FriendsExporter(tw_client, EXP_DATA_DIR)
-    exporter.RETRY_SLEEP_CHECK_EVERY_SECS = 3
+    exporter = FriendsExporter(tw_client, EXP_DATA_DIR, clock=virtual_clock)
 
     ok, msg, file_name = exporter.process()
 
@@ -99,6 +134,29 @@ def test_exporter_irrecoverable_twitter_err(tw_client_nok):
     logger.info("========== test_exporter_irrecoverable_twitter_err ============")
 
 
+def test_exporter_keeps_partial_export_on_err(tw_client_nok, tmp_path, virtual_clock):
+    logger.info("---------- test_exporter_keeps_partial_export_on_err ----------")
+    user_name = "erroring_user"
+    tw_client = tw_client_nok(user_name, num_friends=40, data_pages=4, page_err=2)
+    exporter = FriendsExporter(tw_client, str(tmp_path), clock=virtual_clock)
+
+    ok, msg, file_name = exporter.process()
+
+    assert not ok
+    # The rate limit errors fail from the first page on, the other errors once a page was retrieved
+    expected_pages = 0 if tw_client.scenario == MockTwython.SCENARIO_RETRY_NOK else 1
+    assert exporter.pages_retrieved == expected_pages
+    partial_files = list(tmp_path.joinpath(user_name).glob("*" + CsvExportWriter.TEMP_SUFFIX))
+    if expected_pages:
+        assert len(partial_files) == 1
+        with open(partial_files[0], 'r') as csv_file:
+            assert len(csv_file.readlines()) == 10 * expected_pages
+    else:
+        assert not partial_files, "An empty partial export should not be kept"
+    assert not list(tmp_path.joinpath(user_name).glob("*.csv"))
+    logger.info("========== test_exporter_keeps_partial_export_on_err ============")
+
+
 def test_exporter_exports_for_another_user(tw_client_ok):
     logger.info("---------- test_exporter_exports_for_another_user ----------")
     user_name = "jack"
@@ -113,3 +171,149 @@ def test_exporter_exports_for_another_user(tw_client_ok):
     assert msg is None
     assert file_name.find(user_name_to_export_for) > 0
     logger.info("========== test_exporter_exports_for_another_user ============")
+
+
+def test_ids_exporter_exports_friends_several_pages(tw_client_ok):
+    logger.info("---------- test_ids_exporter_exports_friends_several_pages ----------")
+    user_name = "jack"
+    num_friends = 40
+    data_pages = 4
+    tw_client = tw_client_ok(user_name, num_friends=num_friends, data_pages=data_pages)
+    exporter = FriendsIdsExporter(tw_client, EXP_DATA_DIR)
+    exporter.max_cursor_iterations = data_pages  # the mock pages only have 10 ids
+    exporter.LOOKUP_BATCH_SIZE = 3
+
+    ok, msg, file_name = exporter.process()
+
+    assert ok
+    assert msg is None
+    assert len(tw_client.users_looked_up) == 4 * 4  # 10 ids per page, looked up in batches of 3
+    assert all(len(batch) <= 3 for batch in tw_client.users_looked_up)
+    with open(file_name, 'r', newline='') as csv_file:
+        rows = list(csv.reader(csv_file, quoting=csv.QUOTE_NONNUMERIC))
+    assert len(rows) == tw_client.num_friends
+    # batches looked up concurrently, friends written in the order of the ids
+    assert [int(r[1]) for r in rows] == [fr_id for page in (3, 2, 1, 0) for fr_id in range(12346 + page, 12356 + page)]
+    assert all(r[0] == f"name{int(r[1])}" for r in rows)
+    logger.info("========== test_ids_exporter_exports_friends_several_pages ============")
+
+
+def test_delta_exporter_writes_changes_only(tw_client_ok, tmp_path):
+    logger.info("---------- test_delta_exporter_writes_changes_only ----------")
+    user_name = "delta_user"
+    user_path = tmp_path / user_name
+    user_path.mkdir()
+    # the mock's single page has the ids 12346 to 12355
+    with open(user_path / f"friends_{user_name}_100.csv", 'w', newline='') as csv_file:
+        writer = csv.writer(csv_file, quoting=csv.QUOTE_NONNUMERIC)
+        writer.writerows([[f"name{fr_id}", fr_id] for fr_id in range(12346, 12355)] + [["gone", 99]])
+
+    tw_client = tw_client_ok(user_name, num_friends=10, data_pages=1)
+    ok, msg, file_name = FriendsDeltaExporter(tw_client, str(tmp_path)).process()
+
+    assert ok
+    assert file_name.endswith(FriendsDeltaExporter.DELTA_SUFFIX)
+    with open(file_name, 'r', newline='') as csv_file:
+        rows = list(csv.reader(csv_file, quoting=csv.QUOTE_NONNUMERIC))
+    assert rows == [["+", "name12355", 12355], ["-", "gone", 99]]
+    assert tw_client.users_looked_up == [[12355]]
+
+    # the previous friends now include the delta: nothing changed since
+    tw_client = tw_client_ok(user_name, num_friends=10, data_pages=1)
+    ok, msg, file_name = FriendsDeltaExporter(tw_client, str(tmp_path)).process()
+
+    assert ok
+    assert msg
+    assert file_name is None
+    assert tw_client.users_looked_up == []
+    assert len(list(user_path.iterdir())) == 2
+    logger.info("========== test_delta_exporter_writes_changes_only ============")
+
+
+def test_delta_exporter_without_previous_export(tw_client_ok, tmp_path):
+    logger.info("---------- test_delta_exporter_without_previous_export ----------")
+    tw_client = tw_client_ok("first_export_user", num_friends=10, data_pages=1)
+
+    ok, msg, file_name = FriendsDeltaExporter(tw_client, str(tmp_path)).process()
+
+    assert ok
+    assert not file_name.endswith(FriendsDeltaExporter.DELTA_SUFFIX)
+    with open(file_name, 'r') as csv_file:
+        assert len(csv_file.readlines()) == 10
+    logger.info("========== test_delta_exporter_without_previous_export ============")
+
+
+def test_exporter_binary_format(tw_client_ok, tmp_path):
+    logger.info("---------- test_exporter_binary_format ----------")
+    user_name = "binary_user"
+    tw_client = tw_client_ok(user_name, num_friends=10, data_pages=1)
+    exporter = FriendsIdsExporter(tw_client, str(tmp_path), file_format=FORMAT_BINARY)
+    exporter.LOOKUP_BATCH_SIZE = 3
+
+    ok, msg, file_name = exporter.process()
+
+    assert ok
+    assert file_name.endswith(".twfr")
+    with BinaryFriendsFile(file_name) as binary_file:
+        assert list(binary_file.ids) == list(range(12346, 12356))
+        assert binary_file[2] == ("name12348", 12348)
+        assert 12350 in binary_file
+        assert 12345 not in binary_file
+    # the binary export is the previous export of an incremental one
+    tw_client = tw_client_ok(user_name, num_friends=10, data_pages=1)
+    ok, msg, file_name = FriendsDeltaExporter(tw_client, str(tmp_path)).process()
+    assert ok
+    assert file_name is None
+    logger.info("========== test_exporter_binary_format ============")
+
+
+def test_ids_exporter_looks_up_concurrently(tw_client_ok, tmp_path):
+    logger.info("---------- test_ids_exporter_looks_up_concurrently ----------")
+    tw_client = tw_client_ok("concurrent_user", num_friends=10, data_pages=1)
+    lookup_user = tw_client.lookup_user
+    running = []
+    max_running = []
+    lock = threading.Lock()
+
+    def slow_lookup_user(**kwargs):
+        with lock:
+            running.append(1)
+            max_running.append(len(running))
+        time.sleep(0.05)
+        with lock:
+            running.pop()
+        return lookup_user(**kwargs)
+
+    tw_client.lookup_user = slow_lookup_user
+    exporter = FriendsIdsExporter(tw_client, str(tmp_path))
+    exporter.LOOKUP_BATCH_SIZE = 1
+    exporter.LOOKUP_WORKERS = 3
+
+    ok, msg, file_name = exporter.process()
+
+    assert ok
+    assert max(max_running) == 3
+    with open(file_name, 'r', newline='') as csv_file:
+        rows = list(csv.reader(csv_file, quoting=csv.QUOTE_NONNUMERIC))
+    assert [int(r[1]) for r in rows] == list(range(12346, 12356))
+    logger.info("========== test_ids_exporter_looks_up_concurrently ============")
+
+
+def test_exporter_rate_limit_reset_not_from_shared_header(tw_client_ok):
+    logger.info("---------- test_exporter_rate_limit_reset_not_from_shared_header ----------")
+    tw_client = tw_client_ok("rate_limited_user", num_friends=10, data_pages=1)
+    now = 1_700_000_000
+    virtual_clock = VirtualClock(start=now)
+    # The last response header of the client, possibly another thread's
+    tw_client.rate_limit_headers = {'x-rate-limit-reset': str(now + 10)}
+    exporter = FriendsIdsExporter(ApiClient(tw_client, clock=virtual_clock), EXP_DATA_DIR, clock=virtual_clock)
+
+    err = TwythonRateLimitError(msg="Rate limit exceeded", error_code=429, retry_after=str(now + 300))
+    assert exporter._seconds_until_rate_limit_reset(err) == 301, "The reset of the error comes first"
+
+    err = TwythonRateLimitError(msg="Rate limit exceeded", error_code=429)
+    assert exporter._seconds_until_rate_limit_reset(err) == 11, "Without any other, the header is used"
+    exporter.cli.rate_limits['lookup_user'] = RateLimitStatus(900, 0, now + 600)
+    exporter.cli.rate_limits['get_friends_ids'] = RateLimitStatus(15, 3, now + 60)
+    assert exporter._seconds_until_rate_limit_reset(err) == 601, "Then the reset of the exhausted endpoint"
+    logger.info("========== test_exporter_rate_limit_reset_not_from_shared_header ============")
@@ -1,8 +1,14 @@
+import json
 import logging
+import threading
+from pathlib import Path
 
 from twython import TwythonError
 
+from tw_frnds_ei.binary_export import write_friends
 from tw_frnds_ei.friends_importer import FriendsImporter
+from tw_frnds_ei.import_journal import ImportJournal
+from tw_frnds_ei.waiter import Waiter
 from tw_frnds_ei.tests.config_app_test import IMP_DATA_DIR
 
 logger = logging.getLogger(__name__)
@@ -31,8 +37,7 @@ def test_importer_fails_csv_file_too_big(tw_client_ok):
     logger.info("---------- test_importer_fails_csv_file_too_big ----------")
     user_name = "csv_too_big"
     mock_client = tw_client_ok(user_name)
-    importer = FriendsImporter(mock_client, IMP_DATA_DIR, "csv_too_big.test_csv")
-    importer.MAX_CSV_ROWS = 10
+    importer = FriendsImporter(mock_client, IMP_DATA_DIR, "csv_too_big.test_csv", max_num_friends=10)
 
     ok, msg, frnds_imported, frnds_remaining = importer.process()
 
@@ -58,11 +63,11 @@ def test_importer_fails_csv_empty(tw_client_ok):
     logger.info("========== test_importer_fails_csv_empty ============")
 
 
-def test_importer_imports_ok(tw_client_ok):
+def test_importer_imports_ok(tw_client_ok, imp_data_dir, virtual_clock):
     logger.info("---------- test_importer_imports_ok ----------")
     user_name = "importing_user"
     mock_client = tw_client_ok(user_name)
-    importer = FriendsImporter(mock_client, IMP_DATA_DIR, "good_csv.test_csv")
+    importer = FriendsImporter(mock_client, imp_data_dir, "good_csv.test_csv", clock=virtual_clock)
 
     ok, msg, frnds_imported, frnds_remaining = importer.process()
 
@@ -74,13 +79,12 @@ def test_importer_imports_ok(tw_client_ok):
     logger.info("========== test_importer_imports_ok ============")
 
 
-def test_importer_retries_ok(tw_client_ok_retries):
+def test_importer_retries_ok(tw_client_ok_retries, imp_data_dir, virtual_clock):
     logger.info("---------- test_importer_retries_ok ----------")
     user_name = "retry_user"
     user_id_err = 12349  # this user id will fail in the mock twython client
     mock_client = tw_client_ok_retries(user_name, user_id_err=user_id_err)
-    importer = FriendsImporter(mock_client, IMP_DATA_DIR, "good_csv.test_csv")
-    importer.RETRY_SLEEP_CHECK_EVERY_SECS = 4
+    importer = FriendsImporter(mock_client, imp_data_dir, "good_csv.test_csv", clock=virtual_clock)
     importer.RETRY_SHORT_SECONDS_TO_WAIT = 6
     importer.RETRY_LONG_SECONDS_TO_WAIT = 10
 
@@ -90,16 +94,16 @@ def test_importer_retries_ok(tw_client_ok_retries):
     assert not msg
     assert len(frnds_imported) == 6
     assert not frnds_remaining
+    assert virtual_clock.monotonic() >= importer.RETRY_SHORT_SECONDS_TO_WAIT
     logger.info("========== test_importer_retries_ok ============")
 
 
-def test_importer_skipped_user_twitter_data_err(tw_client_skip):
+def test_importer_skipped_user_twitter_data_err(tw_client_skip, imp_data_dir, virtual_clock):
     logger.info("---------- test_importer_skipped_user_twitter_data_err ----------")
     user_name = "importing_user"
     user_id_err = 12349  # this user id will fail in the mock twython client
     mock_client = tw_client_skip(user_name, user_id_err=user_id_err)
-    importer = FriendsImporter(mock_client, IMP_DATA_DIR, "good_csv.test_csv")
-    importer.RETRY_SLEEP_CHECK_EVERY_SECS = 4
+    importer = FriendsImporter(mock_client, imp_data_dir, "good_csv.test_csv", clock=virtual_clock)
     importer.RETRY_SHORT_SECONDS_TO_WAIT = 6
     importer.RETRY_LONG_SECONDS_TO_WAIT = 10
 
@@ -114,13 +118,12 @@ def test_importer_skipped_user_twitter_data_err(tw_client_skip):
     logger.info("========== test_importer_skipped_user_twitter_data_err ============")
 
 
-def test_importer_twitter_irrecoverable_err(tw_client_abort):
+def test_importer_twitter_irrecoverable_err(tw_client_abort, imp_data_dir, virtual_clock):
     logger.info("---------- test_importer_twitter_irrecoverable_err ----------")
     user_name = "erroring_user"
     user_id_err = 12349  # this user id will fail in the mock twython client
     mock_client = tw_client_abort(user_name, user_id_err=user_id_err)
-    importer = FriendsImporter(mock_client, IMP_DATA_DIR, "good_csv.test_csv")
-    importer.RETRY_SLEEP_CHECK_EVERY_SECS = 4
+    importer = FriendsImporter(mock_client, imp_data_dir, "good_csv.test_csv", clock=virtual_clock)
     importer.RETRY_SHORT_SECONDS_TO_WAIT = 6
     importer.RETRY_LONG_SECONDS_TO_WAIT = 10
 
@@ -134,6 +137,113 @@ def test_importer_twitter_irrecoverable_err(tw_client_abort):
     logger.info("========== test_importer_twitter_irrecoverable_err ============")
 
 
+def test_importer_writes_journal(tw_client_ok, imp_data_dir, virtual_clock):
+    logger.info("---------- test_importer_writes_journal ----------")
+    user_name = "importing_user"
+    mock_client = tw_client_ok(user_name)
+    importer = FriendsImporter(mock_client, imp_data_dir, "good_csv.test_csv", clock=virtual_clock)
+
+    ok, msg, frnds_imported, frnds_remaining = importer.process()
+
+    assert ok
+    journal_path = Path(imp_data_dir).joinpath(user_name, "good_csv.test_csv" + ImportJournal.JOURNAL_SUFFIX)
+    with open(journal_path, 'r') as journal_file:
+        records = [json.loads(line) for line in journal_file]
+    assert [r['fr_id'] for r in records] == mock_client.friendship_requests
+    assert all(r['status'] == ImportJournal.STATUS_IMPORTED for r in records)
+    logger.info("========== test_importer_writes_journal ============")
+
+
+def test_importer_resumes_from_journal(tw_client_ok, imp_data_dir, virtual_clock):
+    logger.info("---------- test_importer_resumes_from_journal ----------")
+    user_name = "importing_user"
+    journal_path = Path(imp_data_dir).joinpath(user_name, "good_csv.test_csv" + ImportJournal.JOURNAL_SUFFIX)
+    with open(journal_path, 'w') as journal_file:
+        journal_file.write(json.dumps({'screen_name': "name20", 'fr_id': 12347, 'status': "imported"}) + "\n")
+        journal_file.write(json.dumps({'screen_name': "name21", 'fr_id': 12348, 'status': "skipped",
+                                       'reason_for_skipping': "blocked"}) + "\n")
+        journal_file.write('{"screen_name": "name22", "fr_')  # torn write of a crashed process
+    mock_client = tw_client_ok(user_name)
+    importer = FriendsImporter(mock_client, imp_data_dir, "good_csv.test_csv", resume=True, clock=virtual_clock)
+
+    ok, msg, frnds_imported, frnds_remaining = importer.process()
+
+    assert ok
+    assert mock_client.friendship_requests == [12349, 12350, 12351, 12352]
+    assert len(frnds_imported) == 5
+    assert len(frnds_remaining) == 1
+    assert frnds_remaining[0]['fr_id'] == 12348
+    assert frnds_remaining[0]['reason_for_skipping'] == "blocked"
+    assert len(ImportJournal(imp_data_dir, user_name, "good_csv.test_csv").replay()) == 6
+    logger.info("========== test_importer_resumes_from_journal ============")
+
+
+def test_importer_preflight_skips_settled_friends(tw_client_ok, imp_data_dir, virtual_clock):
+    logger.info("---------- test_importer_preflight_skips_settled_friends ----------")
+    user_name = "importing_user"
+    mock_client = tw_client_ok(user_name)
+    mock_client.connections = {12347: ["following", "followed_by"],
+                               12348: ["following_requested"],
+                               12349: ["blocking", "followed_by"],
+                               12350: ["followed_by", "muting"]}
+    importer = FriendsImporter(mock_client, imp_data_dir, "good_csv.test_csv", clock=virtual_clock)
+    importer.PREFLIGHT_BATCH_SIZE = 4
+
+    ok, msg, frnds_imported, frnds_remaining = importer.process()
+
+    assert ok
+    assert mock_client.friendships_looked_up == [[12347, 12348, 12349, 12350], [12351, 12352]]
+    assert mock_client.friendship_requests == [12350, 12351, 12352]
+    assert len(frnds_imported) == 4
+    assert [f['fr_id'] for f in frnds_remaining] == [12348, 12349]
+    assert frnds_remaining[0]['reason_for_skipping'].find("protected") >= 0
+    assert frnds_remaining[1]['reason_for_skipping'].find("Unblock") >= 0
+    logger.info("========== test_importer_preflight_skips_settled_friends ============")
+
+
+def test_importer_interrupted_by_cancelled_wait(tw_client_ok, imp_data_dir, virtual_clock):
+    logger.info("---------- test_importer_interrupted_by_cancelled_wait ----------")
+    user_name = "importing_user"
+    mock_client = tw_client_ok(user_name)
+    importer = FriendsImporter(mock_client, imp_data_dir, "good_csv.test_csv", clock=virtual_clock)
+    importer.waiter = Waiter(user_name, cancel_event=threading.Event(), clock=virtual_clock)
+    importer.waiter.cancel()
+
+    ok, msg, frnds_imported, frnds_remaining = importer.process()
+
+    assert not ok
+    assert msg.find("--resume") >= 0
+    assert len(frnds_imported) == 1  # the first request doesn't need to wait
+    assert len(frnds_remaining) == 5
+    assert len(ImportJournal(imp_data_dir, user_name, "good_csv.test_csv").replay()) == 1
+    logger.info("========== test_importer_interrupted_by_cancelled_wait ============")
+
+
+def test_importer_binary_file(tw_client_ok, imp_data_dir, virtual_clock):
+    logger.info("---------- test_importer_binary_file ----------")
+    user_name = "binary_user"
+    user_path = Path(imp_data_dir).joinpath(user_name)
+    user_path.mkdir()
+    with open(user_path.joinpath("friends.twfr"), 'wb') as binary_file:
+        write_friends(binary_file, [30, 10, 20], ["thirty", "ten", "twenty"])
+    user_path.joinpath("bad.twfr").write_bytes(b"not a binary export")
+    mock_client = tw_client_ok(user_name)
+
+    ok, msg, frnds_imported, frnds_remaining = \
+        FriendsImporter(mock_client, imp_data_dir, "friends.twfr", clock=virtual_clock).process()
+
+    assert ok
+    assert frnds_imported == ["ten", "twenty", "thirty"]
+    assert mock_client.friendship_requests == [10, 20, 30]
+
+    ok, msg, frnds_imported, frnds_remaining = \
+        FriendsImporter(mock_client, imp_data_dir, "bad.twfr", clock=virtual_clock).process()
+
+    assert not ok
+    assert msg.find("Bad binary") >= 0
+    logger.info("========== test_importer_binary_file ============")
+
+
 # ---------------------
 # private methods tests
 # ---------------------
@@ -0,0 +1,30 @@
+import logging
+
+from tw_frnds_ei.friend_table import FriendTable
+from tw_frnds_ei.import_progress import ImportProgress
+
+logger = logging.getLogger(__name__)
+
+
+# -----------------------
+# Tests
+# -----------------------
+
+def test_import_progress():
+    logger.info("---------- test_import_progress ----------")
+    friends_data = FriendTable((f"name{i}", i) for i in range(5))
+    progress = ImportProgress(friends_data)
+    progress.mark_imported(3)
+    progress.mark_skipped(1, "Doesn't exist anymore")
+    progress.mark_imported(0)
+    progress.mark_imported(0)
+
+    assert progress.num_imported == 2
+    assert progress.screen_names_imported() == ["name0", "name3"]
+    remaining = progress.friendships_remaining()
+    assert remaining == [{'screen_name': "name1", 'fr_id': 1, 'reason_for_skipping': "Doesn't exist anymore"},
+                         {'screen_name': "name2", 'fr_id': 2},
+                         {'screen_name': "name4", 'fr_id': 4}]
+    remaining[0]['fr_id'] = 42
+    assert friends_data[1] == {'screen_name': "name1", 'fr_id': 1}, "The friends to import are left untouched"
+    logger.info("========== test_import_progress ============")
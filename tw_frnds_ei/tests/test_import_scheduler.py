@@ -0,0 +1,99 @@
+import asyncio
+import json
+import logging
+import stat
+
+from tw_frnds_ei.import_scheduler import ImportScheduler
+from tw_frnds_ei.tests.mock_twython import MockTwython
+
+logger = logging.getLogger(__name__)
+
+
+# -----------------------
+# Tests
+# -----------------------
+
+def test_scheduler_runs_jobs_of_several_accounts(imp_data_dir, tmp_path, virtual_clock):
+    logger.info("---------- test_scheduler_runs_jobs_of_several_accounts ----------")
+    spool_path = tmp_path.joinpath("spool")
+    spool_path.mkdir()
+    for user_name in ["importing_user", "retry_user"]:
+        job = {'oauth_user_token': user_name, 'oauth_user_token_secret': "secret", 'csv_file_name': "good_csv.test_csv"}
+        spool_path.joinpath(f"job_{user_name}.json").write_text(json.dumps(job))
+    mock_clients = []
+
+    def _client_factory(token, secret):
+        mock_clients.append(MockTwython(token, MockTwython.SCENARIO_OK))
+        return mock_clients[-1]
+
+    scheduler = ImportScheduler(str(spool_path), imp_data_dir, _client_factory, max_workers=2, poll_seconds=0.1,
+                                clock=virtual_clock)
+
+    asyncio.run(asyncio.wait_for(scheduler.run(until_idle=True), timeout=60))
+
+    assert len(mock_clients) == 2
+    for user_name in ["importing_user", "retry_user"]:
+        finished_job_path = spool_path.joinpath(ImportScheduler.DONE_DIR, f"job_{user_name}.json")
+        assert json.loads(finished_job_path.read_text()) == {'csv_file_name': "good_csv.test_csv"}, \
+            "The credentials should be removed from the finished job"
+        assert stat.S_IMODE(finished_job_path.stat().st_mode) == ImportScheduler.FILE_MODE
+        result = json.loads(spool_path.joinpath(ImportScheduler.DONE_DIR,
+                                                f"job_{user_name}{ImportScheduler.RESULT_SUFFIX}").read_text())
+        assert result['ok']
+        assert len(result['imported']) == 6
+    assert not list(spool_path.joinpath(ImportScheduler.RUNNING_DIR).iterdir())
+    logger.info("========== test_scheduler_runs_jobs_of_several_accounts ============")
+
+
+def test_scheduler_fails_bad_job(imp_data_dir, tmp_path):
+    logger.info("---------- test_scheduler_fails_bad_job ----------")
+    spool_path = tmp_path.joinpath("spool")
+    spool_path.mkdir()
+    spool_path.joinpath("bad_job.json").write_text("{not json")
+    scheduler = ImportScheduler(str(spool_path), imp_data_dir, None, poll_seconds=0.1)
+
+    asyncio.run(asyncio.wait_for(scheduler.run(until_idle=True), timeout=60))
+
+    result = json.loads(spool_path.joinpath(ImportScheduler.FAILED_DIR,
+                                            f"bad_job{ImportScheduler.RESULT_SUFFIX}").read_text())
+    assert not result['ok']
+    assert result['msg'].find("The job failed") >= 0
+    logger.info("========== test_scheduler_fails_bad_job ============")
+
+
+def test_scheduler_resumes_interrupted_job(imp_data_dir, tmp_path, virtual_clock):
+    logger.info("---------- test_scheduler_resumes_interrupted_job ----------")
+    spool_path = tmp_path.joinpath("spool")
+    spool_path.mkdir()
+    job = {'oauth_user_token': "importing_user", 'oauth_user_token_secret': "secret",
+           'csv_file_name': "good_csv.test_csv"}
+    spool_path.joinpath("job.json").write_text(json.dumps(job))
+    mock_clients = []
+
+    def _client_factory(token, secret):
+        mock_clients.append(MockTwython(token, MockTwython.SCENARIO_OK))
+        return mock_clients[-1]
+
+    async def _run_and_stop(scheduler):
+        asyncio.get_running_loop().call_later(1, scheduler.stop)
+        await scheduler.run()
+
+    scheduler = ImportScheduler(str(spool_path), imp_data_dir, _client_factory, poll_seconds=0.1)
+    asyncio.run(asyncio.wait_for(_run_and_stop(scheduler), timeout=60))
+
+    running_job_path = spool_path.joinpath(ImportScheduler.RUNNING_DIR, "job.json")
+    assert json.loads(running_job_path.read_text()) == job, "The credentials are needed to resume the job"
+    assert stat.S_IMODE(running_job_path.stat().st_mode) == ImportScheduler.FILE_MODE
+    requested_before_stop = mock_clients[0].friendship_requests
+    assert 0 < len(requested_before_stop) < 6
+
+    scheduler = ImportScheduler(str(spool_path), imp_data_dir, _client_factory, poll_seconds=0.1,
+                                clock=virtual_clock)
+    asyncio.run(asyncio.wait_for(scheduler.run(until_idle=True), timeout=60))
+
+    result = json.loads(spool_path.joinpath(ImportScheduler.DONE_DIR,
+                                            f"job{ImportScheduler.RESULT_SUFFIX}").read_text())
+    assert result['ok']
+    assert len(result['imported']) == 6
+    assert not set(mock_clients[1].friendship_requests) & set(requested_before_stop)
+    logger.info("========== test_scheduler_resumes_interrupted_job ============")
@@ -0,0 +1,76 @@
+import logging
+import time
+from logging.handlers import SocketHandler
+
+from tw_frnds_ei.log_handlers import LogRecordServer
+from tw_frnds_ei.log_handlers import per_process_file_name
+from tw_frnds_ei.log_handlers import start_queue_listener
+from tw_frnds_ei.screen_name_logger import ScreenNameLogger
+
+logger = logging.getLogger(__name__)
+
+
+class RecordingHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+def _isolated_logger(name, handler):
+    test_logger = logging.getLogger(name)
+    test_logger.propagate = False
+    test_logger.setLevel(logging.DEBUG)
+    test_logger.addHandler(handler)
+    return test_logger
+
+
+# -----------------------
+# Tests
+# -----------------------
+
+def test_queue_listener_writes_from_background_thread():
+    logger.info("---------- test_queue_listener_writes_from_background_thread ----------")
+    target_handler = RecordingHandler()
+    queue_handler, listener = start_queue_listener(target_handler)
+    test_logger = _isolated_logger("test_queue_listener", queue_handler)
+    try:
+        ulog = ScreenNameLogger(logger=test_logger, screen_name="jack")
+        for i in range(100):
+            ulog.debug("Row %s", i)
+    finally:
+        listener.stop()
+        test_logger.removeHandler(queue_handler)
+
+    assert [record.getMessage() for record in target_handler.records] == [f"[jack] - Row {i}" for i in range(100)]
+    assert target_handler.records[0].screen_name == "jack"
+    assert per_process_file_name("./logs/application.log").startswith("logs/application.")
+    logger.info("========== test_queue_listener_writes_from_background_thread ============")
+
+
+def test_log_record_server_single_writer():
+    logger.info("---------- test_log_record_server_single_writer ----------")
+    target_handler = RecordingHandler()
+    server = LogRecordServer(target_handler, 0)
+    server.serve_in_thread()
+    socket_handlers = [SocketHandler("127.0.0.1", server.server_address[1]) for _ in range(2)]
+    try:
+        for i, socket_handler in enumerate(socket_handlers):
+            test_logger = _isolated_logger(f"test_log_server_{i}", socket_handler)
+            test_logger.info("Hello from process %s", i)
+            test_logger.removeHandler(socket_handler)
+
+        deadline = time.monotonic() + 5
+        while len(target_handler.records) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        for socket_handler in socket_handlers:
+            socket_handler.close()
+        server.shutdown()
+        server.server_close()
+
+    assert sorted(record.getMessage() for record in target_handler.records) == \
+        ["Hello from process 0", "Hello from process 1"]
+    logger.info("========== test_log_record_server_single_writer ============")
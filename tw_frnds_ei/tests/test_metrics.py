@@ -0,0 +1,82 @@
+import logging
+import urllib.request
+
+import pytest
+from twython import TwythonError
+
+from tw_frnds_ei.api_client import ApiClient
+from tw_frnds_ei.clock import VirtualClock
+from tw_frnds_ei.metrics import API_ERRORS
+from tw_frnds_ei.metrics import API_REQUEST_SECONDS
+from tw_frnds_ei.metrics import API_REQUESTS
+from tw_frnds_ei.metrics import WAIT_SECONDS
+from tw_frnds_ei.metrics import MetricsRegistry
+from tw_frnds_ei.tests.mock_twython import MockTwython
+from tw_frnds_ei.waiter import Waiter
+
+logger = logging.getLogger(__name__)
+
+
+# -----------------------
+# Tests
+# -----------------------
+
+def test_metrics_rendered_in_prometheus_format(tmp_path):
+    logger.info("---------- test_metrics_rendered_in_prometheus_format ----------")
+    registry = MetricsRegistry()
+    requests = registry.counter("requests_total", "Requests sent", ("endpoint",))
+    latency = registry.histogram("latency_seconds", "Latency", ("endpoint",), buckets=(0.1, 1))
+    requests.inc(endpoint="show_user")
+    requests.inc(2, endpoint="lookup_user")
+    latency.observe(0.05, endpoint="show_user")
+    latency.observe(0.5, endpoint="show_user")
+
+    assert registry.counter("requests_total", "Requests sent", ("endpoint",)) is requests
+    with pytest.raises(ValueError):
+        registry.histogram("requests_total", "Requests sent", ("endpoint",))
+    assert registry.render() == (
+        '# HELP requests_total Requests sent\n'
+        '# TYPE requests_total counter\n'
+        'requests_total{endpoint="lookup_user"} 2\n'
+        'requests_total{endpoint="show_user"} 1\n'
+        '# HELP latency_seconds Latency\n'
+        '# TYPE latency_seconds histogram\n'
+        'latency_seconds_bucket{endpoint="show_user",le="0.1"} 1\n'
+        'latency_seconds_bucket{endpoint="show_user",le="1"} 2\n'
+        'latency_seconds_bucket{endpoint="show_user",le="+Inf"} 2\n'
+        'latency_seconds_count{endpoint="show_user"} 2\n'
+        'latency_seconds_sum{endpoint="show_user"} 0.55\n')
+
+    metrics_file = registry.write_text_file(str(tmp_path / "metrics.prom"))
+    with open(metrics_file, 'r') as text_file:
+        assert text_file.read() == registry.render()
+    server = registry.start_http_server(0)
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.server_port}/metrics") as response:
+            assert response.read().decode("UTF-8") == registry.render()
+    finally:
+        server.shutdown()
+    logger.info("========== test_metrics_rendered_in_prometheus_format ============")
+
+
+def test_api_calls_and_waits_instrumented():
+    logger.info("---------- test_api_calls_and_waits_instrumented ----------")
+    mock_twython = MockTwython("test_user", MockTwython.SCENARIO_SKIP)
+    mock_twython.user_id_err = 2
+    clock = VirtualClock()
+    cli = ApiClient(mock_twython, waiter=Waiter("test_user", clock=clock))
+    requests_before = API_REQUESTS.value(endpoint='create_friendship')
+    errors_before = API_ERRORS.value(endpoint='create_friendship', error="TwythonError")
+    observed_before = API_REQUEST_SECONDS.value(endpoint='create_friendship')
+    waited_before = WAIT_SECONDS.value()
+
+    cli.create_friendship(user_id=1)
+    with pytest.raises(TwythonError):
+        cli.create_friendship(user_id=2)
+    Waiter("test_user", clock=clock).sleep_for(30)
+
+    assert API_REQUESTS.value(endpoint='create_friendship') == requests_before + 2
+    assert API_ERRORS.value(endpoint='create_friendship', error="TwythonError") == errors_before + 1
+    assert API_REQUEST_SECONDS.value(endpoint='create_friendship') == observed_before + 2
+    assert WAIT_SECONDS.value() == waited_before + 30
+    logger.info("========== test_api_calls_and_waits_instrumented ============")
@@ -0,0 +1,87 @@
+import logging
+import random
+
+from twython import TwythonError
+from twython import TwythonRateLimitError
+
+from tw_frnds_ei.friends_importer import FriendsImporter
+from tw_frnds_ei.retry_policy import ACTION_ABORT
+from tw_frnds_ei.retry_policy import ACTION_RETRY
+from tw_frnds_ei.retry_policy import ACTION_SKIP
+from tw_frnds_ei.retry_policy import ACTION_WAIT_FOR_RESET
+from tw_frnds_ei.retry_policy import EXPORT_ERROR_RULES
+from tw_frnds_ei.retry_policy import IMPORT_ERROR_RULES
+from tw_frnds_ei.retry_policy import RetryBudget
+from tw_frnds_ei.retry_policy import RetryPolicy
+from tw_frnds_ei.tests.mock_twython import MockTwython
+
+logger = logging.getLogger(__name__)
+
+
+# -----------------------
+# Tests
+# -----------------------
+
+def test_retry_policy_error_table():
+    logger.info("---------- test_retry_policy_error_table ----------")
+    import_policy = RetryPolicy(IMPORT_ERROR_RULES)
+    export_policy = RetryPolicy(EXPORT_ERROR_RULES, default_action=ACTION_ABORT)
+
+    user_not_found = TwythonError("Twitter API returned a 404 (Not Found), Cannot find specified user.", 404)
+    rule = import_policy.classify(user_not_found)
+    assert rule.action == ACTION_SKIP
+    assert rule.format_reason(screen_name="jack", user_screen_name="me").find("jack") >= 0
+    assert import_policy.classify(TwythonError("401 (Unauthorized), Invalid or expired token", 401)).action == \
+        ACTION_ABORT
+    assert import_policy.classify(TwythonRateLimitError("Rate limit exceeded", 429)).action == ACTION_WAIT_FOR_RESET
+    assert import_policy.classify(TwythonError("Over capacity", 503)).action == ACTION_RETRY
+    assert import_policy.classify(TwythonError("Some twitter error")).action == ACTION_RETRY
+
+    assert export_policy.classify(TwythonRateLimitError("Rate limit exceeded", 429)).action == ACTION_WAIT_FOR_RESET
+    assert export_policy.classify(TwythonError("Internal error", 500)).action == ACTION_RETRY
+    assert export_policy.classify(TwythonError("Some twitter error")).action == ACTION_ABORT
+    logger.info("========== test_retry_policy_error_table ============")
+
+
+def test_retry_policy_backoff_and_budget():
+    logger.info("---------- test_retry_policy_backoff_and_budget ----------")
+    policy = RetryPolicy(IMPORT_ERROR_RULES, max_retries=5, base_seconds=10, max_seconds=60, jitter=0.5,
+                         rng=random.Random(42))
+    for retried, delay in ((1, 10), (2, 20), (3, 40), (4, 60), (5, 60)):
+        for _ in range(20):
+            assert delay <= policy.backoff(retried) <= min(delay * 1.5, 60)
+
+    budget = RetryBudget(max_retries=100, max_seconds=1000)
+    assert policy.seconds_to_wait(ACTION_RETRY, 6, budget) is None, "Too many retries of the request"
+    assert policy.seconds_to_wait(ACTION_SKIP, 1, budget) is None
+    # The rate limit reset, when known, is waited for instead of the backoff
+    assert policy.seconds_to_wait(ACTION_WAIT_FOR_RESET, 1, budget, seconds_until_reset=900) == 900
+    assert policy.seconds_to_wait(ACTION_WAIT_FOR_RESET, 1, budget) <= 15
+    assert policy.seconds_to_wait(ACTION_RETRY, 1, budget, seconds_until_reset=900) <= 15
+    assert budget.retries == 3
+
+    small_budget = RetryBudget(max_retries=2, max_seconds=1000)
+    assert policy.seconds_to_wait(ACTION_RETRY, 1, small_budget) is not None
+    assert policy.seconds_to_wait(ACTION_RETRY, 1, small_budget) is not None
+    assert policy.seconds_to_wait(ACTION_RETRY, 1, small_budget) is None, "The job's budget is exhausted"
+    logger.info("========== test_retry_policy_backoff_and_budget ============")
+
+
+def test_importer_gives_up_after_max_retries(imp_data_dir, virtual_clock):
+    logger.info("---------- test_importer_gives_up_after_max_retries ----------")
+    user_name = "retry_user"
+    mock_client = MockTwython(user_name, MockTwython.SCENARIO_RETRY_NOK)
+    mock_client.user_id_err = 12349  # this user id always fails with a rate limit error
+    importer = FriendsImporter(mock_client, imp_data_dir, "good_csv.test_csv", clock=virtual_clock)
+    importer.RETRY_SHORT_SECONDS_TO_WAIT = 6
+    importer.RETRY_LONG_SECONDS_TO_WAIT = 10
+
+    ok, msg, frnds_imported, frnds_remaining = importer.process()
+
+    assert not ok
+    assert msg.find("Retried too many times") >= 0
+    assert mock_client.friendship_requests.count(12349) == importer.MAX_RETRIES + 1
+    assert importer.retry_budget.retries == importer.MAX_RETRIES
+    # 6, 12 and then the cap of 10 seconds, with up to 50% of jitter, plus the throttling
+    assert 6 + 10 + 10 + 10 <= virtual_clock.monotonic()
+    logger.info("========== test_importer_gives_up_after_max_retries ============")
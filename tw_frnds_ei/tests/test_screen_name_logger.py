@@ -0,0 +1,75 @@
+import json
+import logging
+
+from tw_frnds_ei.screen_name_logger import JsonFormatter
+from tw_frnds_ei.screen_name_logger import ScreenNameLogger
+
+logger = logging.getLogger(__name__)
+
+
+class FormattingCounter:
+    def __init__(self):
+        self.times_formatted = 0
+
+    def __str__(self):
+        self.times_formatted += 1
+        return "formatted"
+
+
+class RecordingHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+# -----------------------
+# Tests
+# -----------------------
+
+def test_screen_name_logger_defers_formatting():
+    logger.info("---------- test_screen_name_logger_defers_formatting ----------")
+    test_logger = logging.getLogger("test_screen_name_logger")
+    test_logger.propagate = False
+    handler = RecordingHandler()
+    test_logger.addHandler(handler)
+    test_logger.setLevel(logging.INFO)
+    try:
+        ulog = ScreenNameLogger(logger=test_logger, screen_name="jack")
+        argument = FormattingCounter()
+        ulog.debug("Not logged: %s", argument)
+        assert argument.times_formatted == 0
+        assert not handler.records
+
+        ulog.warn("Logged: %s", argument)
+        assert len(handler.records) == 1
+        record = handler.records[0]
+        assert record.getMessage() == "[jack] - Logged: formatted"
+        assert record.screen_name == "jack"
+        assert record.levelname == "WARNING"
+    finally:
+        test_logger.removeHandler(handler)
+    logger.info("========== test_screen_name_logger_defers_formatting ============")
+
+
+def test_json_formatter():
+    logger.info("---------- test_json_formatter ----------")
+    test_logger = logging.getLogger("test_json_formatter")
+    test_logger.propagate = False
+    handler = RecordingHandler()
+    test_logger.addHandler(handler)
+    try:
+        ScreenNameLogger(logger=test_logger, screen_name="jack").error("Imported %s friends", 3)
+        test_logger.error("No user")
+    finally:
+        test_logger.removeHandler(handler)
+
+    entries = [json.loads(JsonFormatter().format(record)) for record in handler.records]
+    assert entries[0]['message'] == "[jack] - Imported 3 friends"
+    assert entries[0]['screen_name'] == "jack"
+    assert entries[0]['level'] == "ERROR"
+    assert entries[0]['logger'] == "test_json_formatter"
+    assert 'screen_name' not in entries[1]
+    logger.info("========== test_json_formatter ============")
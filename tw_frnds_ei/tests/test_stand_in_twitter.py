@@ -0,0 +1,83 @@
+import csv
+import logging
+
+import pytest
+from twython import Twython
+from twython import TwythonError
+
+from tw_frnds_ei.api_client import ApiClient
+from tw_frnds_ei.follow_rate_limiter import FollowRateLimiter
+from tw_frnds_ei.friends_exporter import FriendsExporter
+from tw_frnds_ei.friends_importer import FriendsImporter
+from tw_frnds_ei.tests.stand_in_twitter import BLOCKED_BY_USER
+from tw_frnds_ei.tests.stand_in_twitter import EndpointConfig
+from tw_frnds_ei.tests.stand_in_twitter import StandInTwitter
+
+logger = logging.getLogger(__name__)
+
+
+def _twython_client(stand_in):
+    return stand_in.configure_client(Twython("app_key", "app_secret", "user_token", "user_token_secret"))
+
+
+# -----------------------
+# Tests
+# -----------------------
+
+def test_stand_in_export_paced_by_rate_limit_headers(tmp_path, virtual_clock):
+    logger.info("---------- test_stand_in_export_paced_by_rate_limit_headers ----------")
+    endpoints = {'friends/list': EndpointConfig(limit=2, window_seconds=900)}
+    with StandInTwitter(num_friends=450, endpoints=endpoints, clock=virtual_clock) as stand_in:
+        cli = ApiClient(_twython_client(stand_in), clock=virtual_clock)
+        exporter = FriendsExporter(cli, str(tmp_path), clock=virtual_clock)
+
+        ok, msg, file_name = exporter.process()
+
+    assert ok, msg
+    with open(file_name, 'r') as csv_file:
+        rows = list(csv.reader(csv_file))
+    assert len(rows) == 450
+    assert rows[0] == ["friend0", str(stand_in.friend_id(0))]
+    # the third page waited for the rate limit window reset instead of getting a 429
+    assert stand_in.requests_served['friends/list'] == 3
+    assert stand_in.errors_served['friends/list'] == 0
+    assert virtual_clock.monotonic() >= 900
+    logger.info("========== test_stand_in_export_paced_by_rate_limit_headers ============")
+
+
+def test_stand_in_import(tmp_path):
+    logger.info("---------- test_stand_in_import ----------")
+    with StandInTwitter(num_friends=3) as stand_in:
+        blocking_id = stand_in.friend_id(1)
+        stand_in.friendship_errors[blocking_id] = BLOCKED_BY_USER
+        stand_in.following.add(stand_in.friend_id(2))
+        csv_path = tmp_path.joinpath(stand_in.screen_name, "friends.csv")
+        csv_path.parent.mkdir()
+        csv_path.write_text("".join(f'"friend{i}",{stand_in.friend_id(i)}\n' for i in range(3)))
+        rate_limiter = FollowRateLimiter(str(tmp_path), stand_in.screen_name, min_interval_seconds=0)
+        importer = FriendsImporter(ApiClient(_twython_client(stand_in)), str(tmp_path), "friends.csv",
+                                   rate_limiter=rate_limiter)
+
+        ok, msg, frnds_imported, frnds_remaining = importer.process()
+
+    assert ok, msg
+    assert frnds_imported == ["friend0", "friend2"]
+    assert [f['fr_id'] for f in frnds_remaining] == [blocking_id]
+    assert "blocked" in frnds_remaining[0]['reason_for_skipping']
+    # friend2 was already followed, the pre-flight check saved its request
+    assert stand_in.requests_served['friendships/create'] == 2
+    logger.info("========== test_stand_in_import ============")
+
+
+def test_stand_in_injected_errors():
+    logger.info("---------- test_stand_in_injected_errors ----------")
+    endpoints = {'users/show': EndpointConfig(limit=900, error_rate=1.0)}
+    with StandInTwitter(num_friends=10, endpoints=endpoints) as stand_in:
+        cli = _twython_client(stand_in)
+        assert cli.verify_credentials()['screen_name'] == stand_in.screen_name
+        with pytest.raises(TwythonError, match="503"):
+            cli.show_user(screen_name="someone")
+
+        assert cli.get_lastfunction_header('x-rate-limit-remaining') == "899"
+    assert stand_in.errors_served['users/show'] == 1
+    logger.info("========== test_stand_in_injected_errors ============")
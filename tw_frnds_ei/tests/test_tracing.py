@@ -0,0 +1,61 @@
+import logging
+import os
+
+from tw_frnds_ei.friends_exporter import FriendsExporter
+from tw_frnds_ei.friends_importer import FriendsImporter
+from tw_frnds_ei.profiling import profile_run
+from tw_frnds_ei.tracing import Tracer
+
+logger = logging.getLogger(__name__)
+
+
+# -----------------------
+# Tests
+# -----------------------
+
+def test_tracer_breakdown():
+    logger.info("---------- test_tracer_breakdown ----------")
+    tracer = Tracer("test run")
+    for _ in range(3):
+        with tracer.span("api_call"):
+            with tracer.span("write"):
+                pass
+
+    stats = {s.name: s for s in tracer.breakdown()}
+    assert stats['api_call'].count == stats['write'].count == 3
+    assert stats['api_call'].total_seconds >= stats['write'].total_seconds
+    assert tracer.breakdown()[0].name == "api_call"
+    breakdown = tracer.format_breakdown()
+    assert breakdown.startswith("Timing breakdown of test run")
+    assert len(breakdown.splitlines()) == 3
+    logger.info("========== test_tracer_breakdown ============")
+
+
+def test_export_and_import_phases_traced(tw_client_ok, imp_data_dir, tmp_path, virtual_clock):
+    logger.info("---------- test_export_and_import_phases_traced ----------")
+    exporter = FriendsExporter(tw_client_ok("jack", num_friends=40, data_pages=4), str(tmp_path))
+    ok, msg, file_name = exporter.process()
+    assert ok
+    export_spans = {s.name: s.count for s in exporter.tracer.breakdown()}
+    assert export_spans == {'api_call': 5, 'write': 5}
+
+    importer = FriendsImporter(tw_client_ok("importing_user"), imp_data_dir, "good_csv.test_csv", clock=virtual_clock)
+    ok, msg, frnds_imported, frnds_remaining = importer.process()
+    assert ok
+    import_spans = {s.name: s.count for s in importer.tracer.breakdown()}
+    assert import_spans['load'] == import_spans['preflight'] == 1
+    assert import_spans['api_call'] == len(frnds_imported) + 1  # plus a single pre-flight batch
+    assert import_spans['throttle_wait'] == len(frnds_imported) - 1
+    logger.info("========== test_export_and_import_phases_traced ============")
+
+
+def test_profile_run_writes_reports(tmp_path):
+    logger.info("---------- test_profile_run_writes_reports ----------")
+    with profile_run(str(tmp_path), "test") as reports:
+        sorted(str(i) for i in range(10000))
+
+    assert set(reports) == {'cpu', 'cpu_stats', 'memory'}
+    assert all(os.path.getsize(report) > 0 for report in reports.values())
+    with open(reports['memory'], 'r') as memory_report:
+        assert memory_report.readline().startswith("Peak traced memory")
+    logger.info("========== test_profile_run_writes_reports ============")
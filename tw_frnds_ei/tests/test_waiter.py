@@ -0,0 +1,125 @@
+import asyncio
+import logging
+import threading
+import time
+
+import pytest
+
+from tw_frnds_ei import waiter as waiter_module
+from tw_frnds_ei.clock import Clock
+from tw_frnds_ei.clock import VirtualClock
+from tw_frnds_ei.waiter import AsyncWaiter
+from tw_frnds_ei.waiter import WaitCancelledError
+from tw_frnds_ei.waiter import Waiter
+
+logger = logging.getLogger(__name__)
+
+
+# -----------------------
+# Tests
+# -----------------------
+
+def test_waiter_sleeps_for_seconds():
+    logger.info("---------- test_waiter_sleeps_for_seconds ----------")
+    waiter = Waiter("waiting_user", cancel_event=threading.Event())
+    started = time.monotonic()
+
+    waiter.sleep_for(0.2)
+
+    assert time.monotonic() - started >= 0.2
+    logger.info("========== test_waiter_sleeps_for_seconds ============")
+
+
+def test_waiter_sleep_until_past_time_returns_right_away():
+    logger.info("---------- test_waiter_sleep_until_past_time_returns_right_away ----------")
+    waiter = Waiter("waiting_user", cancel_event=threading.Event())
+    started = time.monotonic()
+
+    waiter.sleep_until(time.time() - 10)
+
+    assert time.monotonic() - started < 0.1
+    logger.info("========== test_waiter_sleep_until_past_time_returns_right_away ============")
+
+
+def test_waiter_cancelled_from_another_thread():
+    logger.info("---------- test_waiter_cancelled_from_another_thread ----------")
+    waiter = Waiter("waiting_user", cancel_event=threading.Event())
+    threading.Timer(0.2, waiter.cancel).start()
+    started = time.monotonic()
+
+    with pytest.raises(WaitCancelledError):
+        waiter.sleep_until(time.time() + 3600)
+
+    assert time.monotonic() - started < 5
+    logger.info("========== test_waiter_cancelled_from_another_thread ============")
+
+
+def test_async_waiter_sleeps_and_gets_cancelled():
+    logger.info("---------- test_async_waiter_sleeps_and_gets_cancelled ----------")
+
+    async def _sleep_then_get_cancelled():
+        waiter = AsyncWaiter("waiting_user")
+        await waiter.sleep_for(0.1)
+        asyncio.get_running_loop().call_later(0.1, waiter.cancel)
+        with pytest.raises(WaitCancelledError):
+            await waiter.sleep_for(3600)
+
+    asyncio.run(asyncio.wait_for(_sleep_then_get_cancelled(), timeout=5))
+    logger.info("========== test_async_waiter_sleeps_and_gets_cancelled ============")
+
+
+def test_waiter_on_virtual_clock_returns_right_away():
+    logger.info("---------- test_waiter_on_virtual_clock_returns_right_away ----------")
+    clock = VirtualClock(start=1_000_000)
+    waiter = Waiter("waiting_user", cancel_event=threading.Event(), clock=clock)
+    started = time.monotonic()
+
+    waiter.sleep_for(3600)
+    waiter.sleep_until(1_000_000 + 7 * 24 * 3600)
+
+    assert clock.time() == 1_000_000 + 7 * 24 * 3600
+    assert time.monotonic() - started < 1
+    waiter.cancel()
+    with pytest.raises(WaitCancelledError):
+        waiter.sleep_for(10)
+    assert clock.time() == 1_000_000 + 7 * 24 * 3600
+    logger.info("========== test_waiter_on_virtual_clock_returns_right_away ============")
+
+
+def test_waiters_cancelled_one_by_one_or_all_on_shutdown():
+    logger.info("---------- test_waiters_cancelled_one_by_one_or_all_on_shutdown ----------")
+    clock = VirtualClock()
+    cancelled_waiter = Waiter("cancelled_user", clock=clock)
+    other_waiter = Waiter("other_user", clock=clock)
+
+    cancelled_waiter.cancel()
+
+    with pytest.raises(WaitCancelledError):
+        cancelled_waiter.sleep_for(10)
+    other_waiter.sleep_for(10)
+    assert not waiter_module.SHUTDOWN_EVENT.is_set()
+
+    try:
+        waiter_module.shutdown_waiters()
+        with pytest.raises(WaitCancelledError):
+            other_waiter.sleep_for(10)
+        with pytest.raises(WaitCancelledError):
+            Waiter("late_user", clock=clock).sleep_for(10)
+    finally:
+        waiter_module.SHUTDOWN_EVENT.clear()
+    logger.info("========== test_waiters_cancelled_one_by_one_or_all_on_shutdown ============")
+
+
+def test_incomplete_clock_cannot_be_created():
+    logger.info("---------- test_incomplete_clock_cannot_be_created ----------")
+
+    class ClockWithoutWaits(Clock):
+        def time(self):
+            return 0.0
+
+        def monotonic(self):
+            return 0.0
+
+    with pytest.raises(TypeError):
+        ClockWithoutWaits()
+    logger.info("========== test_incomplete_clock_cannot_be_created ============")
@@ -0,0 +1,90 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict
+from typing import Iterator
+from typing import List
+
+logger = logging.getLogger(__name__)
+
+
+class SpanStats:
+    """The timings of all the spans of a run with the same name."""
+
+    __slots__ = ('name', 'count', 'total_seconds', 'max_seconds')
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.count = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def record(self, seconds: float) -> None:
+        self.count += 1
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+
+    def __repr__(self):
+        return f"SpanStats(name={self.name}, count={self.count}, total_seconds={self.total_seconds:.3f}, " \
+               f"max_seconds={self.max_seconds:.3f})"
+
+
+class Tracer:
+    """Times the phases of a run (spans) and sums them up by phase name, for a per-run timing breakdown.
+
+    Spans may be nested (e.g. the API calls of a pre-flight check) and may run in several threads at the same time,
+    so the totals of different phases may add up to more than the wall time of the run.
+
+    :param run_name: Name of the run, for the breakdown
+    :type run_name: str
+    """
+
+    def __init__(self, run_name: str = "run") -> None:
+        self.run_name = run_name
+        self.started = time.perf_counter()
+        self._spans: Dict[str, SpanStats] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        """Time the block of code within the context as a span of a phase.
+
+        :param name: Name of the phase
+        :type name: str
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            with self._lock:
+                stats = self._spans.get(name)
+                if stats is None:
+                    stats = self._spans[name] = SpanStats(name)
+                stats.record(seconds)
+
+    def breakdown(self) -> List[SpanStats]:
+        """The timings of the phases so far, the longest first.
+
+        :return: The stats of each phase
+        :rtype: list
+        """
+        with self._lock:
+            return sorted(self._spans.values(), key=lambda stats: stats.total_seconds, reverse=True)
+
+    def format_breakdown(self) -> str:
+        """Format the timing breakdown of the run as a small table.
+
+        :return: The breakdown, one line per phase
+        :rtype: str
+        """
+        wall_seconds = time.perf_counter() - self.started
+        lines = [f"Timing breakdown of {self.run_name} - wall time: {wall_seconds:.3f}s"]
+        for stats in self.breakdown():
+            share = stats.total_seconds / wall_seconds * 100 if wall_seconds else 0
+            lines.append(f"  {stats.name:<16} {stats.count:>7} spans {stats.total_seconds:>10.3f}s "
+                         f"({share:5.1f}%) max {stats.max_seconds:.3f}s")
+        return "\n".join(lines)
+
+# **** EOC
@@ -1,37 +1,218 @@
+import asyncio
 import logging
+import signal
+import threading
 import time
+import weakref
+from typing import Optional
 
+from tw_frnds_ei.clock import SYSTEM_CLOCK
+from tw_frnds_ei.clock import Clock
+from tw_frnds_ei.metrics import WAIT_SECONDS
+from tw_frnds_ei.metrics import WAITS
 from tw_frnds_ei.screen_name_logger import ScreenNameLogger
 
 logger = logging.getLogger(__name__)
 
+# Set when the process is asked to shut down, only by the shutdown signal handler (see shutdown_waiters)
+SHUTDOWN_EVENT = threading.Event()
+# The waiters with their own cancel event (the default), cancelled on shutdown
+_WAITERS_CANCELLED_ON_SHUTDOWN: "weakref.WeakSet[Waiter]" = weakref.WeakSet()
+_WAITERS_LOCK = threading.Lock()
+
+
+def install_shutdown_signal_handlers() -> None:
+    """Make SIGTERM cancel the waits of all the waiters created without a cancel event."""
+    def _handle_shutdown_signal(signum, frame):
+        logger.warning(f"Received signal {signum}. Cancelling waits...")
+        shutdown_waiters()
+
+    signal.signal(signal.SIGTERM, _handle_shutdown_signal)
+
+
+def shutdown_waiters() -> None:
+    """Set the shutdown event and cancel the waits of all the waiters created without a cancel event, current and
+    future ones."""
+    SHUTDOWN_EVENT.set()
+    with _WAITERS_LOCK:
+        waiters = list(_WAITERS_CANCELLED_ON_SHUTDOWN)
+    for waiter in waiters:
+        waiter.cancel()
+
+
+class WaitCancelledError(Exception):
+    """Raised by a waiter when its wait is cancelled before the wake up time."""
+
 
 class Waiter:
     """A Waiter instance contains the logic to pause the program's execution while keeping an eye on the clock.
 
-    A waiter needs to be instantiated
+    A wait is a single timed wait on an event, not a polling loop. Setting the event (by calling ``cancel`` or, by
+    default, on process shutdown) cancels the wait. Each waiter has its own event by default: cancelling a waiter
+    doesn't cancel the others.
+
+    Waiting for a number of seconds relies on a monotonic clock, so it's not affected by changes of the system clock.
+    Waiting until a wall clock time re-checks the wall clock at least every MAX_SECONDS_BETWEEN_CLOCK_CHECKS, to
+    correct for clock jumps during long waits.
 
+    :param user_screen_name: The Twitter user the waits are done for (used for logging)
+    :type user_screen_name: str
+
+    :param cancel_event: Event that cancels the waits when set. Defaults to a new event for this waiter, set on
+    process shutdown
+    :type cancel_event: threading.Event
+
+    :param clock: Clock to wait on. Defaults to the system clock
+    :type clock: tw_frnds_ei.clock.Clock
     """
-    def __init__(self, user_screen_name):
+
+    MAX_SECONDS_BETWEEN_CLOCK_CHECKS = 3600
+
+    def __init__(self,
+                 user_screen_name,
+                 cancel_event: Optional[threading.Event] = None,
+                 clock: Optional[Clock] = None):
         self.user_screen_name = user_screen_name
-        self.initial = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(int(time.time())))
+        if cancel_event is not None:
+            self.cancel_event = cancel_event
+        else:
+            self.cancel_event = threading.Event()
+            with _WAITERS_LOCK:
+                _WAITERS_CANCELLED_ON_SHUTDOWN.add(self)
+            if SHUTDOWN_EVENT.is_set():
+                self.cancel_event.set()
+        self.clock = clock if clock else SYSTEM_CLOCK
         self.user_logger = ScreenNameLogger(logger=logger, screen_name=self.user_screen_name)
 
-    def sleep_for(self, seconds_to_wait: int, check_every: int) -> None:
-        now = int(time.time())
-        time_to_wake_up = now + seconds_to_wait
-        self.sleep_until(time_to_wake_up, check_every)
-
-    def sleep_until(self, time_to_wake_up: int, check_every: int) -> None:
-        sleep_until = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(time_to_wake_up))
-        while True:
-            now = int(time.time())
-            seconds_remaining = time_to_wake_up - now
-            self.user_logger.debug(f"Still {seconds_remaining} seconds to wait until {sleep_until}. "
-                                   f"Initial time was {self.initial}")
-
-            if seconds_remaining <= 0:
-                break
-            else:
-                time.sleep(check_every)
-                self.user_logger.debug(f"Checking current time - Doing this every {check_every} seconds.")
+    def cancel(self) -> None:
+        """Cancel the current (and any future) wait of this waiter."""
+        self.cancel_event.set()
+
+    def sleep_for(self, seconds_to_wait: float) -> None:
+        """Wait for a number of seconds.
+
+        :raises WaitCancelledError: if the wait gets cancelled
+        """
+        self.user_logger.debug("Waiting for %s seconds", seconds_to_wait)
+        started = self.clock.monotonic()
+        try:
+            if self.clock.wait(self.cancel_event, max(seconds_to_wait, 0)):
+                self._raise_cancelled()
+        finally:
+            _count_wait(self.clock.monotonic() - started)
+        self.user_logger.debug("Waited for %s seconds", seconds_to_wait)
+
+    def sleep_until(self, time_to_wake_up: float) -> None:
+        """Wait until a wall clock time (seconds since the epoch).
+
+        :raises WaitCancelledError: if the wait gets cancelled
+        """
+        self.user_logger.debug("Waiting until %s", _FormattedTime(time_to_wake_up))
+        seconds_remaining = time_to_wake_up - self.clock.time()
+        started = self.clock.monotonic()
+        try:
+            while seconds_remaining > 0:
+                if self.clock.wait(self.cancel_event, min(seconds_remaining, self.MAX_SECONDS_BETWEEN_CLOCK_CHECKS)):
+                    self._raise_cancelled()
+                seconds_remaining = time_to_wake_up - self.clock.time()
+        finally:
+            _count_wait(self.clock.monotonic() - started)
+        self.user_logger.debug("Waited until %s", _FormattedTime(time_to_wake_up))
+
+    # ---------------
+    # private methods
+    # ---------------
+
+    def _raise_cancelled(self):
+        self.user_logger.info("Wait cancelled!")
+        raise WaitCancelledError()
+
+# **** EOC
+
+
+class AsyncWaiter:
+    """The asyncio counterpart of the Waiter: same waits, awaited instead of blocking the thread.
+
+    :param user_screen_name: The Twitter user the waits are done for (used for logging)
+    :type user_screen_name: str
+
+    :param cancel_event: Event that cancels the waits when set. Defaults to a new event for this waiter.
+    :type cancel_event: asyncio.Event
+
+    :param clock: Clock to wait on. Defaults to the system clock
+    :type clock: tw_frnds_ei.clock.Clock
+    """
+
+    MAX_SECONDS_BETWEEN_CLOCK_CHECKS = Waiter.MAX_SECONDS_BETWEEN_CLOCK_CHECKS
+
+    def __init__(self,
+                 user_screen_name,
+                 cancel_event: Optional[asyncio.Event] = None,
+                 clock: Optional[Clock] = None):
+        self.user_screen_name = user_screen_name
+        self.cancel_event = cancel_event if cancel_event is not None else asyncio.Event()
+        self.clock = clock if clock else SYSTEM_CLOCK
+        self.user_logger = ScreenNameLogger(logger=logger, screen_name=self.user_screen_name)
+
+    def cancel(self) -> None:
+        """Cancel the current (and any future) wait of this waiter."""
+        self.cancel_event.set()
+
+    async def sleep_for(self, seconds_to_wait: float) -> None:
+        """Wait for a number of seconds.
+
+        :raises WaitCancelledError: if the wait gets cancelled
+        """
+        self.user_logger.debug("Waiting for %s seconds", seconds_to_wait)
+        started = self.clock.monotonic()
+        try:
+            if await self.clock.async_wait(self.cancel_event, max(seconds_to_wait, 0)):
+                self._raise_cancelled()
+        finally:
+            _count_wait(self.clock.monotonic() - started)
+        self.user_logger.debug("Waited for %s seconds", seconds_to_wait)
+
+    async def sleep_until(self, time_to_wake_up: float) -> None:
+        """Wait until a wall clock time (seconds since the epoch).
+
+        :raises WaitCancelledError: if the wait gets cancelled
+        """
+        self.user_logger.debug("Waiting until %s", _FormattedTime(time_to_wake_up))
+        seconds_remaining = time_to_wake_up - self.clock.time()
+        started = self.clock.monotonic()
+        try:
+            while seconds_remaining > 0:
+                if await self.clock.async_wait(self.cancel_event,
+                                               min(seconds_remaining, self.MAX_SECONDS_BETWEEN_CLOCK_CHECKS)):
+                    self._raise_cancelled()
+                seconds_remaining = time_to_wake_up - self.clock.time()
+        finally:
+            _count_wait(self.clock.monotonic() - started)
+        self.user_logger.debug("Waited until %s", _FormattedTime(time_to_wake_up))
+
+    # ---------------
+    # private methods
+    # ---------------
+
+    def _raise_cancelled(self):
+        self.user_logger.info("Wait cancelled!")
+        raise WaitCancelledError()
+
+# **** EOC
+
+
+class _FormattedTime:
+    # A time (seconds since the epoch) formatted only when logged
+
+    __slots__ = ('seconds_since_epoch',)
+
+    def __init__(self, seconds_since_epoch):
+        self.seconds_since_epoch = seconds_since_epoch
+
+    def __str__(self):
+        return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(int(self.seconds_since_epoch)))
+
+
+def _count_wait(seconds_waited):
+    WAITS.inc()
+    WAIT_SECONDS.inc(max(seconds_waited, 0))